@@ -8,23 +8,41 @@ import os
 import sys
 import json
 import re
+import time
+import argparse
 from pathlib import Path
 from datetime import datetime
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 try:
     import nbformat
-    from nbconvert import HTMLExporter, MarkdownExporter
+    from nbconvert import MarkdownExporter
     from nbconvert.preprocessors import ExecutePreprocessor, CellExecutionError
-    from PIL import Image, ImageDraw, ImageFont
 except ImportError as e:
     print(f"Error importing required modules: {e}")
     print("Installing dependencies...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "jupyter", "nbconvert", "nbformat", "pillow"])
+    subprocess.check_call([sys.executable, "-m", "pip", "install", "jupyter", "nbconvert", "nbformat", "pillow", "numpy"])
     import nbformat
-    from nbconvert import HTMLExporter, MarkdownExporter
+    from nbconvert import MarkdownExporter
     from nbconvert.preprocessors import ExecutePreprocessor, CellExecutionError
-    from PIL import Image, ImageDraw, ImageFont
+
+# Shared preview helpers live at the repository root
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+from preview_export import ExportPipeline
+from notebook_catalog import NotebookCatalog
+from wiki_builder import WikiBuilder, WikiTemplate, bullets
+from validate_notebooks import reject_invalid
+from preview_thumbnails import render_thumbnail
+from notebook_outputs import rehydrate
+from notebook_diff import EXECUTE, EXPORT, classify_file
+
+# One exporter set for the whole run, reused for every notebook
+_PREVIEW_PIPELINE = None
+
+# Shared notebook catalog (previews/notebook_catalog.sqlite)
+_CATALOG = None
 
 
 # Category mapping based on directory structure
@@ -38,6 +56,46 @@ CATEGORY_MAPPING = {
     'other': '📓 Other Notebooks'
 }
 
+# Feature list of each category's wiki pages (others use 'other')
+CATEGORY_FEATURES = {
+    'templates': [
+        '📐 Template structure for new notebooks',
+        '🎨 Standardized formatting and styling',
+        '📋 Best practices and guidelines',
+        '🔧 Reusable code patterns',
+    ],
+    'agrology': [
+        '🌾 Agricultural data analysis',
+        '📊 Crop yield predictions',
+        '🧪 Soil analysis and recommendations',
+        '📈 Environmental monitoring',
+    ],
+    'greenhouse': [
+        '🏗️ Greenhouse environment monitoring',
+        '💡 Lighting optimization',
+        '🌡️ Climate control analysis',
+        '📊 Growth tracking and prediction',
+    ],
+    'regional': [
+        '🗺️ Regional climate analysis',
+        '🌍 Location-specific plant recommendations',
+        '📍 Geographic data visualization',
+        '🌤️ Weather pattern analysis',
+    ],
+    'education': [
+        '🎓 Educational content and tutorials',
+        '📚 Step-by-step learning materials',
+        '🔍 Interactive examples',
+        '💡 Practical exercises',
+    ],
+    'other': [
+        '📊 Data analysis and visualization',
+        '🔬 Scientific computations',
+        '📈 Statistical analysis',
+        '🎨 Interactive plots and charts',
+    ],
+}
+
 
 def setup_directories():
     """Create necessary directories for output."""
@@ -67,11 +125,24 @@ def get_changed_notebooks():
     return notebooks
 
 
-def extract_notebook_metadata(notebook_path):
-    """Extract metadata from notebook for wiki page generation."""
+def get_catalog():
+    """Return the shared notebook catalog, opening it on first use."""
+    global _CATALOG
+    if _CATALOG is None:
+        _CATALOG = NotebookCatalog()
+    return _CATALOG
+
+
+def extract_notebook_metadata(notebook_path, raw=None):
+    """Extract metadata from notebook for wiki page generation.
+    
+    `raw` is the notebook's bytes if they have already been read.
+    """
     try:
-        with open(notebook_path, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
+        # Cell counts and leading cells from the catalog; unchanged notebooks aren't rescanned
+        entry = get_catalog().get(notebook_path, raw)
+        if entry['scan_error']:
+            raise ValueError(entry['scan_error'])
         
         # Extract title from first markdown cell or filename
         title = Path(notebook_path).stem.replace('_', ' ').replace('-', ' ').title()
@@ -80,9 +151,9 @@ def extract_notebook_metadata(notebook_path):
         tags = []
         
         # Try to extract from first few cells
-        for cell in nb.cells[:5]:
-            if cell.cell_type == 'markdown':
-                lines = cell.source.split('\n')
+        for cell in get_catalog().leading_cells(entry):
+            if cell['cell_type'] == 'markdown':
+                lines = cell['source'].split('\n')
                 for line in lines:
                     # Look for title (# heading)
                     if line.startswith('# ') and not title:
@@ -105,18 +176,14 @@ def extract_notebook_metadata(notebook_path):
             if part in CATEGORY_MAPPING:
                 tags.append(CATEGORY_MAPPING[part].split(' ', 1)[1])
         
-        # Get cell count
-        code_cells = len([c for c in nb.cells if c.cell_type == 'code'])
-        markdown_cells = len([c for c in nb.cells if c.cell_type == 'markdown'])
-        
         metadata = {
             'title': title,
             'description': description or f"Jupyter notebook for {title.lower()}",
             'author': author,
-            'tags': list(set(tags)),
-            'code_cells': code_cells,
-            'markdown_cells': markdown_cells,
-            'total_cells': len(nb.cells),
+            'tags': sorted(set(tags)),
+            'code_cells': entry['code_cells'],
+            'markdown_cells': entry['markdown_cells'],
+            'total_cells': entry['total_cells'],
             'filename': Path(notebook_path).name,
             'path': notebook_path
         }
@@ -128,45 +195,28 @@ def extract_notebook_metadata(notebook_path):
         return None
 
 
-def generate_wiki_page(notebook_path, metadata):
-    """Generate a comprehensive wiki page for the notebook."""
-    wiki_name = Path(notebook_path).stem.replace('_', '-')
-    wiki_path = f"wiki/{wiki_name}.md"
-    
-    # Determine category
-    category = 'other'
-    for cat in CATEGORY_MAPPING.keys():
-        if cat in notebook_path.lower():
-            category = cat
-            break
-    
-    # Generate wiki content
-    content = f"""# {metadata['title']}
+# Wiki page layout; fields are filled in by wiki_page()
+WIKI_PAGE_TEMPLATE = WikiTemplate("""# {title}
 
-> {metadata['description']}
+> {description}
 
 ## 📊 Overview
 
-**Category:** {CATEGORY_MAPPING[category]}  
-**Author:** {metadata['author']}  
-**Cells:** {metadata['total_cells']} ({metadata['code_cells']} code, {metadata['markdown_cells']} markdown)  
-**File:** `{metadata['filename']}`
+**Category:** {category_label}  
+**Author:** {author}  
+**Cells:** {total_cells} ({code_cells} code, {markdown_cells} markdown)  
+**File:** `{filename}`
 
-"""
-    
-    if metadata['tags']:
-        content += f"**Tags:** {', '.join(f'`{tag}`' for tag in metadata['tags'])}\n\n"
-    
-    content += f"""## 📝 Description
+{tags_line}## 📝 Description
 
-{metadata['description']}
+{description}
 
 This notebook is part of the Botanical Research collection, providing tools and analysis for plant science research.
 
 ## 🚀 Quick Start
 
 ### Running in Google Colab
-[![Open In Colab](https://colab.research.google.com/assets/colab-badge.svg)](https://colab.research.google.com/github/outobecca/botanical-colabs/blob/main/{metadata['path']})
+[![Open In Colab](https://colab.research.google.com/assets/colab-badge.svg)](https://colab.research.google.com/github/outobecca/botanical-colabs/blob/main/{path})
 
 ### Running Locally
 ```bash
@@ -178,59 +228,19 @@ cd botanical-colabs
 pip install -r requirements.txt
 
 # Launch Jupyter
-jupyter notebook {metadata['path']}
+jupyter notebook {path}
 ```
 
 ## 📚 Contents
 
-This notebook contains {metadata['total_cells']} cells organized into sections:
+This notebook contains {total_cells} cells organized into sections:
 
-- **Code Cells:** {metadata['code_cells']} - Python code for data processing and analysis
-- **Markdown Cells:** {metadata['markdown_cells']} - Documentation and explanations
+- **Code Cells:** {code_cells} - Python code for data processing and analysis
+- **Markdown Cells:** {markdown_cells} - Documentation and explanations
 
 ## 🔬 Features
 
-"""
-    
-    # Add category-specific features
-    if category == 'templates':
-        content += """- 📐 Template structure for new notebooks
-- 🎨 Standardized formatting and styling
-- 📋 Best practices and guidelines
-- 🔧 Reusable code patterns
-"""
-    elif category == 'agrology':
-        content += """- 🌾 Agricultural data analysis
-- 📊 Crop yield predictions
-- 🧪 Soil analysis and recommendations
-- 📈 Environmental monitoring
-"""
-    elif category == 'greenhouse':
-        content += """- 🏗️ Greenhouse environment monitoring
-- 💡 Lighting optimization
-- 🌡️ Climate control analysis
-- 📊 Growth tracking and prediction
-"""
-    elif category == 'regional':
-        content += """- 🗺️ Regional climate analysis
-- 🌍 Location-specific plant recommendations
-- 📍 Geographic data visualization
-- 🌤️ Weather pattern analysis
-"""
-    elif category == 'education':
-        content += """- 🎓 Educational content and tutorials
-- 📚 Step-by-step learning materials
-- 🔍 Interactive examples
-- 💡 Practical exercises
-"""
-    else:
-        content += """- 📊 Data analysis and visualization
-- 🔬 Scientific computations
-- 📈 Statistical analysis
-- 🎨 Interactive plots and charts
-"""
-    
-    content += f"""
+{features}
 ## 🛠️ Requirements
 
 ### Python Packages
@@ -270,9 +280,9 @@ pip install -r requirements.txt
 
 ## 📊 Preview
 
-[View HTML Preview](../previews/html/{Path(notebook_path).stem}.html)
+[View HTML Preview](../previews/html/{stem}.html)
 
-![Notebook Preview](../thumbnails/{Path(notebook_path).stem}.png)
+![Notebook Preview](../thumbnails/{stem}.png)
 
 ## 🤝 Contributing
 
@@ -314,31 +324,84 @@ See [LICENSE](../LICENSE) for details.
 
 ---
 
-*Last updated: {datetime.now().strftime('%Y-%m-%d')}*  
+*Last updated: {last_updated}*  
 *Auto-generated by Documentation Workflow*
-"""
-    
-    # Write wiki page
-    with open(wiki_path, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"✓ Generated wiki page: {wiki_path}")
-    return wiki_path
+""")
 
 
-def generate_html_preview(notebook_path):
-    """Generate HTML preview of the notebook."""
+def last_commit_date(notebook_path):
+    """Date of the last commit that touched the notebook (today if unknown).
+    
+    Using the commit date instead of the build date keeps regenerated pages
+    identical until the notebook itself changes.
+    """
     try:
-        with open(notebook_path, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
-        
-        # Configure HTML exporter
-        html_exporter = HTMLExporter()
-        html_exporter.template_name = 'classic'
-        html_exporter.exclude_input = True  # Hide code cells
+        result = subprocess.run(
+            ['git', 'log', '-1', '--format=%cs', '--', str(notebook_path)],
+            capture_output=True, text=True, check=True,
+        )
+        if result.stdout.strip():
+            return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def wiki_page(notebook_path, metadata):
+    """The wiki page of a notebook as (file name, template, values) for WikiBuilder."""
+    wiki_name = Path(notebook_path).stem.replace('_', '-')
+    
+    # Determine category
+    category = 'other'
+    for cat in CATEGORY_MAPPING.keys():
+        if cat in notebook_path.lower():
+            category = cat
+            break
+    
+    tags_line = ""
+    if metadata['tags']:
+        tags_line = f"**Tags:** {', '.join(f'`{tag}`' for tag in metadata['tags'])}\n\n"
+    
+    values = {
+        **metadata,
+        'category_label': CATEGORY_MAPPING[category],
+        'tags_line': tags_line,
+        'features': bullets(CATEGORY_FEATURES.get(category, CATEGORY_FEATURES['other'])),
+        'stem': Path(notebook_path).stem,
+        'last_updated': last_commit_date(notebook_path),
+    }
+    return f"{wiki_name}.md", WIKI_PAGE_TEMPLATE, values
+
+
+def generate_wiki_pages(pages):
+    """Write a batch of wiki pages, skipping pages whose content is unchanged."""
+    written, unchanged = WikiBuilder('wiki').build(pages)
+    for path in written:
+        print(f"✓ Generated wiki page: {path}")
+    if unchanged:
+        print(f"✓ {len(unchanged)} wiki page(s) unchanged")
+    return written, unchanged
+
+
+def get_preview_pipeline():
+    """Return the export pipeline used for HTML previews, creating it on first use."""
+    global _PREVIEW_PIPELINE
+    if _PREVIEW_PIPELINE is None:
+        _PREVIEW_PIPELINE = ExportPipeline(['html'], template='classic', exclude_input=True)
+    return _PREVIEW_PIPELINE
+
+
+def generate_html_preview(notebook_path, nb=None):
+    """Generate HTML preview of the notebook (from `nb` if it is already parsed)."""
+    try:
+        if nb is None:
+            with open(notebook_path, 'r', encoding='utf-8') as f:
+                nb = nbformat.read(f, as_version=4)
         
-        # Convert to HTML
-        (body, resources) = html_exporter.from_notebook_node(nb)
+        # Convert to HTML (code cells hidden) with the shared exporter
+        body, resources = get_preview_pipeline().export(nb, stem=Path(notebook_path).stem)['html']
+        if body is None:
+            raise RuntimeError(resources['error'])
         
         # Add preview badge
         preview_badge = '''
@@ -370,46 +433,16 @@ def generate_html_preview(notebook_path):
         return None
 
 
-def generate_thumbnail(notebook_path):
-    """Generate a thumbnail image for the notebook preview."""
+def generate_thumbnail(notebook_path, nb=None):
+    """Generate a thumbnail image for the notebook preview (from `nb` if it is already parsed)."""
     try:
-        # Create a simple thumbnail with notebook info
-        img = Image.new('RGB', (800, 400), color=(13, 17, 23))
-        draw = ImageDraw.Draw(img)
-        
-        # Try to use a nice font, fall back to default if not available
-        try:
-            title_font = ImageFont.truetype("arial.ttf", 48)
-            text_font = ImageFont.truetype("arial.ttf", 24)
-        except:
-            title_font = ImageFont.load_default()
-            text_font = ImageFont.load_default()
-        
-        # Add gradient-like effect (simple)
-        for y in range(400):
-            color_value = int(13 + (y / 400) * 10)
-            draw.line([(0, y), (800, y)], fill=(color_value, color_value + 4, color_value + 10))
-        
-        # Add notebook name
         notebook_name = Path(notebook_path).stem.replace('_', ' ').replace('-', ' ').title()
-        
-        # Draw text with shadow
-        draw.text((52, 152), notebook_name, fill=(0, 0, 0), font=title_font)
-        draw.text((50, 150), notebook_name, fill=(88, 166, 255), font=title_font)
-        
-        # Add subtitle
-        subtitle = "Jupyter Notebook Preview"
-        draw.text((52, 252), subtitle, fill=(0, 0, 0), font=text_font)
-        draw.text((50, 250), subtitle, fill=(139, 148, 158), font=text_font)
-        
-        # Add emoji/icon
-        draw.text((52, 52), "📓", font=title_font)
-        
-        # Save thumbnail
-        output_path = f"thumbnails/{Path(notebook_path).stem}.png"
-        img.save(output_path, 'PNG')
-        
-        print(f"✓ Generated thumbnail: {output_path}")
+        source = notebook_path if nb is None else nb
+        paths = render_thumbnail(source, notebook_name, 'thumbnails', Path(notebook_path).stem)
+        if not paths:
+            raise RuntimeError("Pillow is not installed")
+        output_path = str(paths[0])
+        print(f"✓ Generated thumbnail: {output_path} (+{len(paths) - 1} srcset sizes)")
         return output_path
     
     except Exception as e:
@@ -417,8 +450,53 @@ def generate_thumbnail(notebook_path):
         return None
 
 
-def main():
+def needs_artifacts(notebook_path, base):
+    """Whether the notebook's preview and thumbnail must be rendered again.
+    
+    Not if only metadata changed since `base` and both files already exist.
+    """
+    diff = classify_file(notebook_path, base)
+    print(f"   {notebook_path}: {diff.summary()}")
+    stem = Path(notebook_path).stem
+    missing = not (Path(f"previews/html/{stem}.html").exists() and Path(f"thumbnails/{stem}.png").exists())
+    return missing or diff.plan in (EXECUTE, EXPORT)
+
+
+def generate_artifacts(notebook_path, raw):
+    """Parse a notebook once and render its HTML preview and thumbnail concurrently.
+    
+    Runs in a worker process. Returns {kind: path} for the artifacts that succeeded.
+    """
+    try:
+        nb = nbformat.reads(raw.decode('utf-8'), as_version=4)
+        # Stripped notebooks get their outputs back from the output store
+        rehydrate(nb)
+    except Exception as e:
+        print(f"⚠ Error reading {notebook_path}, no preview or thumbnail: {e}")
+        return {}
+    
+    # The exporter copies the notebook, so both renderers can share it
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        html_preview = pool.submit(generate_html_preview, notebook_path, nb)
+        thumbnail = pool.submit(generate_thumbnail, notebook_path, nb)
+    artifacts = {'html': html_preview.result(), 'thumbnail': thumbnail.result()}
+    return {kind: path for kind, path in artifacts.items() if path}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate wiki pages, previews and thumbnails for changed notebooks.")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="notebooks processed at the same time (default: number of CPU cores)")
+    parser.add_argument('--base', default=os.environ.get('BASE_REF'),
+                        help="git revision to diff against; notebooks whose code, outputs and markdown "
+                             "are unchanged only get their wiki page refreshed (default: $BASE_REF)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Main execution function."""
+    args = parse_args(argv)
+    started = time.perf_counter()
     print("=" * 60)
     print("Auto-Documentation Generator")
     print("=" * 60)
@@ -435,36 +513,71 @@ def main():
     
     print(f"\nProcessing {len(notebooks)} notebook(s)...\n")
     
-    # Process each notebook
-    success_count = 0
+    # Reject broken notebooks up front; previews render them as stored
+    existing = [notebook_path for notebook_path in notebooks if Path(notebook_path).exists()]
+    rejected = set(existing).difference(reject_invalid(existing, checks=('json', 'schema')))
+    
+    # Read each notebook once: metadata and wiki pages here, previews and thumbnails in workers
+    wiki_pages = {}
+    pending = {}
+    wiki_only = []
     for notebook_path in notebooks:
-        print(f"\n📓 Processing: {notebook_path}")
-        print("-" * 60)
+        print(f"📓 Queued: {notebook_path}")
         
         # Check if file exists
         if not Path(notebook_path).exists():
             print(f"⚠ File not found: {notebook_path}")
             continue
+        if notebook_path in rejected:
+            continue
+        
+        with open(notebook_path, 'rb') as f:
+            raw = f.read()
+        metadata = extract_notebook_metadata(notebook_path, raw)
+        if not metadata:
+            print(f"⚠ Skipping {notebook_path} due to metadata extraction failure")
+            continue
+        wiki_pages[notebook_path] = wiki_page(notebook_path, metadata)
+        if args.base and not needs_artifacts(notebook_path, args.base):
+            wiki_only.append(notebook_path)
+            continue
+        pending[notebook_path] = raw
+    
+    jobs = max(1, min(args.jobs, len(pending)))
+    if wiki_only:
+        print(f"\n⏭️  {len(wiki_only)} notebook(s) changed only in metadata; refreshing their wiki pages only")
+    if pending:
+        print(f"\n🚀 Rendering previews and thumbnails with {jobs} worker(s)...")
+    
+    success_count = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(generate_artifacts, notebook_path, raw): notebook_path
+            for notebook_path, raw in pending.items()
+        }
+        
+        # Wiki pages only need the metadata; write them while the workers run
+        if wiki_pages:
+            print(f"\n📝 Writing {len(wiki_pages)} wiki page(s)...")
+            generate_wiki_pages(wiki_pages.values())
         
-        try:
-            # Extract metadata
-            metadata = extract_notebook_metadata(notebook_path)
-            if not metadata:
-                print(f"⚠ Skipping {notebook_path} due to metadata extraction failure")
+        for future in as_completed(futures):
+            notebook_path = futures[future]
+            try:
+                artifacts = future.result()
+            except Exception as e:
+                print(f"❌ Error processing {notebook_path}: {e}")
                 continue
-            
-            # Generate documentation
-            wiki_page = generate_wiki_page(notebook_path, metadata)
-            html_preview = generate_html_preview(notebook_path)
-            thumbnail = generate_thumbnail(notebook_path)
-            
+            artifacts['wiki'] = f"wiki/{wiki_pages[notebook_path][0]}"
+            get_catalog().record_artifacts(notebook_path, artifacts)
             success_count += 1
             print(f"✅ Successfully processed: {notebook_path}")
-        
-        except Exception as e:
-            print(f"❌ Error processing {notebook_path}: {e}")
-            import traceback
-            traceback.print_exc()
+    
+    for notebook_path in wiki_only:
+        get_catalog().record_artifacts(notebook_path, {'wiki': f"wiki/{wiki_pages[notebook_path][0]}"})
+        success_count += 1
+    
+    get_catalog().close()
     
     # Summary
     print("\n" + "=" * 60)
@@ -474,6 +587,7 @@ def main():
     print(f"✓ Wiki pages created in: wiki/")
     print(f"✓ HTML previews created in: previews/html/")
     print(f"✓ Thumbnails created in: thumbnails/")
+    print(f"⏱️  Finished in {time.perf_counter() - started:.1f}s with {jobs} worker(s)")
     
     return 0 if success_count == len(notebooks) else 1
 
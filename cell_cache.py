@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Per-cell execution cache for preview generation.
+
+Every code cell gets a cumulative key: the hash of its own source and the
+sources of all code cells before it (plus an environment seed). When a
+notebook is executed again, cells whose keys are still cached get their
+outputs replayed, the kernel namespace is restored from the snapshot taken
+after the last replayed cell, and execution continues from the first changed
+cell. Editing only the last cell of a notebook therefore only runs that cell,
+and a notebook whose code cells are all cached (only markdown changed) is
+rebuilt without starting a kernel at all.
+
+Invalidation rules:
+- Changing a code cell invalidates that cell and every code cell after it.
+- A different environment seed (kernel, package versions) invalidates everything.
+- Cells whose outputs contain errors are never cached, so failures always re-run.
+- A namespace snapshot is only written when every user variable can be pickled
+  (cloudpickle is used in the kernel when available, so notebook-defined
+  functions and classes survive; plain pickle refuses them) and the pickled
+  namespace stays under MAX_SNAPSHOT_MB. Modules are stored by name and
+  re-imported. Without a usable snapshot, execution resumes from the latest
+  earlier cell that has one, or from the top.
+- Pickling a large namespace can cost more than re-running cheap cells, so a
+  snapshot is only taken once the cells executed since the previous one have
+  taken SNAPSHOT_AFTER_SECONDS, and after the last code cell.
+- A snapshot is restored as a whole or not at all: if any value fails to load,
+  the kernel namespace is left untouched and the notebook runs from the top.
+- Cells containing shell escapes or magics (`!`, `%`) may change state outside
+  the namespace, so no snapshot is taken after them.
+- Cells tagged `preview-setup` (injected by the preview generator, e.g. the
+  HTTP cassette cell) patch the kernel outside the namespace. No snapshot is
+  taken after them, and on resume they are executed again before the
+  namespace is restored.
+
+Entries live under previews/.cell_cache/ as <key>.json (outputs) and
+<key>.state (namespace snapshot). The store is bounded by size and evicted
+least-recently-used first, using file modification times as the access clock
+so several preview workers can share it safely.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import nbformat
+from nbclient import NotebookClient
+
+from kernel_pool import run_control_code
+
+CACHE_DIR = Path("previews") / ".cell_cache"
+MAX_CACHE_MB = 512
+
+# Cells with this tag are re-executed on every resume instead of replayed
+SETUP_TAG = 'preview-setup'
+
+# Snapshots are skipped when the pickled namespace would be larger than this
+MAX_SNAPSHOT_MB = 64
+# Cells cheaper than this (in total since the last snapshot) are re-run instead
+SNAPSHOT_AFTER_SECONDS = 2.0
+
+# Runs in the kernel after a cell; writes the user namespace to __bc_path
+SNAPSHOT_CODE = """
+def __bc_snapshot(path, max_bytes):
+    import os, re, types
+    try:
+        import cloudpickle as pickler
+    except ImportError:
+        import pickle as pickler
+    ip = get_ipython()
+    skip = re.compile(r'^(_{1,3}|_i+\\d*|_\\d+|_[oid]h|__.*__|__bc_.*|In|Out|get_ipython|exit|quit)$')
+    values, modules, size = {}, {}, 0
+    for name, value in list(ip.user_ns.items()):
+        if name in ip.user_ns_hidden or skip.match(name):
+            continue
+        if isinstance(value, types.ModuleType):
+            modules[name] = value.__name__
+            continue
+        if (pickler.__name__ == 'pickle' and isinstance(value, (types.FunctionType, type))
+                and getattr(value, '__module__', None) == '__main__'):
+            return False
+        try:
+            values[name] = pickler.dumps(value)
+        except Exception:
+            return False
+        size += len(values[name])
+        if size > max_bytes:
+            return False
+    state = {'values': values, 'modules': modules, 'environ': dict(os.environ),
+             'execution_count': ip.execution_count}
+    with open(path + '.tmp', 'wb') as f:
+        pickler.dump(state, f)
+    os.replace(path + '.tmp', path)
+    return True
+__bc_snapshot(__bc_path, __bc_max_bytes)
+del __bc_snapshot
+"""
+
+# Runs in a fresh kernel to restore a namespace written by SNAPSHOT_CODE
+RESTORE_CODE = """
+def __bc_restore(path):
+    import importlib, os, pickle
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+    ip = get_ipython()
+    # Load everything before touching the namespace, so a failure leaves it as it was
+    restored = {name: importlib.import_module(module) for name, module in state['modules'].items()}
+    restored.update((name, pickle.loads(blob)) for name, blob in state['values'].items())
+    ip.user_ns.update(restored)
+    os.environ.clear()
+    os.environ.update(state['environ'])
+    ip.execution_count = state['execution_count']
+__bc_restore(__bc_path)
+del __bc_restore
+"""
+
+
+def cell_keys(cells, seed=""):
+    """Map each code cell index to the cumulative hash of all code up to it."""
+    keys = {}
+    digest = hashlib.sha256(seed.encode('utf-8'))
+    for index, cell in enumerate(cells):
+        if cell.cell_type != 'code':
+            continue
+        digest.update(b'\0' + cell.source.encode('utf-8'))
+        keys[index] = digest.copy().hexdigest()
+    return keys
+
+
+def _has_error(cell):
+    return any(output.get('output_type') == 'error' for output in cell.get('outputs', []))
+
+
+def _is_setup(cell):
+    return SETUP_TAG in cell.get('metadata', {}).get('tags', [])
+
+
+def _touches_external_state(cell):
+    if _is_setup(cell):
+        return True
+    return any(line.lstrip().startswith(('!', '%')) for line in cell.source.splitlines())
+
+
+class CellCache:
+    """Size-bounded on-disk store of cell outputs and namespace snapshots."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_mb=MAX_CACHE_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _outputs_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def state_path(self, key):
+        return self.cache_dir / f"{key}.state"
+
+    def load_outputs(self, key):
+        """Cached outputs for a cell key, or None. Marks the entry as recently used."""
+        path = self._outputs_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return entry
+
+    def store_outputs(self, key, cell):
+        """Cache an executed cell's outputs unless it errored."""
+        if _has_error(cell):
+            return
+        entry = {
+            'outputs': cell.get('outputs', []),
+            'execution_count': cell.get('execution_count'),
+        }
+        path = self._outputs_path(key)
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def has_state(self, key):
+        path = self.state_path(key)
+        if not path.exists():
+            return False
+        os.utime(path)
+        return True
+
+    def discard_state(self, key):
+        try:
+            self.state_path(key).unlink()
+        except OSError:
+            pass
+
+    def cached_prefix(self, keys):
+        """Cached outputs of the leading code cells, up to the first one without an entry."""
+        replay = {}
+        for index in sorted(keys):
+            entry = self.load_outputs(keys[index])
+            if entry is None:
+                break
+            replay[index] = entry
+        return replay
+
+    def resume_point(self, keys, replay=None):
+        """Find where execution can resume.
+
+        Returns (index, replay) where `index` is the last cell whose namespace
+        can be restored (-1 to start from the top) and `replay` maps cell
+        indexes up to `index` to their cached outputs.
+        """
+        if replay is None:
+            replay = self.cached_prefix(keys)
+        resume = max((index for index in replay if self.has_state(keys[index])), default=-1)
+        return resume, {index: entry for index, entry in replay.items() if index <= resume}
+
+    def prune(self):
+        """Evict least-recently-used entries until the store fits its size budget."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.iterdir():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+def _kernel_code(template, path):
+    return (
+        f"__bc_path = {str(Path(path).resolve())!r}\n"
+        f"__bc_max_bytes = {MAX_SNAPSHOT_MB * 1024 * 1024}\n"
+        f"{template}\ndel __bc_path, __bc_max_bytes\n"
+    )
+
+
+def execute_with_cache(ep, notebook, resources, cache, seed="", km=None):
+    """Execute `notebook` with `ep`, replaying cached cells and resuming at the first change.
+
+    Mirrors ExecutePreprocessor.preprocess(), but skips the cached prefix.
+    Returns the number of code cells that were replayed instead of executed.
+    """
+    started = time.time()
+    keys = cell_keys(notebook.cells, seed)
+    cached = cache.cached_prefix(keys)
+    if len(cached) == len(keys):
+        # No code changed (e.g. only markdown was edited): replay everything, no kernel
+        for index, entry in cached.items():
+            notebook.cells[index].outputs = [nbformat.from_dict(o) for o in entry['outputs']]
+            notebook.cells[index].execution_count = entry['execution_count']
+        print(f"    ♻️  Replayed all {len(cached)} code cell(s) without starting a kernel")
+        return len(cached)
+    resume, replay = cache.resume_point(keys, cached)
+
+    NotebookClient.__init__(ep, notebook, km)
+    ep.reset_execution_trackers()
+    ep._check_assign_resources(resources)
+
+    with ep.setup_kernel():
+        info_msg = ep.wait_for_reply(ep.kc.kernel_info())
+        if info_msg is not None and 'language_info' in info_msg['content']:
+            notebook.metadata['language_info'] = info_msg['content']['language_info']
+
+        if resume >= 0:
+            # Setup cells first: the snapshot re-imports the modules they load
+            for index, cell in enumerate(notebook.cells[:resume + 1]):
+                if _is_setup(cell):
+                    ep.preprocess_cell(cell, resources, index)
+            state_code = _kernel_code(RESTORE_CODE, cache.state_path(keys[resume]))
+            if not run_control_code(ep.km, state_code):
+                # Snapshot no longer loads (e.g. a package changed); run everything
+                cache.discard_state(keys[resume])
+                resume, replay = -1, {}
+
+        last_code = max(keys)
+        unsnapshotted = 0.0  # execution time since the last snapshot
+        for index, cell in enumerate(notebook.cells):
+            if index <= resume:
+                if index in replay and not _is_setup(cell):
+                    cell.outputs = [nbformat.from_dict(o) for o in replay[index]['outputs']]
+                    cell.execution_count = replay[index]['execution_count']
+                continue
+
+            cell_started = time.perf_counter()
+            ep.preprocess_cell(cell, resources, index)
+            if cell.cell_type != 'code':
+                continue
+            unsnapshotted += time.perf_counter() - cell_started
+            key = keys[index]
+            cache.store_outputs(key, cell)
+            if _has_error(cell) or _touches_external_state(cell):
+                continue
+            if unsnapshotted >= SNAPSHOT_AFTER_SECONDS or index == last_code:
+                run_control_code(ep.km, _kernel_code(SNAPSHOT_CODE, cache.state_path(key)))
+                if cache.has_state(key):
+                    unsnapshotted = 0.0
+
+    ep.set_widgets_metadata()
+    cache.prune()
+
+    replayed = len(replay)
+    if replayed:
+        print(f"    ♻️  Replayed {replayed} cached cell(s), resumed in {time.time() - started:.1f}s")
+    return replayed
@@ -17,6 +17,8 @@ import subprocess
 import sys
 from pathlib import Path
 
+from notebook_catalog import open_catalog
+
 def install_mercury():
     """Ensure Mercury is installed"""
     try:
@@ -88,13 +90,9 @@ def deploy_to_mercury_cloud(notebook_path):
         print("❌ Deployment failed. Make sure you're logged in: mercury login")
 
 def find_notebooks():
-    """Find all notebooks in the project"""
-    notebooks = []
-    for root, dirs, files in os.walk('notebooks'):
-        for file in files:
-            if file.endswith('.ipynb'):
-                notebooks.append(os.path.join(root, file))
-    return notebooks
+    """Find all notebooks in the project (from the shared notebook catalog)"""
+    with open_catalog() as catalog:
+        return [str(path) for path in catalog.paths()]
 
 def main():
     parser = argparse.ArgumentParser(description='Deploy notebooks as mobile web apps')
@@ -5,18 +5,56 @@ Executes notebooks with dummy data and captures markdown renderings.
 """
 
 import os
+import sys
 import json
+import time
+import argparse
+import contextlib
+import multiprocessing.util
 import nbformat
-from nbconvert import HTMLExporter, MarkdownExporter
 from nbconvert.preprocessors import ExecutePreprocessor, CellExecutionError
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import shutil
 
+from cell_cache import SETUP_TAG
+from notebook_catalog import open_catalog
+from notebook_outputs import drop_output_refs
+from validate_notebooks import reject_invalid
+from preview_assets import AssetStore, externalize_assets
+from preview_export import SUFFIXES, ExportPipeline
+from preview_gallery import write_gallery
+from preview_profile import CellProfiler, load_profiles, render_profile_tables
+from preview_thumbnails import SRCSET_WIDTHS, render_thumbnail, srcset
+from preview_schedule import (
+    find_regressions, load_history, longest_first, record_runtime, save_history, timeout_for,
+)
+from preview_cache import (
+    cache_key, env_fingerprint, failed_previously, file_hash, is_up_to_date, load_manifest,
+    manifest_path, notebook_source_hash, record_build, record_failure, save_manifest,
+)
+
 # Configuration
 NOTEBOOKS_DIR = Path("notebooks")
 PREVIEWS_DIR = Path("previews")
-TIMEOUT = 600  # 10 minutes per notebook
+TIMEOUT = 600  # 10 minutes per cell for notebooks without runtime history
 KERNEL_NAME = "python3"
+KERNEL_MEMORY_LIMIT_MB = 2048  # warm kernels above this are recycled
+CELL_CACHE_MAX_MB = 512  # size budget of the per-cell output cache
+
+# Per-cell execution cache, enabled with --cell-cache
+_CELL_CACHE = None
+
+# Warm kernel pool for this process (see init_kernel_pool)
+_KERNEL_POOL = None
+
+# Recorded HTTP responses, one cassette per notebook (see http_cassettes.py)
+CASSETTES_DIR = PREVIEWS_DIR / "cassettes"
+REPO_ROOT = Path(__file__).resolve().parent
+
+# How notebooks reach the network during preview runs (see --http)
+HTTP_MODES = ['replay', 'record', 'skip']
+DEFAULT_HTTP_MODE = 'replay'
 
 # Dummy data for common plant species
 DUMMY_SPECIES = [
@@ -27,17 +65,8 @@ DUMMY_SPECIES = [
     "Trifolium repens"
 ]
 
-def setup_preview_directories():
-    """Create preview directories if they don't exist."""
-    PREVIEWS_DIR.mkdir(exist_ok=True)
-    (PREVIEWS_DIR / "html").mkdir(exist_ok=True)
-    (PREVIEWS_DIR / "markdown").mkdir(exist_ok=True)
-    (PREVIEWS_DIR / "thumbnails").mkdir(exist_ok=True)
-
-def inject_dummy_data(notebook):
-    """Inject dummy data into notebook cells to enable execution."""
-    # Add a cell at the beginning with dummy inputs
-    dummy_cell = nbformat.v4.new_code_cell("""
+# Cell injected at the top of every notebook before execution
+PREVIEW_CELL_SOURCE = """
 # AUTO-INJECTED DUMMY DATA FOR PREVIEW GENERATION
 import os
 os.environ['PREVIEW_MODE'] = 'true'
@@ -55,23 +84,104 @@ USE_DUMMY_DATA = True
 PREVIEW_MODE = True
 
 print("✓ Preview mode enabled with dummy data")
-""")
+"""
+
+# Cell injected after the dummy data cell in replay/record mode
+HTTP_CELL_TEMPLATE = """
+# AUTO-INJECTED HTTP RECORD/REPLAY FOR PREVIEW GENERATION
+import sys
+sys.path.insert(0, {repo_root!r})
+try:
+    import http_cassettes
+    http_cassettes.install({cassette!r}, mode={mode!r})
+    print("✓ HTTP {mode} enabled")
+except ImportError:
+    pass  # requests not installed, nothing to patch
+finally:
+    sys.path.remove({repo_root!r})
+"""
+
+# Names this generator's build manifest and is part of every cache key
+GENERATOR = 'generate_previews'
+
+# Exporter settings; part of the incremental cache key
+EXPORT_SETTINGS = {
+    'generator': GENERATOR,
+    'html_template': 'classic',
+    'assets': 'webp-1160',  # bump when preview_assets output changes
+}
+
+# Output formats rendered from each executed notebook (see --formats)
+DEFAULT_FORMATS = ['html', 'markdown']
+FORMAT_DIRS = {'html': 'html', 'markdown': 'markdown', 'slides': 'slides', 'pdf': 'pdf'}
+
+# Exporters are created once per process and reused for every notebook
+_EXPORT_PIPELINES = {}
+
+# Images and template CSS shared by all HTML previews (see preview_assets.py)
+ASSETS_DIR = PREVIEWS_DIR / "assets"
+_ASSET_STORE = None
+
+def setup_preview_directories():
+    """Create preview directories if they don't exist."""
+    PREVIEWS_DIR.mkdir(exist_ok=True)
+    (PREVIEWS_DIR / "html").mkdir(exist_ok=True)
+    (PREVIEWS_DIR / "markdown").mkdir(exist_ok=True)
+    (PREVIEWS_DIR / "thumbnails").mkdir(exist_ok=True)
+    (PREVIEWS_DIR / "logs").mkdir(exist_ok=True)
+    ASSETS_DIR.mkdir(exist_ok=True)
+
+def inject_dummy_data(notebook):
+    """Inject dummy data into notebook cells to enable execution."""
+    # Add a cell at the beginning with dummy inputs
+    dummy_cell = nbformat.v4.new_code_cell(PREVIEW_CELL_SOURCE)
     
     # Insert at position 1 (after any title cells)
     notebook.cells.insert(1, dummy_cell)
     return notebook
 
-def modify_notebook_for_preview(nb_path):
-    """Modify notebook to use dummy data instead of real API calls."""
+def cassette_path(nb_path):
+    """The recorded HTTP traffic file for a notebook."""
+    return CASSETTES_DIR / f"{preview_name(nb_path)}.json"
+
+def inject_http_cassette(notebook, nb_path, http_mode):
+    """Route the notebook's requests traffic through its cassette."""
+    http_cell = nbformat.v4.new_code_cell(HTTP_CELL_TEMPLATE.format(
+        repo_root=str(REPO_ROOT),
+        cassette=str(cassette_path(nb_path).resolve()),
+        mode=http_mode,
+    ))
+    # Patches requests outside the namespace, so the cell cache re-runs it on resume
+    http_cell.metadata['tags'] = [SETUP_TAG]
+    
+    # Right after the dummy data cell, before any notebook code
+    notebook.cells.insert(2, http_cell)
+    return notebook
+
+def modify_notebook_for_preview(nb_path, http_mode=DEFAULT_HTTP_MODE):
+    """Modify notebook to use dummy data and recorded HTTP responses."""
     with open(nb_path, 'r', encoding='utf-8') as f:
         notebook = nbformat.read(f, as_version=4)
     
+    # Execution produces fresh outputs; stored ones must not be rehydrated over them
+    drop_output_refs(notebook)
+    
     # Inject dummy data
     notebook = inject_dummy_data(notebook)
     
-    # Modify cells to skip API calls
+    if http_mode == 'replay' and not cassette_path(nb_path).exists():
+        # Nothing recorded yet; replaying would fail every request
+        print(f"    ℹ️  No cassette for {nb_path.name}; skipping API cells instead "
+              f"(record one with --http record)")
+        http_mode = 'skip'
+    
+    if http_mode != 'skip':
+        # Notebook code runs unchanged; HTTP calls are served from the cassette
+        return inject_http_cassette(notebook, nb_path, http_mode)
+    
+    # Legacy mode: disable cells that look like they call APIs
     for cell in notebook.cells:
-        if cell.cell_type == 'code':
+        if cell.cell_type == 'code' and cell.source != PREVIEW_CELL_SOURCE:
             source = cell.source
             
             # Skip cells with API calls
@@ -87,16 +197,33 @@ else:
     
     return notebook
 
-def execute_notebook(nb_path, output_path=None):
-    """Execute a notebook and optionally save the result."""
+def run_preprocessor(ep, notebook, nb_path, km=None):
+    """Execute a notebook, going through the per-cell cache when it is enabled."""
+    resources = {'metadata': {'path': nb_path.parent}}
+    if _CELL_CACHE is not None:
+        from cell_cache import execute_with_cache
+        # Replayed outputs depend on the recorded HTTP responses too
+        cassette = cassette_path(nb_path)
+        seed = env_fingerprint(KERNEL_NAME) + (file_hash(cassette) if cassette.exists() else '')
+        execute_with_cache(ep, notebook, resources, _CELL_CACHE, seed, km=km)
+    else:
+        ep.preprocess(notebook, resources, km=km)
+
+def execute_notebook(nb_path, output_path=None, http_mode=DEFAULT_HTTP_MODE, budget=None):
+    """Execute a notebook and optionally save the result.
+    
+    With a `budget` (seconds), the whole notebook must finish within it;
+    otherwise each cell gets TIMEOUT.
+    """
     try:
-        print(f"  Executing: {nb_path.name}")
+        budget_note = f" (budget {budget}s from runtime history)" if budget is not None else ""
+        print(f"  Executing: {nb_path.name}{budget_note}")
         
         with open(nb_path, 'r', encoding='utf-8') as f:
             notebook = nbformat.read(f, as_version=4)
         
         # Modify for preview
-        notebook = modify_notebook_for_preview(nb_path)
+        notebook = modify_notebook_for_preview(nb_path, http_mode)
         
         # Execute with preprocessor
         ep = ExecutePreprocessor(
@@ -104,11 +231,32 @@ def execute_notebook(nb_path, output_path=None):
             kernel_name=KERNEL_NAME,
             allow_errors=True  # Continue on errors for preview
         )
+        if budget is not None:
+            # Each cell may use whatever is left of the notebook's budget
+            deadline = time.monotonic() + budget
+            ep.timeout_func = lambda cell: max(1, int(deadline - time.monotonic()))
+        
+        # Record per-cell wall time, kernel memory and output size
+        profiler = CellProfiler(preview_name(nb_path))
+        profiler.attach(ep)
         
         try:
-            ep.preprocess(notebook, {'metadata': {'path': nb_path.parent}})
+            if _KERNEL_POOL is not None:
+                with _KERNEL_POOL.kernel(cwd=nb_path.parent) as km:
+                    try:
+                        run_preprocessor(ep, notebook, nb_path, km=km)
+                    finally:
+                        # The pool owns the kernel; only close this notebook's client
+                        if ep.kc is not None:
+                            ep.kc.stop_channels()
+            else:
+                run_preprocessor(ep, notebook, nb_path)
         except CellExecutionError as e:
             print(f"    ⚠️  Warning: Some cells failed to execute: {str(e)[:100]}")
+        finally:
+            profiler.stop()
+            if profiler.cells:
+                profiler.write(PREVIEWS_DIR / "profile")
         
         if output_path:
             with open(output_path, 'w', encoding='utf-8') as f:
@@ -116,18 +264,38 @@ def execute_notebook(nb_path, output_path=None):
         
         return notebook
     
+    except TimeoutError:
+        if budget is not None:
+            print(f"    ⏱️  {nb_path.name} exceeded its {budget}s budget; stopped as a runaway")
+        else:
+            print(f"    ⏱️  A cell in {nb_path.name} exceeded the {TIMEOUT}s per-cell timeout")
+        return None
     except Exception as e:
         print(f"    ❌ Error executing {nb_path.name}: {str(e)[:100]}")
         return None
 
-def generate_html_preview(notebook, output_path):
-    """Generate HTML preview from executed notebook."""
+def get_export_pipeline(formats):
+    """Return this process's export pipeline for `formats`, creating it on first use."""
+    key = tuple(formats)
+    if key not in _EXPORT_PIPELINES:
+        _EXPORT_PIPELINES[key] = ExportPipeline(
+            formats,
+            template=EXPORT_SETTINGS['html_template'],
+            exclude_input=False,  # previews show the code
+            config_file=NOTEBOOKS_DIR / "nbconvert_config.py",
+        )
+    return _EXPORT_PIPELINES[key]
+
+def get_asset_store():
+    """Return this process's asset store, creating it on first use."""
+    global _ASSET_STORE
+    if _ASSET_STORE is None:
+        _ASSET_STORE = AssetStore(ASSETS_DIR)
+    return _ASSET_STORE
+
+def generate_html_preview(body, output_path):
+    """Write the HTML preview for a rendered notebook."""
     try:
-        html_exporter = HTMLExporter()
-        html_exporter.template_name = 'classic'
-        
-        (body, resources) = html_exporter.from_notebook_node(notebook)
-        
         # Add custom CSS for better preview
         custom_css = """
         <style>
@@ -159,6 +327,9 @@ def generate_html_preview(notebook, output_path):
         
         body = body.replace('<body>', f'<body>{custom_css}{preview_notice}')
         
+        # Move base64 images and template CSS into the shared asset store
+        body = externalize_assets(body, get_asset_store(), url_prefix="../assets/")
+        
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(body)
         
@@ -169,12 +340,9 @@ def generate_html_preview(notebook, output_path):
         print(f"    ❌ Error generating HTML: {str(e)[:100]}")
         return False
 
-def generate_markdown_preview(notebook, output_path):
-    """Generate Markdown preview from executed notebook."""
+def generate_markdown_preview(body, resources, output_path):
+    """Write the Markdown preview (and its extracted images) for a rendered notebook."""
     try:
-        md_exporter = MarkdownExporter()
-        (body, resources) = md_exporter.from_notebook_node(notebook)
-        
         # Add preview notice
         preview_notice = """
 ---
@@ -186,8 +354,7 @@ This is a static snapshot generated with dummy data for demonstration purposes.
 """
         body = preview_notice + body
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(body)
+        ExportPipeline.write({'markdown': (body, resources)}, {'markdown': output_path})
         
         print(f"    ✓ Markdown preview saved: {output_path.name}")
         return True
@@ -196,181 +363,321 @@ This is a static snapshot generated with dummy data for demonstration purposes.
         print(f"    ❌ Error generating Markdown: {str(e)[:100]}")
         return False
 
-def create_preview_index():
-    """Create an index.html page listing all previews."""
-    html_previews = list((PREVIEWS_DIR / "html").glob("*.html"))
-    
-    preview_items = []
-    for preview_path in sorted(html_previews):
-        name = preview_path.stem
-        category = name.split('_')[0] if '_' in name else 'other'
-        preview_items.append({
-            'name': name,
-            'category': category,
-            'path': f'html/{preview_path.name}'
-        })
-    
-    # Group by category
-    categories = {}
-    for item in preview_items:
-        cat = item['category']
-        if cat not in categories:
-            categories[cat] = []
-        categories[cat].append(item)
-    
-    # Generate HTML
-    html = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Notebook Previews - Botanical Colabs</title>
-    <style>
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Helvetica, Arial, sans-serif;
-            max-width: 1400px;
-            margin: 0 auto;
-            padding: 40px 20px;
-            background: #f6f8fa;
-        }
-        h1 {
-            color: #24292f;
-            border-bottom: 2px solid #d0d7de;
-            padding-bottom: 10px;
-        }
-        .category {
-            margin: 40px 0;
-        }
-        .category h2 {
-            color: #0969da;
-            text-transform: capitalize;
-        }
-        .preview-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-            gap: 20px;
-            margin-top: 20px;
-        }
-        .preview-card {
-            background: white;
-            border: 1px solid #d0d7de;
-            border-radius: 8px;
-            padding: 20px;
-            transition: all 0.2s;
-        }
-        .preview-card:hover {
-            border-color: #0969da;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-            transform: translateY(-2px);
-        }
-        .preview-card a {
-            color: #24292f;
-            text-decoration: none;
-            font-weight: 600;
-            display: block;
-        }
-        .preview-card a:hover {
-            color: #0969da;
-        }
-        .badge {
-            display: inline-block;
-            background: #ddf4ff;
-            color: #0969da;
-            padding: 4px 10px;
-            border-radius: 12px;
-            font-size: 12px;
-            margin-top: 10px;
-        }
-    </style>
-</head>
-<body>
-    <h1>📓 Notebook Previews</h1>
-    <p>Static snapshots of executed notebooks with dummy data for demonstration purposes.</p>
-"""
-    
-    for category, items in sorted(categories.items()):
-        html += f"""
-    <div class="category">
-        <h2>{category.replace('_', ' ').title()}</h2>
-        <div class="preview-grid">
-"""
-        for item in items:
-            display_name = item['name'].replace('_', ' ').replace('-', ' ').title()
-            html += f"""
-            <div class="preview-card">
-                <a href="{item['path']}">{display_name}</a>
-                <span class="badge">Preview</span>
-            </div>
-"""
-        html += """
-        </div>
-    </div>
-"""
+def create_preview_index(notebooks, formats=DEFAULT_FORMATS):
+    """Create the searchable index.html gallery for the notebooks that have previews."""
+    previews = []
+    for nb_path in notebooks:
+        paths = preview_paths(nb_path, formats)
+        path = paths.get('html', next(iter(paths.values())))
+        name = preview_name(nb_path)
+        thumbnail = None
+        if (PREVIEWS_DIR / "thumbnails" / f"{name}-{SRCSET_WIDTHS[0]}.webp").exists():
+            thumbnail = {
+                'src': f"thumbnails/{name}-{SRCSET_WIDTHS[0]}.webp",
+                'srcset': srcset(name, "thumbnails/"),
+            }
+        previews.append((nb_path, path.relative_to(PREVIEWS_DIR).as_posix(), thumbnail))
     
-    html += """
-</body>
-</html>
-"""
+    # Slowest cells / heaviest outputs across all profiled notebooks
+    profile_html = render_profile_tables(load_profiles(PREVIEWS_DIR / "profile"))
     
-    with open(PREVIEWS_DIR / "index.html", 'w', encoding='utf-8') as f:
-        f.write(html)
+    count = write_gallery(
+        previews,
+        PREVIEWS_DIR / "index.html",
+        title="Notebook Previews",
+        subtitle="Static snapshots of executed notebooks with dummy data for demonstration purposes.",
+        extra_html=profile_html,
+        notebooks_dir=NOTEBOOKS_DIR,
+    )
     
-    print(f"\n✓ Preview index created: previews/index.html")
+    print(f"\n✓ Preview index created: previews/index.html ({count} notebooks)")
+
+def preview_name(nb_path):
+    """Flatten a notebook path into the preview file stem, e.g. regional_foo."""
+    relative_path = nb_path.relative_to(NOTEBOOKS_DIR)
+    return str(relative_path).replace('/', '_').replace('\\', '_').replace('.ipynb', '')
+
+def preview_paths(nb_path, formats=DEFAULT_FORMATS):
+    """Map each output format to the file process_notebook() writes for it."""
+    output_name = preview_name(nb_path)
+    return {
+        fmt: PREVIEWS_DIR / FORMAT_DIRS[fmt] / f"{output_name}{SUFFIXES[fmt]}"
+        for fmt in formats
+    }
 
-def process_notebook(nb_path):
+def preview_artifacts(nb_path, formats=DEFAULT_FORMATS):
+    """Paths of the files process_notebook() writes for a notebook."""
+    return list(preview_paths(nb_path, formats).values())
+
+def preview_cache_key(nb_path, fingerprint, formats=DEFAULT_FORMATS, http_mode=DEFAULT_HTTP_MODE):
+    """Cache key covering everything that influences a notebook's previews."""
+    cassette = cassette_path(nb_path)
+    return cache_key(
+        notebook_source_hash(nb_path),
+        PREVIEW_CELL_SOURCE,
+        dict(EXPORT_SETTINGS, formats=sorted(formats), http_mode=http_mode),
+        file_hash(cassette) if cassette.exists() else None,
+        fingerprint,
+    )
+
+def process_notebook(nb_path, formats=DEFAULT_FORMATS, http_mode=DEFAULT_HTTP_MODE, budget=None):
     """Process a single notebook and generate previews."""
     print(f"\n📓 Processing: {nb_path.relative_to(NOTEBOOKS_DIR)}")
     
-    # Create output filename
-    relative_path = nb_path.relative_to(NOTEBOOKS_DIR)
-    output_name = str(relative_path).replace('/', '_').replace('\\', '_').replace('.ipynb', '')
-    
     # Execute notebook
-    executed_nb = execute_notebook(nb_path)
+    executed_nb = execute_notebook(nb_path, http_mode=http_mode, budget=budget)
     
     if executed_nb is None:
         print(f"    ⏭️  Skipping preview generation (execution failed)")
         return False
     
-    # Generate HTML preview
-    html_path = PREVIEWS_DIR / "html" / f"{output_name}.html"
-    generate_html_preview(executed_nb, html_path)
+    # Render every format from the one executed notebook
+    paths = preview_paths(nb_path, formats)
+    rendered = get_export_pipeline(formats).export(executed_nb, stem=preview_name(nb_path))
     
-    # Generate Markdown preview
-    md_path = PREVIEWS_DIR / "markdown" / f"{output_name}.md"
-    generate_markdown_preview(executed_nb, md_path)
+    ok = True
+    for fmt, path in paths.items():
+        body, resources = rendered[fmt]
+        if body is None:
+            print(f"    ❌ Error generating {fmt}: {resources['error'][:100]}")
+            ok = False
+        elif fmt == 'html':
+            ok = generate_html_preview(body, path) and ok
+        elif fmt == 'markdown':
+            ok = generate_markdown_preview(body, resources, path) and ok
+        else:
+            ExportPipeline.write(rendered, {fmt: path})
+            print(f"    ✓ {fmt.upper()} preview saved: {path.name}")
+    
+    # Gallery thumbnail from the first figure the notebook produced
+    try:
+        title = nb_path.stem.replace('_', ' ').replace('-', ' ').title()
+        if render_thumbnail(executed_nb, title, PREVIEWS_DIR / "thumbnails", preview_name(nb_path)):
+            print(f"    ✓ Thumbnail saved: {preview_name(nb_path)}.png")
+    except Exception as e:
+        print(f"    ⚠️  Warning: thumbnail failed: {str(e)[:100]}")
     
-    return True
+    return ok
 
-def main():
+def init_kernel_pool(size):
+    """Start a pool of warm kernels reused by every notebook this process executes.
+    
+    Also used as the ProcessPoolExecutor initializer, so each worker gets its own pool.
+    """
+    global _KERNEL_POOL
+    from kernel_pool import KernelPool
+    
+    _KERNEL_POOL = KernelPool(size, KERNEL_NAME, KERNEL_MEMORY_LIMIT_MB).start()
+    # Runs on normal exit of both the main process and pool workers
+    multiprocessing.util.Finalize(_KERNEL_POOL, _KERNEL_POOL.shutdown, exitpriority=10)
+
+def init_cell_cache():
+    """Enable the per-cell execution cache for this process."""
+    global _CELL_CACHE
+    from cell_cache import CellCache
+    
+    _CELL_CACHE = CellCache(max_mb=CELL_CACHE_MAX_MB)
+
+def init_worker(warm_kernels, cell_cache):
+    """ProcessPoolExecutor initializer: set up per-worker kernel pool and caches."""
+    if warm_kernels:
+        init_kernel_pool(1)
+    if cell_cache:
+        init_cell_cache()
+
+def process_notebook_timed(nb_path, formats=DEFAULT_FORMATS, http_mode=DEFAULT_HTTP_MODE, budget=None):
+    """Process one notebook; returns (succeeded, wall seconds)."""
+    started = time.perf_counter()
+    ok = process_notebook(nb_path, formats, http_mode, budget)
+    return ok, time.perf_counter() - started
+
+def process_notebook_logged(nb_path, formats=DEFAULT_FORMATS, http_mode=DEFAULT_HTTP_MODE, budget=None):
+    """Worker entry point: process one notebook with output sent to its own log.
+    
+    Each worker process starts and owns its own kernel through
+    ExecutePreprocessor, so notebooks never share interpreter state.
+    Returns (succeeded, wall seconds).
+    """
+    log_path = PREVIEWS_DIR / "logs" / f"{preview_name(nb_path)}.log"
+    try:
+        with open(log_path, 'w', encoding='utf-8') as log:
+            with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+                return process_notebook_timed(nb_path, formats, http_mode, budget)
+    except Exception as e:
+        # Never let one notebook take down the pool
+        print(f"    ❌ Worker error for {nb_path.name}: {str(e)[:100]}")
+        return False, 0.0
+
+def run_parallel(notebooks, jobs, warm_kernels=False, cell_cache=False, formats=DEFAULT_FORMATS,
+                 http_mode=DEFAULT_HTTP_MODE, budgets=None):
+    """Process notebooks concurrently in a pool of at most `jobs` workers.
+    
+    Notebooks are submitted in the given order. Returns a dict mapping each
+    notebook whose previews were generated successfully to its wall time.
+    """
+    print(f"Running with {jobs} parallel workers (logs in {PREVIEWS_DIR / 'logs'})\n")
+    budgets = budgets or {}
+    
+    succeeded = {}
+    # With warm kernels, each worker pre-starts one kernel and keeps it for all its notebooks
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(warm_kernels, cell_cache)) as pool:
+        futures = {
+            pool.submit(process_notebook_logged, nb_path, formats, http_mode, budgets.get(nb_path)): nb_path
+            for nb_path in notebooks
+        }
+        for future in as_completed(futures):
+            nb_path = futures[future]
+            try:
+                ok, seconds = future.result()
+            except Exception as e:
+                print(f"  ❌ {nb_path.relative_to(NOTEBOOKS_DIR)}: {str(e)[:100]}")
+                continue
+            
+            if ok:
+                succeeded[nb_path] = seconds
+                print(f"  ✓ {nb_path.relative_to(NOTEBOOKS_DIR)} ({seconds:.1f}s)")
+            else:
+                print(f"  ❌ {nb_path.relative_to(NOTEBOOKS_DIR)} (see logs/{preview_name(nb_path)}.log)")
+    
+    return succeeded
+
+def report_regressions(history, runtimes):
+    """Print notebooks that got much slower than their usual runtime."""
+    regressions = find_regressions(history, runtimes)
+    if not regressions:
+        return
+    print(f"\n🐢 {len(regressions)} notebook(s) ran slower than their baseline:")
+    for name, seconds, baseline in regressions:
+        print(f"  {name}: {seconds:.1f}s vs {baseline:.1f}s median ({seconds / baseline:.1f}×)")
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description='Generate web preview snapshots from Jupyter notebooks')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of notebooks to execute concurrently (default: 1)')
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS),
+                        help='Comma-separated output formats: html, markdown, slides, pdf (default: html,markdown)')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every preview, ignoring the incremental cache')
+    parser.add_argument('--warm-kernels', action='store_true',
+                        help='Reuse pre-started kernels across notebooks instead of starting one per notebook')
+    parser.add_argument('--cell-cache', action='store_true',
+                        help='Replay cached cell outputs and resume execution at the first changed cell')
+    parser.add_argument('--http', choices=HTTP_MODES, default=DEFAULT_HTTP_MODE,
+                        help='replay: serve HTTP from previews/cassettes (default); '
+                             'record: make real requests and refresh the cassettes; '
+                             'skip: disable cells that look like API calls')
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main execution function."""
+    args = parse_args(argv)
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMAT_DIRS]
+    if unknown:
+        print(f"❌ Unknown format(s): {', '.join(unknown)}")
+        return
+    jobs = max(1, min(args.jobs, os.cpu_count() or 1))
+    
     print("🎨 Notebook Preview Generator")
     print("=" * 50)
     
     # Setup directories
     setup_preview_directories()
     
-    # Find all notebooks
-    notebooks = list(NOTEBOOKS_DIR.rglob("*.ipynb"))
-    notebooks = [nb for nb in notebooks if '.ipynb_checkpoints' not in str(nb)]
+    # Find all notebooks (the catalog only rescans files that changed)
+    catalog = open_catalog()
+    notebooks = catalog.paths()
     
     print(f"\nFound {len(notebooks)} notebooks to process\n")
+    total = len(notebooks)
     
-    # Process each notebook
-    success_count = 0
+    # Reject broken notebooks before any kernel starts. Schema gaps such as
+    # missing outputs are filled in by execution, so only JSON and syntax count.
+    notebooks = reject_invalid(notebooks, checks=('json', 'syntax'))
+    
+    # Skip notebooks whose cache key matches the last successful build
+    manifest = load_manifest(manifest_path(GENERATOR))
+    fingerprint = env_fingerprint(KERNEL_NAME)
+    keys = {nb_path: preview_cache_key(nb_path, fingerprint, formats, args.http) for nb_path in notebooks}
+    # Recording always re-executes so every cassette is refreshed
+    force = args.force or args.http == 'record'
+    if args.http == 'record':
+        CASSETTES_DIR.mkdir(parents=True, exist_ok=True)
+        for nb_path in notebooks:
+            cassette_path(nb_path).unlink(missing_ok=True)
+    cached = []
+    skipped = []
+    stale = []
     for nb_path in notebooks:
-        if process_notebook(nb_path):
-            success_count += 1
+        name = preview_name(nb_path)
+        if not force and is_up_to_date(manifest, name, keys[nb_path]):
+            cached.append(nb_path)
+        elif not force and failed_previously(manifest, name, keys[nb_path]):
+            skipped.append(nb_path)
+        else:
+            stale.append(nb_path)
+    cached_count = len(cached)
+    if cached_count:
+        print(f"♻️  Reusing {cached_count} unchanged preview(s) from cache")
+    if skipped:
+        print(f"⏭️  Skipping {len(skipped)} unchanged notebook(s) that failed last time (use --force to retry)")
+    
+    # Replayed cells would make no requests and leave the cassettes incomplete
+    cell_cache = args.cell_cache and args.http != 'record'
+    
+    # Longest first, so the slowest notebook doesn't start last; budgets from past runs
+    history = load_history()
+    stale = longest_first(stale, history, preview_name)
+    budgets = {
+        nb_path: timeout_for(history, preview_name(nb_path), None)
+        for nb_path in stale
+    }
+    
+    # Process each notebook
+    if jobs > 1 and len(stale) > 1:
+        succeeded = run_parallel(stale, jobs, args.warm_kernels, cell_cache, formats, args.http, budgets)
+    else:
+        if stale:
+            init_worker(args.warm_kernels, cell_cache)
+        succeeded = {}
+        for nb_path in stale:
+            ok, seconds = process_notebook_timed(nb_path, formats, args.http, budgets[nb_path])
+            if ok:
+                succeeded[nb_path] = seconds
+    
+    # Replayed cells make runs look faster than a full execution; keep them out of the history
+    if not cell_cache:
+        runtimes = {preview_name(nb_path): seconds for nb_path, seconds in succeeded.items()}
+        report_regressions(history, runtimes)
+        for name, seconds in runtimes.items():
+            record_runtime(history, name, seconds)
+        save_history(history)
+    
+    for nb_path in stale:
+        if nb_path in succeeded:
+            record_build(manifest, preview_name(nb_path), keys[nb_path], preview_artifacts(nb_path, formats))
+            catalog.record_execution(nb_path, succeeded[nb_path])
+            artifacts = preview_paths(nb_path, formats)
+            thumbnail = PREVIEWS_DIR / "thumbnails" / f"{preview_name(nb_path)}.png"
+            if thumbnail.exists():
+                artifacts['thumbnail'] = thumbnail
+            catalog.record_artifacts(nb_path, artifacts)
+        else:
+            record_failure(manifest, preview_name(nb_path), keys[nb_path])
+    save_manifest(manifest, manifest_path(GENERATOR))
+    catalog.close()
+    success_count = cached_count + len(succeeded)
     
     # Create index page
-    create_preview_index()
+    create_preview_index(sorted(cached + list(succeeded)), formats)
     
     print("\n" + "=" * 50)
     print(f"✓ Preview generation complete!")
-    print(f"  Processed: {success_count}/{len(notebooks)} notebooks")
+    print(f"  Processed: {success_count}/{total} notebooks")
     print(f"  Output directory: {PREVIEWS_DIR.absolute()}")
     print(f"  View previews: {(PREVIEWS_DIR / 'index.html').absolute()}")
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -1,25 +1,124 @@
 #!/usr/bin/env python3
 """
 Simple notebook to HTML converter for preview generation.
-Uses nbconvert command-line tool to generate static previews.
+Converts notebooks to static previews with nbconvert's HTMLExporter, loaded
+once and reused for every notebook (optionally in a small pool of workers).
+
+Usage:
+    python generate_simple_previews.py [--force] [--jobs N] [--benchmark [N]]
 """
 
 import subprocess
 import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import json
 
+import nbformat
+from traitlets.config import Config
+
+from notebook_catalog import open_catalog
+from validate_notebooks import reject_invalid
+from preview_cache import (
+    cache_key, env_fingerprint, failed_previously, is_up_to_date,
+    load_manifest, manifest_path, record_build, record_failure, save_manifest,
+)
+from preview_export import ExportPipeline
+from preview_gallery import write_gallery
+from preview_thumbnails import SRCSET_WIDTHS, render_thumbnails, srcset
+
 NOTEBOOKS_DIR = Path("notebooks")
 PREVIEWS_DIR = Path("previews")
 
+# Names this generator's build manifest and is part of every cache key
+GENERATOR = 'generate_simple_previews'
+
+# Converter settings; part of the incremental cache key
+EXPORT_SETTINGS = {
+    'generator': GENERATOR,
+    'to': 'html',
+    'template': 'classic',
+    'no_input': True,
+}
+
 def setup_directories():
     """Create preview directories."""
     PREVIEWS_DIR.mkdir(exist_ok=True)
     (PREVIEWS_DIR / "html").mkdir(exist_ok=True)
     print(f"✓ Created preview directories in: {PREVIEWS_DIR.absolute()}")
 
+# Same as `jupyter nbconvert --no-input`: hide code cells and prompts, show only outputs
+NO_INPUT_CONFIG = Config({
+    'TemplateExporter': {
+        'exclude_input': True,
+        'exclude_input_prompt': True,
+        'exclude_output_prompt': True,
+    }
+})
+
+# HTML exporter of this process, created on first use (see get_pipeline)
+_PIPELINE = None
+
+def get_pipeline():
+    """Return this process's HTML export pipeline, loading nbconvert's templates once."""
+    global _PIPELINE
+    if _PIPELINE is None:
+        _PIPELINE = ExportPipeline(['html'], template=EXPORT_SETTINGS['template'], config=NO_INPUT_CONFIG)
+    return _PIPELINE
+
+def convert_notebook(nb_path, output_path):
+    """Convert one notebook with the in-process exporter.
+    
+    Returns (succeeded, message) so workers can report back to the main process.
+    """
+    try:
+        with open(nb_path, 'r', encoding='utf-8') as f:
+            notebook = nbformat.read(f, as_version=4)
+        body, resources = get_pipeline().export(notebook, stem=nb_path.stem)['html']
+        if body is None:
+            return False, resources['error']
+        ExportPipeline.write({'html': (body, resources)}, {'html': output_path})
+        return True, ''
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
 def convert_notebook_to_html(nb_path, output_path):
-    """Convert a notebook to HTML using nbconvert."""
+    """Convert a notebook to HTML, printing the result."""
+    ok, message = convert_notebook(nb_path, output_path)
+    report_conversion(nb_path, output_path, ok, message)
+    return ok
+
+def report_conversion(nb_path, output_path, ok, message):
+    """Print the outcome of one conversion."""
+    if ok:
+        print(f"  ✓ {nb_path.name} → {output_path.name}")
+    else:
+        print(f"  ❌ Failed: {nb_path.name}")
+        print(f"     {message[:100]}")
+
+def convert_batch(pairs, workers=1):
+    """Convert (nb_path, output_path) pairs; yields (nb_path, output_path, ok).
+    
+    With workers > 1 the work is spread over long-lived worker processes,
+    each of which loads the exporter once.
+    """
+    if workers <= 1 or len(pairs) <= 1:
+        for nb_path, output_path in pairs:
+            yield nb_path, output_path, convert_notebook_to_html(nb_path, output_path)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(convert_notebook, *zip(*pairs), chunksize=4)
+        for (nb_path, output_path), (ok, message) in zip(pairs, results):
+            report_conversion(nb_path, output_path, ok, message)
+            yield nb_path, output_path, ok
+
+def convert_notebook_subprocess(nb_path, output_path):
+    """Convert a notebook with a `jupyter nbconvert` subprocess (the old method; see --benchmark)."""
     try:
         cmd = [
             "jupyter", "nbconvert",
@@ -48,198 +147,196 @@ def convert_notebook_to_html(nb_path, output_path):
         return False
 
 def create_preview_index(processed_files):
-    """Create index.html listing all previews."""
-    
-    # Group by category
-    categories = {}
+    """Create the searchable index.html gallery of all previews."""
+    previews = []
     for nb_path, html_path in processed_files:
-        parts = nb_path.relative_to(NOTEBOOKS_DIR).parts
-        category = parts[0] if len(parts) > 1 else 'root'
-        
-        if category not in categories:
-            categories[category] = []
-        
-        categories[category].append({
-            'name': nb_path.stem,
-            'path': html_path.relative_to(PREVIEWS_DIR)
-        })
-    
-    html = """<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Notebook Previews - Botanical Colabs</title>
-    <style>
-        * { box-sizing: border-box; }
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            max-width: 1400px;
-            margin: 0 auto;
-            padding: 40px 20px;
-            background: #f6f8fa;
-            color: #24292f;
-        }
-        h1 {
-            color: #24292f;
-            border-bottom: 3px solid #0969da;
-            padding-bottom: 15px;
-            margin-bottom: 10px;
-        }
-        .subtitle {
-            color: #57606a;
-            margin-bottom: 40px;
-        }
-        .category {
-            margin: 50px 0;
-        }
-        .category h2 {
-            color: #0969da;
-            text-transform: capitalize;
-            border-left: 4px solid #0969da;
-            padding-left: 15px;
-            margin-bottom: 20px;
-        }
-        .preview-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(320px, 1fr));
-            gap: 20px;
-        }
-        .preview-card {
-            background: white;
-            border: 1px solid #d0d7de;
-            border-radius: 8px;
-            padding: 24px;
-            transition: all 0.3s ease;
-            text-decoration: none;
-            display: block;
-        }
-        .preview-card:hover {
-            border-color: #0969da;
-            box-shadow: 0 8px 24px rgba(0,0,0,0.12);
-            transform: translateY(-4px);
-        }
-        .preview-title {
-            color: #24292f;
-            font-weight: 600;
-            font-size: 16px;
-            margin-bottom: 8px;
-        }
-        .preview-card:hover .preview-title {
-            color: #0969da;
-        }
-        .badge {
-            display: inline-block;
-            background: #ddf4ff;
-            color: #0969da;
-            padding: 4px 12px;
-            border-radius: 16px;
-            font-size: 12px;
-            font-weight: 600;
-        }
-        .icon {
-            font-size: 32px;
-            margin-bottom: 12px;
-        }
-        .notice {
-            background: #fff8c5;
-            border: 2px solid #fbbf24;
-            border-radius: 8px;
-            padding: 16px 20px;
-            margin-bottom: 40px;
-        }
-        .notice strong {
-            color: #92400e;
-        }
-    </style>
-</head>
-<body>
-    <h1>📓 Notebook Preview Gallery</h1>
-    <p class="subtitle">Static snapshots of Jupyter notebooks from the Botanical Colabs collection</p>
+        thumbnail = None
+        if (PREVIEWS_DIR / "thumbnails" / f"{html_path.stem}-{SRCSET_WIDTHS[0]}.webp").exists():
+            thumbnail = {
+                'src': f"thumbnails/{html_path.stem}-{SRCSET_WIDTHS[0]}.webp",
+                'srcset': srcset(html_path.stem, "thumbnails/"),
+            }
+        previews.append((nb_path, html_path.relative_to(PREVIEWS_DIR).as_posix(), thumbnail))
     
+    notice = """
     <div class="notice">
         <strong>ℹ️ Note:</strong> These are static HTML exports showing notebook structure and markdown content. 
         Code cells are hidden to focus on documentation and output visualization.
     </div>
 """
-    
-    for category, items in sorted(categories.items()):
-        category_icons = {
-            'templates': '📐',
-            'examples': '📋',
-            'agrology': '🌾',
-            'greenhouse': '🏗️',
-            'regional': '🗺️',
-            'education': '🎓'
-        }
-        icon = category_icons.get(category, '📓')
-        
-        html += f"""
-    <div class="category">
-        <h2>{icon} {category.replace('_', ' ').title()}</h2>
-        <div class="preview-grid">
-"""
-        for item in sorted(items, key=lambda x: x['name']):
-            display_name = item['name'].replace('_', ' ').replace('-', ' ').title()
-            html += f"""
-            <a href="{item['path']}" class="preview-card">
-                <div class="icon">📄</div>
-                <div class="preview-title">{display_name}</div>
-                <span class="badge">Preview</span>
-            </a>
-"""
-        html += """
-        </div>
-    </div>
-"""
-    
-    html += f"""
+    footer = f"""
     <hr style="margin: 60px 0; border: none; border-top: 1px solid #d0d7de;">
     <p style="text-align: center; color: #57606a;">
         Generated {len(processed_files)} preview(s) | 
         <a href="https://github.com/outobecca/botanical-colabs" style="color: #0969da;">View Repository</a>
     </p>
-</body>
-</html>
 """
     
     index_path = PREVIEWS_DIR / "index.html"
-    with open(index_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    write_gallery(
+        previews,
+        index_path,
+        title="Notebook Preview Gallery",
+        subtitle="Static snapshots of Jupyter notebooks from the Botanical Colabs collection",
+        notice=notice,
+        footer=footer,
+        notebooks_dir=NOTEBOOKS_DIR,
+    )
     
     print(f"\n✓ Created preview index: {index_path.absolute()}")
 
-def main():
+def output_path_for(nb_path):
+    """The preview file written for a notebook, e.g. previews/html/regional_foo.html."""
+    relative_path = nb_path.relative_to(NOTEBOOKS_DIR)
+    output_name = str(relative_path).replace(os.sep, '_').replace('.ipynb', '.html')
+    return PREVIEWS_DIR / "html" / output_name
+
+# Converts the (notebook, output) path pairs in argv in one process; prints the success count
+IN_PROCESS_BENCHMARK = """
+import sys
+from pathlib import Path
+from generate_simple_previews import convert_notebook
+pairs = zip(sys.argv[1::2], sys.argv[2::2])
+print(sum(convert_notebook(Path(nb), Path(out))[0] for nb, out in pairs))
+"""
+
+def run_benchmark(notebooks, count):
+    """Time per-notebook `jupyter nbconvert` subprocesses against the in-process exporter."""
+    sample = sorted(notebooks)[:count]
+    print(f"⏱️  Benchmarking {len(sample)} notebook(s): subprocess vs in-process\n")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        started = time.perf_counter()
+        ok_subprocess = sum(
+            convert_notebook_subprocess(nb_path, tmp / f"sub_{i}.html")
+            for i, nb_path in enumerate(sample)
+        )
+        subprocess_seconds = time.perf_counter() - started
+        
+        # A fresh interpreter, so the in-process batch also pays start-up and the
+        # nbconvert import (once) like each subprocess does
+        args = []
+        for i, nb_path in enumerate(sample):
+            args += [str(Path(nb_path).resolve()), str((tmp / f"inproc_{i}.html").resolve())]
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', IN_PROCESS_BENCHMARK, *args],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True,
+        )
+        in_process_seconds = time.perf_counter() - started
+        try:
+            ok_in_process = int(result.stdout.split()[-1])
+        except (IndexError, ValueError):
+            print(f"  ❌ In-process batch failed: {result.stderr.strip()[-200:]}")
+            ok_in_process = 0
+    
+    count = max(len(sample), 1)
+    print("\n" + "=" * 60)
+    print(f"{'Method':<14}{'Converted':>10}{'Total':>10}{'Per notebook':>15}")
+    print(f"{'subprocess':<14}{ok_subprocess:>10}{subprocess_seconds:>9.2f}s{subprocess_seconds / count:>14.3f}s")
+    print(f"{'in-process':<14}{ok_in_process:>10}{in_process_seconds:>9.2f}s{in_process_seconds / count:>14.3f}s")
+    print("  (both start from a cold interpreter: subprocess pays start-up and nbconvert imports")
+    print("   for every notebook, in-process once per batch)")
+    if in_process_seconds > 0:
+        print(f"  Speed-up: {subprocess_seconds / in_process_seconds:.1f}×")
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description='Convert notebooks to static HTML previews')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every preview, ignoring the incremental cache')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Worker processes, each loading the exporter once (default: 1, in-process)')
+    parser.add_argument('--benchmark', type=int, nargs='?', const=5, metavar='N',
+                        help='Compare subprocess and in-process conversion on N notebooks (default: 5) and exit')
+    args = parser.parse_args(argv)
+    if args.benchmark is not None and args.benchmark < 1:
+        parser.error('--benchmark needs at least 1 notebook')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    
     print("🎨 Notebook Preview Generator (Simple Mode)")
     print("=" * 60)
     
+    # Find notebooks (the catalog only rescans files that changed)
+    catalog = open_catalog()
+    notebooks = catalog.paths()
+    
+    if args.benchmark is not None:
+        catalog.close()
+        run_benchmark(notebooks, args.benchmark)
+        return
+    
     # Setup
     setup_directories()
     
-    # Find notebooks
-    notebooks = list(NOTEBOOKS_DIR.rglob("*.ipynb"))
-    notebooks = [nb for nb in notebooks if '.ipynb_checkpoints' not in str(nb)]
-    
     print(f"\nFound {len(notebooks)} notebooks\n")
+    total = len(notebooks)
+    
+    # Notebooks are rendered as stored, so they must be valid JSON and match the schema
+    notebooks = reject_invalid(notebooks, checks=('json', 'schema'))
     
-    # Convert each
+    # Skip notebooks unchanged since the last build
+    manifest = load_manifest(manifest_path(GENERATOR))
+    fingerprint = env_fingerprint()
     processed = []
+    pending = []
+    keys = {}
+    cached_count = 0
+    skipped_count = 0
     for nb_path in sorted(notebooks):
-        relative_path = nb_path.relative_to(NOTEBOOKS_DIR)
-        output_name = str(relative_path).replace(os.sep, '_').replace('.ipynb', '.html')
-        output_path = PREVIEWS_DIR / "html" / output_name
+        output_path = output_path_for(nb_path)
         
-        if convert_notebook_to_html(nb_path, output_path):
+        # Outputs are rendered as-is, so the whole file is part of the key
+        key = cache_key(catalog.get(nb_path)['hash'], EXPORT_SETTINGS, fingerprint)
+        keys[nb_path] = key
+        if not args.force and is_up_to_date(manifest, output_path.stem, key):
+            cached_count += 1
             processed.append((nb_path, output_path))
+            continue
+        if not args.force and failed_previously(manifest, output_path.stem, key):
+            skipped_count += 1
+            continue
+        pending.append((nb_path, output_path))
+    
+    # Convert the rest through one exporter (or one per worker)
+    workers = max(1, min(args.jobs, os.cpu_count() or 1))
+    converted = []
+    for nb_path, output_path, ok in convert_batch(pending, workers):
+        if ok:
+            record_build(manifest, output_path.stem, keys[nb_path], [output_path])
+            processed.append((nb_path, output_path))
+            converted.append((nb_path, output_path))
+            catalog.record_artifacts(nb_path, {'html': output_path})
+        else:
+            record_failure(manifest, output_path.stem, keys[nb_path])
+    
+    # Thumbnails from the outputs saved in the notebooks, rendered as one parallel batch
+    if converted:
+        render_thumbnails([
+            (nb_path, nb_path.stem.replace('_', ' ').replace('-', ' ').title(),
+             PREVIEWS_DIR / "thumbnails", output_path.stem)
+            for nb_path, output_path in converted
+        ])
+    
+    save_manifest(manifest, manifest_path(GENERATOR))
+    catalog.close()
+    if cached_count:
+        print(f"\n♻️  Reused {cached_count} unchanged preview(s) from cache")
+    if skipped_count:
+        print(f"⏭️  Skipped {skipped_count} unchanged notebook(s) that failed last time (use --force to retry)")
     
     # Create index
     if processed:
-        create_preview_index(processed)
+        create_preview_index(sorted(processed))
     
     print("\n" + "=" * 60)
-    print(f"✓ Complete! Processed {len(processed)}/{len(notebooks)} notebooks")
+    print(f"✓ Complete! Processed {len(processed)}/{total} notebooks")
     print(f"📂 Preview directory: {PREVIEWS_DIR.absolute()}")
     print(f"🌐 Open: file:///{(PREVIEWS_DIR / 'index.html').absolute()}")
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -14,21 +14,30 @@ Each wiki page includes:
 
 Usage:
     python generate_wiki_pages.py
+    python generate_wiki_pages.py --benchmark 5000  # time the builder on 5000 pages
 
 Output:
-    Creates .md files in wiki/ directory
+    Creates .md files in wiki/ directory (unchanged pages are not rewritten)
 """
 
 import os
+import re
 import json
+import time
+import argparse
+import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-# Notebook metadata
-NOTEBOOKS = {
+from notebook_catalog import open_catalog
+from wiki_builder import WikiBuilder, WikiTemplate, bullets
+
+# Hand-written page content, keyed by notebook path. Every other notebook in the
+# catalog gets a page built from its own title and description.
+NOTEBOOK_DETAILS = {
     # Templates
-    "TEMPLATE-Botanical-Notebook": {
-        "file": "notebooks/templates/TEMPLATE_botanical_notebook.ipynb",
+    "notebooks/templates/TEMPLATE_botanical_notebook.ipynb": {
+        "id": "TEMPLATE-Botanical-Notebook",
         "title": "📐 General Botanical Template",
         "category": "Templates",
         "description": "Comprehensive general-purpose template for botanical science notebooks",
@@ -47,8 +56,8 @@ NOTEBOOKS = {
             "Educational materials"
         ]
     },
-    "TEMPLATE-Data-Analysis": {
-        "file": "notebooks/templates/TEMPLATE_data_analysis.ipynb",
+    "notebooks/templates/TEMPLATE_data_analysis.ipynb": {
+        "id": "TEMPLATE-Data-Analysis",
         "title": "📊 Data Analysis Template",
         "category": "Templates",
         "description": "Specialized template for analyzing environmental sensors, soil tests, and plant measurements",
@@ -68,9 +77,18 @@ NOTEBOOKS = {
         ]
     },
     
+    "notebooks/templates/TEMPLATE_myst_scientific.ipynb": {
+        "id": "TEMPLATE-MyST-Scientific",
+    },
+    
+    # Examples
+    "notebooks/examples/generator-plant-card.ipynb": {
+        "id": "Examples-Plant-Card-Generator",
+    },
+    
     # Agrology
-    "Agrology-Data-Analysis-Exploration": {
-        "file": "notebooks/agrology/data_analysis_exploration.ipynb",
+    "notebooks/agrology/data_analysis_exploration.ipynb": {
+        "id": "Agrology-Data-Analysis-Exploration",
         "title": "🌾 Data Analysis & Exploration",
         "category": "Agrology",
         "description": "Comprehensive toolkit for agricultural data exploration and analysis",
@@ -91,8 +109,8 @@ NOTEBOOKS = {
     },
     
     # Greenhouse
-    "Greenhouse-ML-Yield-Prediction": {
-        "file": "notebooks/greenhouse/ml_yield_prediction.ipynb",
+    "notebooks/greenhouse/ml_yield_prediction.ipynb": {
+        "id": "Greenhouse-ML-Yield-Prediction",
         "title": "🤖 ML Yield Prediction",
         "category": "Greenhouse",
         "description": "Machine learning models for crop yield prediction and optimization",
@@ -112,46 +130,66 @@ NOTEBOOKS = {
         ]
     },
     
-    # Add more notebooks here...
 }
 
-def generate_wiki_page(notebook_id: str, metadata: Dict) -> str:
-    """Generate wiki page content for a notebook"""
-    
-    content = f"""# {metadata['title']}
-
-[![Open In Colab](https://colab.research.google.com/assets/colab-badge.svg)](https://colab.research.google.com/github/outobecca/botanical-colabs/blob/main/{metadata['file']})
 
-> **{metadata['description']}**
+def default_page_id(path: str, category: str) -> str:
+    """Page id following the wiki's naming, e.g. Education-Tutorial or TEMPLATE-Machine-Learning"""
+    words = [word.capitalize() for word in re.split(r'[_\-\s]+', Path(path).stem) if word]
+    prefix = "TEMPLATE" if category == "Templates" else category
+    # The category is already the prefix; don't repeat it in the name
+    words = [word for word in words if word.lower() not in (prefix.lower(), category.lower())]
+    return '-'.join([prefix] + words)
+
+
+def notebook_pages(catalog) -> List[tuple]:
+    """(page id, page metadata) for every notebook in the catalog"""
+    pages = []
+    for entry in catalog.notebooks():
+        details = NOTEBOOK_DETAILS.get(entry['path'], {})
+        category = entry['category'].title()
+        metadata = {
+            "file": entry['path'],
+            "title": entry['title'],
+            "category": category,
+            "description": entry['description'] or f"Jupyter notebook for {entry['title'].lower()}",
+            "features": [],
+            "use_cases": [],
+            "review_status": entry['review_status'],
+            "reviews": entry['reviews'],
+            "required_reviews": entry['required_reviews'],
+        }
+        metadata.update({key: value for key, value in details.items() if key != "id"})
+        pages.append((details.get("id", default_page_id(entry['path'], category)), metadata))
+    return pages
+
+# Page layout; fields are filled in by page_values()
+WIKI_PAGE_TEMPLATE = WikiTemplate("""# {title}
+
+[![Open In Colab](https://colab.research.google.com/assets/colab-badge.svg)](https://colab.research.google.com/github/outobecca/botanical-colabs/blob/main/{file})
+
+> **{description}**
 
 ---
 
 ## 📋 Overview
 
-{metadata['description']}
+{description}
+
+This notebook is part of the **{category}** category and provides specialized tools for botanical research and analysis.
 
-This notebook is part of the **{metadata['category']}** category and provides specialized tools for botanical research and analysis.
+**Peer review:** {review_status} ({reviews}/{required_reviews} reviews)
 
 ---
 
 ## 🎯 Use Cases
 
-"""
-    
-    for use_case in metadata['use_cases']:
-        content += f"- ✅ **{use_case}**\n"
-    
-    content += f"""
+{use_cases}
 ---
 
 ## ⭐ Key Features
 
-"""
-    
-    for feature in metadata['features']:
-        content += f"- ✅ {feature}\n"
-    
-    content += f"""
+{features}
 ---
 
 ## 🚀 Getting Started
@@ -258,7 +296,7 @@ MIT License — Free to use, modify, and distribute
 ```bibtex
 @software{{botanical_notebook_2025,
   author = {{Sihvonen, Pekka}},
-  title = {{{metadata['title']} - Botanical Colabs}},
+  title = {{{title} - Botanical Colabs}},
   year = {{2025}},
   publisher = {{GitHub}},
   url = {{https://github.com/outobecca/botanical-colabs}}
@@ -281,38 +319,120 @@ Found an issue or have a suggestion?
 **Version:** 2.0  
 **Status:** ✅ Production Ready
 
-[← Back to {metadata['category']}](Home#{metadata['category'].lower()}-notebooks) | [View on GitHub](https://github.com/outobecca/botanical-colabs/blob/main/{metadata['file']})
-"""
-    
-    return content
+[← Back to {category}](Home#{category_anchor}-notebooks) | [View on GitHub](https://github.com/outobecca/botanical-colabs/blob/main/{file})
+""")
+
+
+def page_values(metadata: Dict) -> Dict:
+    """Template values for a notebook's wiki page"""
+    return {
+        **metadata,
+        "required_reviews": metadata['required_reviews'] or '?',
+        "category_anchor": metadata['category'].lower(),
+        "use_cases": bullets(metadata['use_cases'], "- ✅ **{}**\n",
+                             "*(Document the main use cases of this notebook)*\n"),
+        "features": bullets(metadata['features'], "- ✅ {}\n",
+                            "*(List the key features of this notebook)*\n"),
+    }
 
 
-def main():
+def generate_wiki_page(notebook_id: str, metadata: Dict) -> str:
+    """Generate wiki page content for a notebook"""
+    return WIKI_PAGE_TEMPLATE.render(page_values(metadata))
+
+
+def owned_pages(pages: List[tuple], wiki_dir: Path) -> Tuple[List[tuple], List[str]]:
+    """Split pages into those this script builds and ids of existing hand-written pages
+
+    Pages with content in NOTEBOOK_DETAILS are always rebuilt. Any other
+    notebook only gets a page when none exists yet.
+    """
+    owned, curated = [], []
+    for notebook_id, metadata in pages:
+        details = NOTEBOOK_DETAILS.get(metadata['file'], {})
+        if set(details) - {"id"} or not (wiki_dir / f"{notebook_id}.md").exists():
+            owned.append((notebook_id, metadata))
+        else:
+            curated.append(notebook_id)
+    return owned, curated
+
+
+def run_benchmark(pages: List[tuple], count: int):
+    """Time the wiki builder on `count` pages cycled from the catalog's notebooks"""
+    if not pages:
+        print("⚠️  No notebooks in the catalog; nothing to benchmark")
+        return
+    batch = []
+    for i in range(count):
+        notebook_id, metadata = pages[i % len(pages)]
+        batch.append((f"{notebook_id}-{i}.md", WIKI_PAGE_TEMPLATE, page_values(metadata)))
+    
+    print(f"⏱️  Benchmark: {count} pages")
+    start = time.perf_counter()
+    for _, template, values in batch:
+        template.render(values)
+    print(f"   Render only:              {time.perf_counter() - start:.2f}s")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Old behaviour: every page rewritten on every run
+        start = time.perf_counter()
+        for name, template, values in batch:
+            (Path(tmp) / name).write_text(template.render(values), encoding='utf-8')
+        print(f"   Unconditional writes:     {time.perf_counter() - start:.2f}s")
+        
+        builder = WikiBuilder(Path(tmp) / "wiki")
+        start = time.perf_counter()
+        written, _ = builder.build(batch)
+        print(f"   Builder, empty directory: {time.perf_counter() - start:.2f}s ({len(written)} written)")
+        start = time.perf_counter()
+        written, unchanged = builder.build(batch)
+        print(f"   Builder, no changes:      {time.perf_counter() - start:.2f}s "
+              f"({len(written)} written, {len(unchanged)} unchanged)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate GitHub wiki pages for the notebooks.")
+    parser.add_argument('--benchmark', type=int, nargs='?', const=5000, metavar='N',
+                        help="time building N pages (default 5000) in a temporary directory")
+    args = parser.parse_args(argv)
+    if args.benchmark is not None and args.benchmark < 1:
+        parser.error('--benchmark needs at least 1 page')
+    return args
+
+
+def main(argv=None):
     """Generate all wiki pages"""
+    args = parse_args(argv)
+    
+    # Pages for every notebook the catalog knows about
+    with open_catalog() as catalog:
+        pages = notebook_pages(catalog)
+    
+    if args.benchmark is not None:
+        run_benchmark(pages, args.benchmark)
+        return
     
-    # Create wiki directory if it doesn't exist
     wiki_dir = Path("wiki")
-    wiki_dir.mkdir(exist_ok=True)
     
     print("🚀 Generating GitHub Wiki pages...")
     print(f"📁 Output directory: {wiki_dir}")
     print()
     
-    # Generate pages
-    for notebook_id, metadata in NOTEBOOKS.items():
-        print(f"📝 Generating: {notebook_id}.md")
-        
-        # Generate content
-        content = generate_wiki_page(notebook_id, metadata)
-        
-        # Write to file
-        output_file = wiki_dir / f"{notebook_id}.md"
-        output_file.write_text(content, encoding='utf-8')
-        
-        print(f"   ✅ Created: {output_file}")
+    # Hand-written pages are left alone
+    pages, curated = owned_pages(pages, wiki_dir)
+    for notebook_id in curated:
+        print(f"   ⏭️  Kept hand-written page: {notebook_id}.md")
+    
+    # Render all pages in one pass; only pages whose content changed are written
+    written, unchanged = WikiBuilder(wiki_dir).build(
+        (f"{notebook_id}.md", WIKI_PAGE_TEMPLATE, page_values(metadata))
+        for notebook_id, metadata in pages
+    )
+    for output_file in written:
+        print(f"   ✅ Updated: {output_file}")
     
     print()
-    print(f"✅ Generated {len(NOTEBOOKS)} wiki pages!")
+    print(f"✅ Generated {len(pages)} wiki pages! ({len(written)} updated, {len(unchanged)} unchanged)")
     print()
     print("📖 Next steps:")
     print("1. Review generated pages in wiki/ directory")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Record/replay of HTTP traffic for notebook previews.
+
+Preview runs install this module inside the kernel (see generate_previews.py).
+It patches requests' HTTPAdapter.send, which every requests.get/post/Session
+call goes through:
+
+- replay: responses are served from a JSON cassette on disk. Nothing touches
+  the network; requests with no recording fail immediately with a
+  ConnectionError, so notebook fallbacks kick in at once instead of after a
+  timeout.
+- record: real requests are made and every response is appended to the
+  cassette, refreshing it.
+
+Matching first tries the exact method + URL + body. Notebooks often build
+query parameters from the current date (e.g. FMI starttime/endtime), so a
+request that misses falls back to the recording with the same method, path and
+parameter names whose parameter values agree the most.
+
+Query parameters that look like credentials are redacted before anything is
+written to a cassette.
+"""
+
+import base64
+import hashlib
+import json
+import os
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+CASSETTE_VERSION = 1
+
+# Query parameters never written to cassettes
+SECRET_PARAMS = {'apikey', 'api_key', 'key', 'token', 'access_token', 'auth'}
+
+_original_send = None
+_cassette = None
+
+
+class CassetteMissError(Exception):
+    """Raised (as a requests ConnectionError) when replay has no recording."""
+
+
+def _redact_url(url):
+    parts = urlsplit(url)
+    params = [
+        (name, 'REDACTED' if name.lower() in SECRET_PARAMS else value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(params)), ''))
+
+
+def _body_hash(body):
+    if body is None:
+        return ''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not isinstance(body, bytes):  # streamed/generator bodies are not matched on
+        return ''
+    return hashlib.sha256(body).hexdigest()
+
+
+class Cassette:
+    """A list of recorded request/response pairs stored as JSON."""
+
+    def __init__(self, path, mode='replay'):
+        self.path = path
+        self.mode = mode
+        self.interactions = []
+        self._served = {}
+        if os.path.exists(path) and mode == 'replay':
+            with open(path, 'r', encoding='utf-8') as f:
+                self.interactions = json.load(f).get('interactions', [])
+
+    def find(self, method, url, body_hash):
+        """Return the best recorded response for a request, or None."""
+        url = _redact_url(url)
+        exact = [
+            i for i in self.interactions
+            if i['request']['method'] == method and i['request']['url'] == url
+            and i['request']['body_hash'] == body_hash
+        ]
+        if exact:
+            # Identical requests are served in recorded order, repeating the last
+            served = self._served.get(url, 0)
+            self._served[url] = served + 1
+            return exact[min(served, len(exact) - 1)]['response']
+
+        parts = urlsplit(url)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        best, best_score = None, -1
+        for interaction in self.interactions:
+            recorded = urlsplit(interaction['request']['url'])
+            recorded_params = dict(parse_qsl(recorded.query, keep_blank_values=True))
+            if (interaction['request']['method'] != method
+                    or (recorded.netloc, recorded.path) != (parts.netloc, parts.path)
+                    or set(recorded_params) != set(params)):
+                continue
+            score = sum(recorded_params[name] == value for name, value in params.items())
+            if score > best_score:
+                best, best_score = interaction, score
+        return best['response'] if best else None
+
+    def record(self, method, url, body_hash, response):
+        """Append a real response and rewrite the cassette file."""
+        content = response.content
+        try:
+            body = {'text': content.decode('utf-8')}
+        except UnicodeDecodeError:
+            body = {'base64': base64.b64encode(content).decode('ascii')}
+        self.interactions.append({
+            'request': {'method': method, 'url': _redact_url(url), 'body_hash': body_hash},
+            'response': {
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': {k: v for k, v in response.headers.items()
+                            if k.lower() not in ('content-encoding', 'transfer-encoding', 'set-cookie')},
+                'encoding': response.encoding,
+                'body': body,
+            },
+        })
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CASSETTE_VERSION, 'interactions': self.interactions},
+                      f, indent=1, sort_keys=True, ensure_ascii=False)
+
+
+def _build_response(request, recorded):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = recorded['status']
+    response.reason = recorded.get('reason', '')
+    response.headers = CaseInsensitiveDict(recorded.get('headers', {}))
+    response.encoding = recorded.get('encoding')
+    body = recorded['body']
+    response._content = (
+        body['text'].encode('utf-8') if 'text' in body else base64.b64decode(body['base64'])
+    )
+    response.url = request.url
+    response.request = request
+    response.elapsed = timedelta(0)
+    return response
+
+
+def _send(adapter, request, **kwargs):
+    import requests
+
+    body_hash = _body_hash(request.body)
+    if _cassette.mode == 'record':
+        response = _original_send(adapter, request, **kwargs)
+        _cassette.record(request.method, request.url, body_hash, response)
+        return response
+
+    recorded = _cassette.find(request.method, request.url, body_hash)
+    if recorded is None:
+        raise requests.exceptions.ConnectionError(
+            CassetteMissError(
+                f"No recorded response for {request.method} {_redact_url(request.url)} "
+                f"in {_cassette.path} (refresh with: python generate_previews.py --http record)"
+            ),
+            request=request,
+        )
+    return _build_response(request, recorded)
+
+
+def install(path, mode='replay'):
+    """Route all requests traffic in this process through the cassette at `path`."""
+    global _original_send, _cassette
+    from requests.adapters import HTTPAdapter
+
+    if mode not in ('replay', 'record'):
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    _cassette = Cassette(path, mode)
+    if _original_send is None:
+        _original_send = HTTPAdapter.send
+        HTTPAdapter.send = _send
+    return _cassette
+
+
+def uninstall():
+    """Restore the real HTTPAdapter.send."""
+    global _original_send, _cassette
+    from requests.adapters import HTTPAdapter
+
+    if _original_send is not None:
+        HTTPAdapter.send = _original_send
+    _original_send = None
+    _cassette = None
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Warm Jupyter kernel pool for preview generation.
+
+Starting a kernel and importing pandas/matplotlib/seaborn costs several seconds,
+which dominates preview runs over many small notebooks. The pool keeps kernels
+alive between notebooks: each notebook borrows a kernel, and on return the
+kernel's namespace is reset (imported modules stay cached in sys.modules, so
+re-importing them is instant). Kernels that crash, fail to reset, time out
+or grow past the memory ceiling are restarted.
+
+Usage:
+    pool = KernelPool(size=2)
+    pool.start()
+    with pool.kernel(cwd=nb_path.parent) as km:
+        ExecutePreprocessor(...).preprocess(nb, resources, km=km)
+    pool.shutdown()
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from jupyter_client import BlockingKernelClient, KernelManager
+from jupyter_client.asynchronous import AsyncKernelClient
+
+try:
+    import psutil
+except ImportError:  # memory ceiling is only enforced when psutil is available
+    psutil = None
+
+# Imported once per kernel so notebooks find them already in sys.modules
+WARMUP_CODE = """
+import os as _os
+_os._preview_pool_environ = dict(_os.environ)
+for _name in ('numpy', 'pandas', 'matplotlib', 'matplotlib.pyplot', 'seaborn'):
+    try:
+        __import__(_name)
+    except Exception:
+        pass
+del _name, _os
+"""
+
+# Clears user state between notebooks while keeping module imports warm
+RESET_CODE = """
+%reset -f
+import os as _os, sys as _sys
+if 'http_cassettes' in _sys.modules:
+    _sys.modules['http_cassettes'].uninstall()
+_os.environ.clear()
+_os.environ.update(getattr(_os, '_preview_pool_environ', dict()))
+if 'matplotlib.pyplot' in _sys.modules:
+    _sys.modules['matplotlib.pyplot'].close('all')
+    _sys.modules['matplotlib'].rcdefaults()
+_os.chdir({cwd!r})
+del _os, _sys
+"""
+
+STARTUP_TIMEOUT = 60  # seconds to wait for a kernel to become ready
+CONTROL_TIMEOUT = 60  # seconds allowed for warm-up and reset code
+
+
+class KernelPool:
+    """A fixed-size pool of pre-started kernels handed out one notebook at a time."""
+
+    def __init__(self, size=1, kernel_name="python3", memory_limit_mb=2048):
+        self.size = max(1, size)
+        self.kernel_name = kernel_name
+        self.memory_limit_mb = memory_limit_mb
+        self.restarts = 0
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start and warm up all kernels."""
+        for _ in range(self.size):
+            km = self._new_kernel()
+            self._all.append(km)
+            self._idle.put(km)
+        return self
+
+    def shutdown(self):
+        """Shut down every kernel owned by the pool."""
+        with self._lock:
+            kernels, self._all = self._all, []
+        for km in kernels:
+            try:
+                km.shutdown_kernel(now=True)
+            except Exception:
+                pass
+
+    @contextmanager
+    def kernel(self, cwd="."):
+        """Borrow a clean kernel whose working directory is `cwd`."""
+        km = self._idle.get()
+        try:
+            if not self._prepare(km, cwd):
+                km = self._replace(km)
+                self._prepare(km, cwd)
+            yield km
+        except TimeoutError:
+            # A runaway cell is still executing; never hand a busy kernel back out
+            km = self._replace(km)
+            raise
+        finally:
+            if not self._healthy(km):
+                km = self._replace(km)
+            self._idle.put(km)
+
+    def _new_kernel(self):
+        # nbclient drives the kernel through an async client, while the pool
+        # uses its own blocking client for warm-up and resets
+        km = KernelManager(kernel_name=self.kernel_name, client_factory=AsyncKernelClient)
+        km.start_kernel()
+        run_control_code(km, WARMUP_CODE)
+        return km
+
+    def _replace(self, km):
+        """Shut down a misbehaving kernel and start a fresh one in its place."""
+        print("    ♻️  Recycling kernel")
+        try:
+            km.shutdown_kernel(now=True)
+        except Exception:
+            pass
+        fresh = self._new_kernel()
+        with self._lock:
+            self._all = [fresh if k is km else k for k in self._all]
+            self.restarts += 1
+        return fresh
+
+    def _prepare(self, km, cwd):
+        """Reset the kernel namespace and move it to `cwd`."""
+        return km.is_alive() and run_control_code(km, RESET_CODE.format(cwd=str(Path(cwd).resolve())))
+
+    def _healthy(self, km):
+        """Check a returned kernel is still alive and under the memory ceiling."""
+        if not km.is_alive():
+            return False
+        rss_mb = kernel_memory_mb(km)
+        return rss_mb is None or rss_mb <= self.memory_limit_mb
+
+
+def run_control_code(km, code, timeout=CONTROL_TIMEOUT):
+    """Run code silently on a kernel through a separate client; True if it succeeded.
+
+    Works alongside the client nbclient uses to execute the notebook itself.
+    """
+    kc = BlockingKernelClient()
+    kc.load_connection_info(km.get_connection_info())
+    kc.start_channels()
+    try:
+        kc.wait_for_ready(timeout=STARTUP_TIMEOUT)
+        reply = kc.execute_interactive(
+            code, silent=True, store_history=False, timeout=timeout,
+            output_hook=lambda msg: None,
+        )
+        return reply['content']['status'] == 'ok'
+    except Exception:
+        return False
+    finally:
+        kc.stop_channels()
+
+
+def kernel_memory_mb(km):
+    """Resident memory of a kernel process in MB, or None if it can't be measured."""
+    if psutil is None:
+        return None
+    provisioner = getattr(km, 'provisioner', None)
+    pid = getattr(provisioner, 'pid', None)
+    if pid is None:
+        return None
+    try:
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except psutil.Error:
+        return None
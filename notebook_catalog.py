@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+SQLite catalog of the repository's notebooks, shared by every generator.
+
+One row per notebook under notebooks/: content hash, category (its top-level
+folder), title, description, cell counts, the leading cells used for wiki
+pages, the last successful execution, and peer-review status from
+.github/peer-review.json. A second table keeps the artifacts each generator
+wrote (previews, thumbnails, wiki pages).
+
+refresh() brings the catalog up to date incrementally: files whose size and
+modification time are unchanged are not opened, changed files are hashed, and
+only files whose hash changed are scanned (with notebook_scan, which never
+decodes outputs). Notebooks that are not valid JSON stay in the catalog with
+their error, so tools that only need the file list still see them.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from notebook_scan import NotebookScanError, scan_text
+
+CATALOG_PATH = Path("previews") / "notebook_catalog.sqlite"
+NOTEBOOKS_DIR = Path("notebooks")
+PEER_REVIEW_PATH = Path(".github") / "peer-review.json"
+
+# Bump when the schema or the scanned fields change; the catalog is then rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notebooks (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    code_cells INTEGER,
+    markdown_cells INTEGER,
+    total_cells INTEGER,
+    leading_cells TEXT NOT NULL DEFAULT '[]',
+    scan_error TEXT,
+    review_status TEXT NOT NULL DEFAULT 'unreviewed',
+    reviews INTEGER NOT NULL DEFAULT 0,
+    required_reviews INTEGER,
+    last_executed TEXT,
+    last_runtime REAL
+);
+CREATE INDEX IF NOT EXISTS notebooks_category ON notebooks (category);
+CREATE TABLE IF NOT EXISTS artifacts (
+    notebook TEXT NOT NULL REFERENCES notebooks (path) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (notebook, kind)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def catalog_key(path):
+    """The catalog's name for a notebook: a POSIX path relative to the working directory."""
+    path = Path(path)
+    if path.is_absolute():
+        try:
+            path = path.relative_to(Path.cwd())
+        except ValueError:
+            pass
+    return path.as_posix()
+
+
+def title_and_description(leading_cells, fallback):
+    """First '# ' heading and first prose line of the leading markdown cells."""
+    title = None
+    description = ''
+    in_comment = False
+    for cell in leading_cells:
+        if cell['cell_type'] != 'markdown':
+            continue
+        for line in cell['source'].split('\n'):
+            line = line.strip()
+            # Skip HTML comments, [//]: # (...) link-reference comments and badges
+            if in_comment or line.startswith('<!--'):
+                in_comment = '-->' not in line
+                continue
+            if line.startswith(('[//]:', '[![')):
+                continue
+            if line.startswith('# ') and title is None:
+                title = line[2:].strip()
+            elif line and not line.startswith(('#', '>', '!', '|', '-', '*', '<')) and len(line) > 20:
+                description = description or line
+    return title or fallback, description
+
+
+class NotebookCatalog:
+    """The notebook catalog in one SQLite file."""
+
+    def __init__(self, path=CATALOG_PATH, root=NOTEBOOKS_DIR, peer_review_path=PEER_REVIEW_PATH):
+        self.path = Path(path)
+        self.root = Path(root)
+        self.peer_review_path = Path(peer_review_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.executescript(
+                "DROP TABLE IF EXISTS artifacts; DROP TABLE IF EXISTS notebooks; DROP TABLE IF EXISTS meta;"
+            )
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Updating
+
+    def refresh(self):
+        """Sync the catalog with the notebooks on disk and the peer-review file.
+
+        Returns the number of notebooks that were (re)scanned.
+        """
+        paths = sorted(
+            catalog_key(path) for path in self.root.rglob("*.ipynb")
+            if '.ipynb_checkpoints' not in path.parts
+        )
+        with self.conn:
+            scanned = sum(self._update(path) for path in paths)
+            known = {row['path'] for row in self.conn.execute("SELECT path FROM notebooks")}
+            # Also drops the artifacts of deleted notebooks (ON DELETE CASCADE)
+            self.conn.executemany(
+                "DELETE FROM notebooks WHERE path = ?",
+                [(path,) for path in known.difference(paths)],
+            )
+            self._refresh_reviews(force=scanned > 0)
+        return scanned
+
+    def update(self, path, raw=None):
+        """Bring one notebook's row up to date; True if it had to be rescanned.
+
+        Pass the file's bytes as `raw` if the caller has already read them.
+        """
+        with self.conn:
+            scanned = self._update(catalog_key(path), raw)
+            if scanned:
+                self._refresh_reviews(force=True)
+        return scanned
+
+    def _update(self, key, raw=None):
+        stat = os.stat(key)
+        row = self.conn.execute(
+            "SELECT hash, size, mtime_ns FROM notebooks WHERE path = ?", (key,)
+        ).fetchone()
+        if row is not None and (row['size'], row['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return False
+
+        if raw is None:
+            with open(key, 'rb') as f:
+                raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if row is not None and row['hash'] == digest:
+            # Touched but not changed
+            self.conn.execute(
+                "UPDATE notebooks SET size = ?, mtime_ns = ? WHERE path = ?",
+                (stat.st_size, stat.st_mtime_ns, key),
+            )
+            return False
+
+        try:
+            scan = scan_text(raw.decode('utf-8'))
+            error = None
+        except (NotebookScanError, UnicodeDecodeError) as e:
+            scan = {'leading_cells': [], 'code_cells': None, 'markdown_cells': None, 'total_cells': None}
+            error = str(e)
+        fallback = Path(key).stem.replace('_', ' ').replace('-', ' ').title()
+        title, description = title_and_description(scan['leading_cells'], fallback)
+        try:
+            relative = Path(key).relative_to(catalog_key(self.root)).parts
+        except ValueError:
+            relative = ()
+        category = relative[0] if len(relative) > 1 else 'other'
+
+        self.conn.execute(
+            """
+            INSERT INTO notebooks (path, hash, size, mtime_ns, category, title, description,
+                                   code_cells, markdown_cells, total_cells, leading_cells, scan_error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                hash = excluded.hash, size = excluded.size, mtime_ns = excluded.mtime_ns,
+                category = excluded.category, title = excluded.title,
+                description = excluded.description, code_cells = excluded.code_cells,
+                markdown_cells = excluded.markdown_cells, total_cells = excluded.total_cells,
+                leading_cells = excluded.leading_cells, scan_error = excluded.scan_error
+            """,
+            (key, digest, stat.st_size, stat.st_mtime_ns, category, title, description,
+             scan['code_cells'], scan['markdown_cells'], scan['total_cells'],
+             json.dumps(scan['leading_cells'], ensure_ascii=False), error),
+        )
+        return True
+
+    def _refresh_reviews(self, force=False):
+        """Copy review status from the peer-review file when it (or the notebook set) changed."""
+        try:
+            stat = os.stat(self.peer_review_path)
+            stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            stamp = None
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'peer_review'").fetchone()
+        if not force and row is not None and row['value'] == stamp:
+            return
+
+        reviews = {}
+        if stamp is not None:
+            try:
+                with open(self.peer_review_path, 'r', encoding='utf-8') as f:
+                    reviews = json.load(f).get('notebooks', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Could not read {self.peer_review_path}: {e}")
+        self.conn.execute(
+            "UPDATE notebooks SET review_status = 'unreviewed', reviews = 0, required_reviews = NULL"
+        )
+        for path, review in reviews.items():
+            metadata = review.get('metadata', {})
+            self.conn.execute(
+                "UPDATE notebooks SET review_status = ?, reviews = ?, required_reviews = ? WHERE path = ?",
+                (metadata.get('review_status', 'pending'),
+                 metadata.get('current_reviews', len(review.get('reviews', []))),
+                 metadata.get('required_reviews'),
+                 catalog_key(path)),
+            )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('peer_review', ?)", (stamp,)
+        )
+
+    def record_execution(self, path, seconds, when=None):
+        """Note a successful execution of a notebook and how long it took."""
+        when = when or datetime.now()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE notebooks SET last_executed = ?, last_runtime = ? WHERE path = ?",
+                (when.isoformat(timespec='seconds'), round(seconds, 2), catalog_key(path)),
+            )
+
+    def record_artifacts(self, path, artifacts):
+        """Store the files a generator wrote for a notebook, as {kind: path}."""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO artifacts (notebook, kind, path, updated) VALUES (?, ?, ?, ?)",
+                [(catalog_key(path), kind, Path(artifact).as_posix(), now)
+                 for kind, artifact in artifacts.items()],
+            )
+
+    # Queries
+
+    def notebooks(self, category=None, parsed_only=False):
+        """Catalog rows (sqlite3.Row) ordered by path, optionally for one category."""
+        query = "SELECT * FROM notebooks"
+        conditions = []
+        params = []
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if parsed_only:
+            conditions.append("scan_error IS NULL")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.conn.execute(query + " ORDER BY path", params).fetchall()
+
+    def paths(self, category=None):
+        """Notebook paths, as Path objects."""
+        return [Path(row['path']) for row in self.notebooks(category)]
+
+    def get(self, path, raw=None):
+        """The row for one notebook, rescanning it first if it changed; None if unknown."""
+        key = catalog_key(path)
+        if not Path(key).exists():
+            return None
+        self.update(key, raw)
+        return self.conn.execute("SELECT * FROM notebooks WHERE path = ?", (key,)).fetchone()
+
+    def leading_cells(self, row):
+        """The decoded leading cells of a catalog row."""
+        return json.loads(row['leading_cells'])
+
+    def artifacts(self, path):
+        """{kind: path} of the artifacts recorded for a notebook."""
+        rows = self.conn.execute(
+            "SELECT kind, path FROM artifacts WHERE notebook = ?", (catalog_key(path),)
+        )
+        return {row['kind']: row['path'] for row in rows}
+
+
+def open_catalog(path=CATALOG_PATH):
+    """Open the catalog and bring it up to date."""
+    catalog = NotebookCatalog(path)
+    scanned = catalog.refresh()
+    if scanned:
+        print(f"🗂️  Notebook catalog: scanned {scanned} new or changed notebook(s)")
+    return catalog
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Cell-level notebook diffs, used to pick the cheapest rebuild.
+
+classify() lines up the cells of two versions of a notebook (by cell id when
+both versions have unique ids, otherwise by type and source) and labels every
+difference:
+
+- code:     a code cell was added, removed or edited
+- outputs:  outputs or execution counts changed (including output_ref, see
+            notebook_outputs.py), the code did not
+- markdown: markdown or raw cells were added, removed or edited
+- metadata: only cell or notebook metadata changed
+
+The most expensive label decides the plan:
+
+- execute: run the notebook again, from the first changed code cell
+- export:  re-render previews and thumbnails from the notebook as it is,
+           without a kernel (previews show the prose, so markdown counts here)
+- wiki:    only refresh the wiki page text
+- skip:    nothing changed
+
+The documentation script compares each changed notebook with the pull
+request's base (--base / BASE_REF) and only renders previews for notebooks
+that need them. Run this file to see what a branch would rebuild:
+
+    python notebook_diff.py --base origin/main
+    python notebook_diff.py --base HEAD~1 notebooks/regional/finnish_weather_analysis.ipynb
+"""
+
+import argparse
+import difflib
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from notebook_outputs import OUTPUT_REF_KEY
+
+CODE = 'code'
+OUTPUTS = 'outputs'
+MARKDOWN = 'markdown'
+METADATA = 'metadata'
+LABELS = (CODE, OUTPUTS, MARKDOWN, METADATA)  # most expensive first
+
+EXECUTE = 'execute'
+EXPORT = 'export'
+WIKI = 'wiki'
+SKIP = 'skip'
+PLANS = {CODE: EXECUTE, OUTPUTS: EXPORT, MARKDOWN: EXPORT, METADATA: WIKI}
+
+EMPTY_NOTEBOOK = {'cells': [], 'metadata': {}}
+
+
+class NotebookDiff:
+    """Labelled differences between two versions of a notebook."""
+
+    def __init__(self):
+        self.changes = []  # (old cell index or None, new cell index or None, label)
+        self.labels = set()
+        self.first_code_cell = None  # index in the new notebook where execution must resume
+
+    def add(self, old_index, new_index, label, resume_at=None):
+        self.changes.append((old_index, new_index, label))
+        self.labels.add(label)
+        if label == CODE and resume_at is not None:
+            if self.first_code_cell is None or resume_at < self.first_code_cell:
+                self.first_code_cell = resume_at
+
+    @property
+    def kind(self):
+        """The most expensive label, or None if nothing changed."""
+        return next((label for label in LABELS if label in self.labels), None)
+
+    @property
+    def plan(self):
+        return PLANS.get(self.kind, SKIP)
+
+    def summary(self):
+        if not self.labels:
+            return "unchanged -> skip"
+        labels = ', '.join(label for label in LABELS if label in self.labels)
+        text = f"{labels} -> {self.plan}"
+        if self.first_code_cell is not None:
+            text += f" from cell {self.first_code_cell}"
+        return text
+
+
+def _source(cell):
+    source = cell.get('source', '')
+    return ''.join(source) if isinstance(source, list) else source
+
+
+def _cell_key(cell):
+    return cell.get('cell_type'), _source(cell)
+
+
+def _outputs(cell):
+    return cell.get('outputs', []), cell.get('execution_count'), cell.get('metadata', {}).get(OUTPUT_REF_KEY)
+
+
+def _metadata(cell):
+    return {key: value for key, value in cell.get('metadata', {}).items() if key != OUTPUT_REF_KEY}
+
+
+def _align(old_cells, new_cells):
+    """Pairs of (old index or None, new index or None) in new-notebook order."""
+    old_ids = [cell.get('id') for cell in old_cells]
+    new_ids = [cell.get('id') for cell in new_cells]
+    by_id = (all(old_ids) and all(new_ids)
+             and len(set(old_ids)) == len(old_ids) and len(set(new_ids)) == len(new_ids))
+    if by_id:
+        old_keys, new_keys = old_ids, new_ids
+    else:
+        old_keys = [_cell_key(cell) for cell in old_cells]
+        new_keys = [_cell_key(cell) for cell in new_cells]
+
+    pairs = []
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('equal', 'replace'):
+            # Replaced runs are compared position by position; the rest was added or removed
+            common = min(i2 - i1, j2 - j1)
+            pairs.extend(zip(range(i1, i1 + common), range(j1, j1 + common)))
+            pairs.extend((i, None) for i in range(i1 + common, i2))
+            pairs.extend((None, j) for j in range(j1 + common, j2))
+        elif tag == 'delete':
+            pairs.extend((i, None) for i in range(i1, i2))
+        else:
+            pairs.extend((None, j) for j in range(j1, j2))
+    return pairs
+
+
+def classify(old, new):
+    """Compare two notebooks (dicts or nbformat nodes); `old` None means a new notebook."""
+    old = old or EMPTY_NOTEBOOK
+    old_cells = old.get('cells', [])
+    new_cells = new.get('cells', [])
+    diff = NotebookDiff()
+
+    if old.get('metadata', {}) != new.get('metadata', {}) or old.get('nbformat') != new.get('nbformat'):
+        diff.add(None, None, METADATA)
+
+    next_new = 0  # where a removed cell would have been, for the resume point
+    for old_index, new_index in _align(old_cells, new_cells):
+        if new_index is not None:
+            next_new = new_index + 1
+        if old_index is None or new_index is None:
+            cell = new_cells[new_index] if old_index is None else old_cells[old_index]
+            label = CODE if cell.get('cell_type') == 'code' else MARKDOWN
+            diff.add(old_index, new_index, label, resume_at=next_new - 1 if old_index is None else next_new)
+            continue
+
+        old_cell, new_cell = old_cells[old_index], new_cells[new_index]
+        types = {old_cell.get('cell_type'), new_cell.get('cell_type')}
+        if len(types) > 1 or _source(old_cell) != _source(new_cell):
+            diff.add(old_index, new_index, CODE if 'code' in types else MARKDOWN, resume_at=new_index)
+        elif old_cell.get('attachments') != new_cell.get('attachments'):
+            diff.add(old_index, new_index, MARKDOWN)
+        if 'code' in types and _outputs(old_cell) != _outputs(new_cell):
+            diff.add(old_index, new_index, OUTPUTS)
+        if _metadata(old_cell) != _metadata(new_cell) or old_cell.get('id') != new_cell.get('id'):
+            diff.add(old_index, new_index, METADATA)
+    return diff
+
+
+def read_revision(path, rev):
+    """A notebook as committed at git revision `rev`; None if it did not exist there or is not JSON."""
+    result = subprocess.run(
+        ['git', 'show', f"{rev}:./{Path(path).as_posix()}"],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        return None
+    try:
+        return json.loads(result.stdout.decode('utf-8'))
+    except ValueError:
+        return None
+
+
+def classify_file(path, rev):
+    """Diff of the notebook at `path` against revision `rev`.
+
+    Files that are not valid JSON cannot be compared and always get a full
+    rebuild.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+    except (OSError, ValueError):
+        diff = NotebookDiff()
+        diff.add(None, None, CODE, resume_at=0)
+        return diff
+    return classify(read_revision(path, rev), new)
+
+
+def changed_notebooks(rev):
+    """Notebooks that differ between `rev` and the working tree."""
+    result = subprocess.run(
+        ['git', 'diff', '--name-only', '--diff-filter=d', rev, '--', '*.ipynb'],
+        capture_output=True, text=True, check=True,
+    )
+    return [line for line in result.stdout.splitlines() if '.ipynb_checkpoints' not in line]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Classify notebook changes and show the rebuild each one needs.")
+    parser.add_argument('paths', nargs='*', help="notebooks to compare (default: every notebook changed since --base)")
+    parser.add_argument('--base', default='HEAD', help="git revision to compare with (default: HEAD)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = args.paths or changed_notebooks(args.base)
+    if not paths:
+        print(f"No notebooks changed since {args.base}")
+        return 0
+
+    plans = {}
+    for path in paths:
+        diff = classify_file(path, args.base)
+        plans.setdefault(diff.plan, []).append(path)
+        print(f"{path}: {diff.summary()}")
+    print()
+    for plan in (EXECUTE, EXPORT, WIKI, SKIP):
+        if plan in plans:
+            print(f"  {plan}: {len(plans[plan])} notebook(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
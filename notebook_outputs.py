@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for notebook cell outputs.
+
+Committed notebooks can stay small: `strip` moves every code cell's outputs
+into a blob named after the SHA-256 of their canonical JSON and leaves only a
+reference in the cell metadata:
+
+    "metadata": {"output_ref": "sha256:3f5a..."}
+
+Identical outputs (the same figure in two notebooks, an unchanged cell after a
+re-run) share one blob, and blobs never change once written. The store lives
+in .notebook-outputs/ at the repository root, laid out like git objects
+(.notebook-outputs/3f/5a...json); set NOTEBOOK_OUTPUT_STORE to keep it
+somewhere else.
+
+The preview generators, the export pipeline and the documentation script call
+rehydrate() on the notebooks they read, so stripped notebooks render with
+their outputs. A missing blob becomes a short placeholder output instead of
+an error.
+
+Usage:
+    python notebook_outputs.py strip [paths...]      # move outputs into the store
+    python notebook_outputs.py rehydrate [paths...]  # put them back into the files
+    python notebook_outputs.py check [paths...]      # exit 1 if outputs are inline or blobs missing
+    python notebook_outputs.py gc                    # delete blobs no notebook references
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+NOTEBOOKS_DIR = Path("notebooks")
+OUTPUT_STORE = Path(
+    os.environ.get('NOTEBOOK_OUTPUT_STORE', Path(__file__).resolve().parent / ".notebook-outputs")
+)
+OUTPUT_REF_KEY = 'output_ref'
+REF_PREFIX = 'sha256:'
+
+
+def _canonical(outputs):
+    return json.dumps(outputs, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _is_json_mimetype(mimetype):
+    return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+
+def _join_lines(outputs):
+    """Join list-of-lines text fields, as nbformat does when it reads a notebook."""
+    for output in outputs:
+        if isinstance(output.get('text'), list):
+            output['text'] = ''.join(output['text'])
+        for mimetype, value in output.get('data', {}).items():
+            if isinstance(value, list) and not _is_json_mimetype(mimetype):
+                output['data'][mimetype] = ''.join(value)
+    return outputs
+
+
+class OutputStore:
+    """Blobs of cell outputs, keyed by the SHA-256 of their canonical JSON."""
+
+    def __init__(self, root=OUTPUT_STORE):
+        self.root = Path(root)
+
+    def blob_path(self, digest):
+        return self.root / digest[:2] / f"{digest[2:]}.json"
+
+    def put(self, outputs):
+        """Store a cell's outputs; returns their reference ('sha256:<hex>')."""
+        data = _canonical(outputs)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + '.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        return REF_PREFIX + digest
+
+    def get(self, ref):
+        """The outputs behind a reference; FileNotFoundError if the blob is missing."""
+        if not ref.startswith(REF_PREFIX):
+            raise ValueError(f"Unknown output reference: {ref}")
+        with open(self.blob_path(ref[len(REF_PREFIX):]), 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def has(self, ref):
+        return ref.startswith(REF_PREFIX) and self.blob_path(ref[len(REF_PREFIX):]).exists()
+
+    def refs(self):
+        """Every reference in the store."""
+        return {
+            REF_PREFIX + path.parent.name + path.stem
+            for path in self.root.glob("??/*.json")
+        }
+
+    def delete(self, ref):
+        self.blob_path(ref[len(REF_PREFIX):]).unlink()
+
+
+def _code_cells(notebook):
+    return [cell for cell in notebook.get('cells', []) if cell.get('cell_type') == 'code']
+
+
+def output_refs(notebook):
+    """References held by a notebook's cells, in cell order."""
+    return [
+        cell['metadata'][OUTPUT_REF_KEY] for cell in _code_cells(notebook)
+        if OUTPUT_REF_KEY in cell.get('metadata', {})
+    ]
+
+
+def has_output_refs(notebook):
+    return any(OUTPUT_REF_KEY in cell.get('metadata', {}) for cell in _code_cells(notebook))
+
+
+def strip(notebook, store=None):
+    """Move outputs of code cells into the store, in place; returns the number of cells stripped."""
+    store = store or OutputStore()
+    stripped = 0
+    for cell in _code_cells(notebook):
+        if not cell.get('outputs'):
+            continue
+        cell.setdefault('metadata', {})[OUTPUT_REF_KEY] = store.put(json.loads(json.dumps(cell['outputs'])))
+        cell['outputs'] = []
+        stripped += 1
+    return stripped
+
+
+def _placeholder(ref):
+    return {
+        'output_type': 'stream',
+        'name': 'stderr',
+        'text': f"[outputs {ref} are not in the output store]\n",
+    }
+
+
+def rehydrate(notebook, store=None, strict=False):
+    """Put stored outputs back into the cells that reference them, in place.
+
+    Works on nbformat nodes and plain dicts and returns the notebook. Missing
+    blobs become a placeholder output, or raise FileNotFoundError if `strict`.
+    """
+    if not has_output_refs(notebook):
+        return notebook
+    store = store or OutputStore()
+    try:
+        from nbformat import NotebookNode, from_dict
+    except ImportError:
+        NotebookNode = None
+    # Blobs keep the file layout; parsed notebooks hold joined text in nodes
+    as_nodes = NotebookNode is not None and isinstance(notebook, NotebookNode)
+    for cell in _code_cells(notebook):
+        ref = cell.get('metadata', {}).pop(OUTPUT_REF_KEY, None)
+        if ref is None:
+            continue
+        try:
+            outputs = store.get(ref)
+        except FileNotFoundError:
+            if strict:
+                raise FileNotFoundError(f"Outputs {ref} are not in {store.root}")
+            outputs = [_placeholder(ref)]
+        cell['outputs'] = [from_dict(output) for output in _join_lines(outputs)] if as_nodes else outputs
+    return notebook
+
+
+def drop_output_refs(notebook):
+    """Forget stored outputs, e.g. before a notebook is executed and gets fresh ones."""
+    for cell in _code_cells(notebook):
+        cell.get('metadata', {}).pop(OUTPUT_REF_KEY, None)
+    return notebook
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_json(notebook, path):
+    """Write a notebook in nbformat's layout, keeping its key order so diffs stay small."""
+    with open(path, 'r', encoding='utf-8') as f:
+        newline = '\n' if f.read().endswith('\n') else ''
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(notebook, indent=1, ensure_ascii=False) + newline)
+
+
+def find_notebooks(paths):
+    notebooks = []
+    for arg in paths:
+        path = Path(arg)
+        if path.is_dir():
+            notebooks.extend(
+                nb for nb in sorted(path.rglob("*.ipynb")) if '.ipynb_checkpoints' not in nb.parts
+            )
+        else:
+            notebooks.append(path)
+    return notebooks
+
+
+def _each_notebook(paths):
+    """(path, notebook) for every readable notebook; unreadable ones are reported and skipped."""
+    for path in find_notebooks(paths):
+        try:
+            yield path, read_json(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Skipping {path}: {e}")
+
+
+def strip_command(paths, store):
+    total = 0
+    for path, notebook in _each_notebook(paths):
+        stripped = strip(notebook, store)
+        if stripped:
+            before = path.stat().st_size
+            write_json(notebook, path)
+            print(f"✂️  {path}: {stripped} cell(s), {before / 1024:.0f} KB -> {path.stat().st_size / 1024:.0f} KB")
+            total += 1
+    print(f"✅ Stripped {total} notebook(s) into {store.root}")
+    return 0
+
+
+def rehydrate_command(paths, store):
+    total = 0
+    for path, notebook in _each_notebook(paths):
+        if not has_output_refs(notebook):
+            continue
+        try:
+            rehydrate(notebook, store, strict=True)
+        except FileNotFoundError as e:
+            print(f"❌ {path}: {e}")
+            return 1
+        write_json(notebook, path)
+        total += 1
+    print(f"✅ Rehydrated {total} notebook(s)")
+    return 0
+
+
+def check_command(paths, store):
+    problems = []
+    for path, notebook in _each_notebook(paths):
+        inline = sum(1 for cell in _code_cells(notebook) if cell.get('outputs'))
+        if inline:
+            problems.append(f"{path}: {inline} cell(s) with inline outputs")
+        missing = [ref for ref in output_refs(notebook) if not store.has(ref)]
+        if missing:
+            problems.append(f"{path}: {len(missing)} output reference(s) missing from the store")
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"\n❌ Run `python notebook_outputs.py strip` and commit {store.root.name}/")
+        return 1
+    print("✅ All notebooks are stripped and their outputs are in the store")
+    return 0
+
+
+def gc_command(paths, store):
+    referenced = set()
+    for _, notebook in _each_notebook(paths):
+        referenced.update(output_refs(notebook))
+    unused = store.refs() - referenced
+    for ref in unused:
+        store.delete(ref)
+    print(f"🧹 Removed {len(unused)} unreferenced blob(s) from {store.root}")
+    return 0
+
+
+COMMANDS = {
+    'strip': strip_command,
+    'rehydrate': rehydrate_command,
+    'check': check_command,
+    'gc': gc_command,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Keep notebook outputs in a content-addressed store.")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('paths', nargs='*', default=[str(NOTEBOOKS_DIR)],
+                        help="notebooks or directories (default: notebooks/)")
+    parser.add_argument('--store', type=Path, default=OUTPUT_STORE,
+                        help=f"output store directory (default: {OUTPUT_STORE})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    return COMMANDS[args.command](args.paths, OutputStore(args.store))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
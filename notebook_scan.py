@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Fast, outputs-skipping notebook scanner with a persisted catalog.
+
+scan_notebook() walks the notebook JSON without building Python objects for
+cell outputs, attachments or metadata: those values are stepped over with
+regex scans of the raw text (a base64 image is one string token, skipped in
+C). Only cell types and the sources of the leading cells are decoded, which
+is all the documentation generator needs. Skipped values are not validated,
+so a syntax error inside an output or a later cell goes unnoticed; the
+exporters that read the full notebook still report it.
+
+Scan results are persisted by notebook_catalog, so repeated runs answer
+metadata queries without re-reading notebooks that have not changed.
+"""
+
+import json
+import re
+
+LEADING_CELLS = 5  # cells whose source is decoded
+
+_STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+# Everything up to the next bracket outside a string, in one C-level match
+_SKIP_RE = re.compile(r'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*')
+_DECODER = json.JSONDecoder()
+
+
+class NotebookScanError(ValueError):
+    """Raised when a notebook is not valid JSON."""
+
+
+class _Scanner:
+    """Minimal cursor over a JSON document."""
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def error(self, message):
+        line = self.text.count('\n', 0, self.pos) + 1
+        column = self.pos - self.text.rfind('\n', 0, self.pos)
+        return NotebookScanError(f"{message}: line {line} column {column} (char {self.pos})")
+
+    def skip_ws(self):
+        self.pos = _WHITESPACE_RE.match(self.text, self.pos).end()
+
+    def peek(self):
+        self.skip_ws()
+        return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the next value into Python objects."""
+        self.skip_ws()
+        try:
+            value, self.pos = _DECODER.raw_decode(self.text, self.pos)
+        except ValueError:
+            raise self.error("Invalid value") from None
+        return value
+
+    def skip(self):
+        """Step over the next value without building it."""
+        char = self.peek()
+        if char == '"':
+            match = _STRING_RE.match(self.text, self.pos)
+            if match is None:
+                raise self.error("Unterminated string")
+            self.pos = match.end()
+        elif char in ('{', '['):
+            depth = 0
+            while True:
+                self.pos = _SKIP_RE.match(self.text, self.pos).end()
+                char = self.text[self.pos:self.pos + 1]
+                if char not in ('{', '[', '}', ']') or not char:
+                    raise self.error("Unterminated container")
+                self.pos += 1
+                depth += 1 if char in '{[' else -1
+                if depth == 0:
+                    return
+        else:
+            # Numbers, true/false/null are short; decoding them is cheap
+            self.decode()
+
+    def members(self):
+        """Iterate over the keys of an object; the caller consumes each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            if not isinstance(key, str):
+                raise self.error("Expecting property name")
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise self.error("Expecting ',' delimiter")
+
+    def items(self):
+        """Iterate over the elements of an array; the caller consumes each value."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise self.error("Expecting ',' delimiter")
+
+
+def _source_text(source):
+    return ''.join(source) if isinstance(source, list) else source
+
+
+def scan_text(text, leading_cells=LEADING_CELLS):
+    """Scan notebook JSON text; see scan_notebook()."""
+    scanner = _Scanner(text)
+    cell_types = []
+    leading = []
+    for key in scanner.members():
+        if key != 'cells':
+            scanner.skip()
+            continue
+        for _ in scanner.items():
+            index = len(cell_types)
+            cell_type = None
+            source = None
+            for cell_key in scanner.members():
+                if cell_key == 'cell_type':
+                    cell_type = scanner.decode()
+                elif cell_key == 'source' and index < leading_cells:
+                    source = _source_text(scanner.decode())
+                else:
+                    scanner.skip()
+            cell_types.append(cell_type)
+            if index < leading_cells:
+                leading.append({'cell_type': cell_type, 'source': source or ''})
+    scanner.skip_ws()
+    if scanner.pos != len(text):
+        raise scanner.error("Extra data")
+    return {
+        'leading_cells': leading,
+        'code_cells': cell_types.count('code'),
+        'markdown_cells': cell_types.count('markdown'),
+        'total_cells': len(cell_types),
+    }
+
+
+def scan_notebook(path, leading_cells=LEADING_CELLS):
+    """Cell counts and the first `leading_cells` cells (type and source) of a notebook.
+
+    Outputs are never decoded. Raises NotebookScanError for invalid JSON.
+    """
+    with open(path, 'rb') as f:
+        return scan_text(f.read().decode('utf-8'), leading_cells)
+
@@ -1,5 +1,5 @@
-# Import necessary libraries
-import pandas as pd
+# Import the GBIF helpers defined next to this script
+from gbif_data_fetching import fetch_gbif_occurrence_data, occurrence_frame, save_occurrences
 
 # Define the scientific name for data collection
 scientific_name = "Convallaria majalis"
@@ -12,8 +12,9 @@ if occurrence_records is None:
     print(f"Error: Could not retrieve occurrence data for {scientific_name}. Please check the GBIF API or your internet connection.")
     exit() # Exit the script if no data is retrieved
 
-# Convert the list of dictionaries into a pandas DataFrame
-df = pd.DataFrame(occurrence_records)
+# Keep only the fields we use, with compact types (float32 coordinates, categorical
+# names and codes, UTC event dates) instead of ~100 loosely typed object columns
+df = occurrence_frame({scientific_name: occurrence_records})
 
 # Print the first 5 rows of the DataFrame to inspect the data
 print("First 5 rows of the DataFrame:")
@@ -21,3 +22,8 @@ print(df.head())
 
 # Print the shape (number of rows and columns) of the DataFrame
 print("\nShape of the DataFrame:", df.shape)
+print(f"Memory usage: {df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+
+# Save as Parquet partitioned by species and year; reload later with
+# load_occurrences(species=[scientific_name], columns=['decimalLatitude', 'decimalLongitude'])
+save_occurrences(df)
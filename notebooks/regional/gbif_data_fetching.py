@@ -1,48 +1,799 @@
+import asyncio
+import hashlib
 import requests
 import json
-from typing import Optional, List, Dict, Any
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote
+from typing import Optional, List, Dict, Any, Iterator, Tuple, Union, Callable, Sequence
 
-def fetch_gbif_occurrence_data(scientific_name: str, country: str = 'FI') -> Optional[List[Dict[str, Any]]]:
+from requests.adapters import HTTPAdapter
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = ds = None
+
+GBIF_API_URL = os.environ.get('GBIF_API_URL', "https://api.gbif.org/v1")
+GBIF_MAX_PAGE_SIZE = 300      # largest `limit` the occurrence search accepts
+GBIF_MAX_OFFSET = 100_000     # search paging stops here; larger sets need the GBIF download API
+REQUEST_TIMEOUT = (5, 30)     # seconds to connect, seconds to wait for the response
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HARVEST_CONCURRENCY = 8       # GBIF requests in flight at once, across all species
+
+# Response cache (see GbifResponseCache); GBIF_OFFLINE=1 answers only from the cache
+GBIF_CACHE_DIR = Path(os.environ.get('GBIF_CACHE_DIR', Path.home() / ".cache" / "botanical-notebooks" / "gbif"))
+GBIF_CACHE_TTL = 24 * 3600    # seconds before an entry is revalidated with the server
+GBIF_CACHE_MAX_MB = 256
+GBIF_OFFLINE = os.environ.get('GBIF_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+# Occurrence schema: the GBIF fields the notebooks use and their compact column types.
+# occurrence_frame() keeps only these (plus any `extra_columns`) out of the ~100 fields
+# GBIF returns; eventDate is parsed separately into a UTC datetime.
+OCCURRENCE_SCHEMA = {
+    'species': 'category',          # the name that was harvested
+    'key': 'Int64',
+    'taxonKey': 'Int64',
+    'scientificName': 'category',
+    'gbifSpecies': 'category',      # GBIF's own `species` (accepted name of the match)
+    'decimalLatitude': 'float32',   # ~1 m resolution, finer than nearly any record's uncertainty
+    'decimalLongitude': 'float32',
+    'coordinateUncertaintyInMeters': 'float32',
+    'eventDate': 'datetime',
+    'year': 'Int16',
+    'month': 'Int8',
+    'day': 'Int8',
+    'individualCount': 'Int32',
+    'countryCode': 'category',
+    'stateProvince': 'category',
+    'basisOfRecord': 'category',
+    'datasetKey': 'category',
+}
+
+# Parquet store written by save_occurrences(), one directory per species and year
+OCCURRENCE_STORE = Path(os.environ.get('OCCURRENCE_STORE', Path("data") / "occurrences"))
+OCCURRENCE_PARTITIONS = ['species', 'year']
+
+
+class TokenBucket:
     """
-    Fetches species occurrence data from the GBIF API.
+    Thread-safe token bucket: `rate` requests per second on average, bursts of up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _normalize_params(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Query parameters as GBIF expects them: no None values, lowercase booleans, sorted keys."""
+    def value(v):
+        if isinstance(v, bool):
+            return 'true' if v else 'false'
+        if isinstance(v, (list, tuple)):
+            return [value(item) for item in v]
+        return str(v)
+    return {str(k): value(v) for k, v in sorted((params or {}).items()) if v is not None}
+
+
+class GbifResponseCache:
+    """
+    Size-bounded on-disk cache of GBIF API responses.
+
+    Entries are keyed by the URL and the normalized query parameters (the page
+    offset included) and stored as <key>.json with the validators the server
+    sent (ETag, Last-Modified). Within `ttl` seconds an entry is served
+    without asking the server; after that the client revalidates it with a
+    conditional request and a 304 reply renews it without a download. The
+    store is evicted least-recently-used first once it exceeds `max_mb`, using
+    file modification times as the access clock.
+    """
+
+    PRUNE_EVERY = 100  # writes between size checks
+
+    def __init__(self, cache_dir: Union[str, Path] = GBIF_CACHE_DIR, ttl: float = GBIF_CACHE_TTL,
+                 max_mb: float = GBIF_CACHE_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_mb * 1024 * 1024
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, params: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps([url, params], sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def load(self, url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The cached entry (fresh or not), or None. Marks it as recently used."""
+        path = self._path(self.key(url, params))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry['stored'] < self.ttl
+
+    @staticmethod
+    def validators(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Conditional request headers for revalidating `entry`."""
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, params: Dict[str, Any], body: Any, headers=None) -> Dict[str, Any]:
+        """Cache a response body with its validators; returns the entry."""
+        headers = headers or {}
+        entry = {
+            'url': url,
+            'params': params,
+            'stored': time.time(),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'body': body,
+        }
+        self._write(self.key(url, params), entry)
+        return entry
+
+    def renew(self, entry: Dict[str, Any]) -> None:
+        """Restart an entry's TTL after the server confirmed it is unchanged (304)."""
+        entry['stored'] = time.time()
+        self._write(self.key(entry['url'], entry['params']), entry)
+
+    def _write(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> None:
+        """Evict least-recently-used entries until the cache fits its size budget."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+class GbifClient:
+    """
+    Reusable GBIF API client.
+
+    Keeps connections alive in a pool, applies explicit timeouts, limits the
+    request rate with a token bucket and retries 429 and 5xx responses (and
+    dropped connections) with jittered exponential backoff, honouring
+    Retry-After. Responses go through a GbifResponseCache, so repeated queries
+    are answered from disk. Counters of requests, retries, cache use and latency
+    are kept in `stats`.
+
+    Args:
+        base_url: API root; point it at a local stand-in server for testing
+            (default: $GBIF_API_URL or https://api.gbif.org/v1).
+        rate: Average requests per second.
+        burst: Requests allowed back to back before the rate applies.
+        timeout: Seconds, or (connect, read) seconds, per request.
+        max_retries: Retries per request before giving up.
+        backoff: Base delay in seconds; attempt n waits up to backoff * 2**n.
+        max_backoff: Upper bound for a single delay.
+        pool_size: Connections kept open per host.
+        cache: A GbifResponseCache, True for one in $GBIF_CACHE_DIR
+            (~/.cache/botanical-notebooks/gbif), or False for no caching.
+        offline: Never touch the network; serve cached entries even when they
+            are stale (default: $GBIF_OFFLINE). Uncached queries raise ConnectionError.
+
+    Example:
+        with GbifClient(rate=5) as client:
+            page = client.get('occurrence/search', {'scientificName': 'Convallaria majalis'})
+            print(client.stats)
+    """
+
+    def __init__(self, base_url: str = GBIF_API_URL, rate: float = 10.0, burst: int = 10,
+                 timeout: Union[float, Tuple[float, float]] = REQUEST_TIMEOUT, max_retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 30.0, pool_size: int = 10,
+                 cache: Union[GbifResponseCache, bool] = True, offline: bool = GBIF_OFFLINE):
+        self.base_url = base_url.rstrip('/')
+        self.cache = GbifResponseCache() if cache is True else (cache or None)
+        self.offline = offline
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = 'application/json'
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,        # HTTP attempts, retries included
+            'retries': 0,
+            'throttled': 0,       # 429 responses
+            'failures': 0,        # calls that gave up
+            'cache_hits': 0,      # answered from disk without a request
+            'cache_revalidated': 0,  # 304: the cached copy is still current
+            'cache_stale': 0,     # stale copies served offline or after a failure
+            'rate_limit_wait': 0.0,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+        }
+
+    def close(self):
+        self.session.close()
+        if self.cache:
+            self.cache.prune()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """A snapshot of the counters, with the mean latency per request."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['latency_mean'] = stats['latency_total'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                if key == 'latency_max':
+                    self._stats[key] = max(self._stats[key], value)
+                else:
+                    self._stats[key] += value
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass  # an HTTP date; fall back to backoff
+        # Full jitter, so many clients retrying at once spread out
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET `path` (relative to the API root) and return the decoded JSON.
+
+        Fresh cache entries are returned without a request and stale ones are
+        revalidated. If the server cannot be reached, or keeps answering 5xx or
+        429, a stale cached copy is returned instead of an error.
+
+        Raises:
+            requests.exceptions.RequestException: The request failed, or still
+                failed after all retries (HTTPError carries the last response),
+                and nothing usable was cached.
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        params = _normalize_params(params)
+        entry = self.cache.load(url, params) if self.cache else None
+        if entry is not None and (self.offline or self.cache.is_fresh(entry)):
+            self._count(cache_hits=1)
+            return entry['body']
+        if self.offline:
+            raise requests.exceptions.ConnectionError(f"Offline and not cached: {url} {params}")
+
+        try:
+            response = self._request(url, params, self.cache.validators(entry) if self.cache else {})
+        except requests.exceptions.RequestException as e:
+            response = getattr(e, 'response', None)
+            transient = response is None or response.status_code in RETRY_STATUSES
+            if entry is None or not transient:
+                raise
+            print(f"Warning: GBIF unavailable ({type(e).__name__}); using a cached copy from "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['stored']))}")
+            self._count(cache_stale=1)
+            return entry['body']
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.renew(entry)
+            self._count(cache_revalidated=1)
+            return entry['body']
+        data = response.json()
+        if self.cache:
+            self.cache.store(url, params, data, response.headers)
+        return data
+
+    def _request(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> requests.Response:
+        """Send one GET with rate limiting and retries; returns the final (2xx or 304) response."""
+        for attempt in range(self.max_retries + 1):
+            self._count(rate_limit_wait=self.bucket.acquire())
+            started = time.perf_counter()
+            response = None
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    self._count(failures=1)
+                    raise
+            finally:
+                latency = time.perf_counter() - started
+                self._count(requests=1, latency_total=latency, latency_max=latency)
+
+            if response is not None:
+                if response.status_code == 429:
+                    self._count(throttled=1)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    if not response.ok:
+                        self._count(failures=1)
+                    response.raise_for_status()
+                    return response
+            self._count(retries=1)
+            time.sleep(self._delay(attempt, response))
+
+    def occurrence_search(self, **params) -> Dict[str, Any]:
+        """One page of /occurrence/search."""
+        return self.get('occurrence/search', params)
+
+
+_DEFAULT_CLIENT = None
+
+
+def default_client() -> GbifClient:
+    """The module's shared client, so separate calls reuse the same connections."""
+    global _DEFAULT_CLIENT
+    if _DEFAULT_CLIENT is None:
+        _DEFAULT_CLIENT = GbifClient()
+    return _DEFAULT_CLIENT
+
+
+def iter_gbif_occurrence_pages(scientific_name: str, country: str = 'FI',
+                               page_size: int = GBIF_MAX_PAGE_SIZE,
+                               max_records: Optional[int] = None,
+                               client: Optional[GbifClient] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Streams GBIF occurrence records page by page.
+
+    Pages through the whole result set with `limit`/`offset`. While the caller
+    works on one page, the next one is already being downloaded, so at most two
+    pages are held in memory at any time.
 
     Args:
         scientific_name: The scientific name of the species (e.g., "Ursus arctos").
         country: The ISO country code to filter occurrences by (default is 'FI' for Finland).
+        page_size: Records per request, at most 300 (GBIF's maximum).
+        max_records: Stop after this many records (default: all of them).
+        client: The GbifClient to send requests with (default: the shared default_client()).
 
-    Returns:
-        A list of occurrence records as dictionaries if successful, otherwise None.  Each dictionary
-        represents a single occurrence record and contains fields like 'latitude', 'longitude',
-        'scientificName', etc.
+    Yields:
+        Lists of occurrence records (dictionaries), one list per page.
+
+    Raises:
+        requests.exceptions.RequestException: A page could not be fetched, even after retries.
 
     Source:
         GBIF - Global Biodiversity Information Facility
         https://api.gbif.org/v1/occurrence/search
-        DOI: 10.15468/dl.xxxxxxxx (Replace with actual DOI when available)
     """
-
-    base_url = "https://api.gbif.org/v1/occurrence/search"
+    page_size = max(1, min(page_size, GBIF_MAX_PAGE_SIZE))
+    limit_total = GBIF_MAX_OFFSET if max_records is None else min(max_records, GBIF_MAX_OFFSET)
     params = {
         'scientificName': scientific_name,
         'country': country,
         'format': 'json',  # Explicitly request JSON format
     }
+    client = client or default_client()
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    def request(offset):
+        limit = min(page_size, limit_total - offset)
+        return pool.submit(client.occurrence_search, **params, offset=offset, limit=limit)
 
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        data = response.json()
-        if 'results' in data:
-            return data['results']
-        else:
+        offset = 0
+        pending = request(offset) if limit_total > 0 else None
+        while pending is not None:
+            data = pending.result()
+            results = data.get('results', [])
+            offset += len(results)
+            done = data.get('endOfRecords', True) or not results or offset >= limit_total
+            # Start the next download before handing this page to the caller
+            pending = None if done else request(offset)
+
+            if done and max_records is None and data.get('count', 0) > GBIF_MAX_OFFSET:
+                print(f"Warning: GBIF has {data['count']} records for {scientific_name} in {country}; "
+                      f"the search API only pages through the first {GBIF_MAX_OFFSET}. "
+                      f"Use the GBIF download API for the full set.")
+            if results:
+                yield results
+    finally:
+        # Also runs when the caller stops early: drop the prefetched page
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_gbif_occurrences(scientific_name: str, country: str = 'FI', **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Streams GBIF occurrence records one at a time.
+
+    Takes the same arguments as iter_gbif_occurrence_pages().
+    """
+    for page in iter_gbif_occurrence_pages(scientific_name, country, **kwargs):
+        yield from page
+
+
+def iter_gbif_occurrence_frames(scientific_name: str, country: str = 'FI', **kwargs) -> Iterator["pd.DataFrame"]:
+    """
+    Streams GBIF occurrence records as pandas DataFrames, one per page.
+
+    Takes the same arguments as iter_gbif_occurrence_pages(). Columns can differ
+    between chunks, since GBIF omits fields a record does not have.
+    """
+    if pd is None:
+        raise ImportError("pandas is required for iter_gbif_occurrence_frames()")
+    for page in iter_gbif_occurrence_pages(scientific_name, country, **kwargs):
+        yield pd.DataFrame.from_records(page)
+
+
+def fetch_gbif_occurrence_data(scientific_name: str, country: str = 'FI',
+                               max_records: Optional[int] = None,
+                               client: Optional[GbifClient] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Fetches species occurrence data from the GBIF API.
+
+    Collects every page of results into one list; use iter_gbif_occurrences()
+    or iter_gbif_occurrence_frames() to process large result sets in bounded memory.
+
+    Args:
+        scientific_name: The scientific name of the species (e.g., "Ursus arctos").
+        country: The ISO country code to filter occurrences by (default is 'FI' for Finland).
+        max_records: Stop after this many records (default: all of them).
+        client: The GbifClient to use (default: the shared default_client(), which
+            retries transient errors).
+
+    Returns:
+        A list of occurrence records as dictionaries if successful, otherwise None.  Each dictionary
+        represents a single occurrence record and contains fields like 'latitude', 'longitude',
+        'scientificName', etc.
+
+    Source:
+        GBIF - Global Biodiversity Information Facility
+        https://api.gbif.org/v1/occurrence/search
+        DOI: 10.15468/dl.xxxxxxxx (Replace with actual DOI when available)
+    """
+    try:
+        records = list(iter_gbif_occurrences(scientific_name, country, max_records=max_records, client=client))
+        if not records:
             print(f"Warning: No results found for {scientific_name} in {country}.")
-            return []  # Return empty list, not None, to indicate no matches
-    except requests.exceptions.RequestException as e:
-        print(f"Network error fetching data for {scientific_name}: {e}")
-        return None
+        return records  # Empty list, not None, to indicate no matches
     except requests.exceptions.Timeout as e:
         print(f"Timeout error fetching data for {scientific_name}: {e}")
         return None
     except json.JSONDecodeError as e:
         print(f"Failed to decode JSON response for {scientific_name}: {e}")
         return None
+    except requests.exceptions.RequestException as e:
+        print(f"Network error fetching data for {scientific_name}: {e}")
+        return None
+
+
+def print_progress(species: str, fetched: int, total: int) -> None:
+    """Default harvest progress report: one line per page received."""
+    print(f"  🌿 {species}: {fetched:,}/{total:,}")
+
+
+def _apply_schema(frame: "pd.DataFrame", fill_missing: bool = True) -> "pd.DataFrame":
+    """Casts the columns of `frame` named in OCCURRENCE_SCHEMA to their types, in place."""
+    for column, dtype in OCCURRENCE_SCHEMA.items():
+        if column not in frame:
+            if not fill_missing:
+                continue
+            frame[column] = pd.Series(pd.NA, index=frame.index, dtype='object')
+        if dtype == 'datetime':
+            if not isinstance(frame[column].dtype, pd.DatetimeTZDtype):
+                # Date ranges ("2020-05-01/2020-05-03") and partial dates become NaT
+                frame[column] = pd.to_datetime(frame[column], errors='coerce', utc=True, format='ISO8601')
+            continue
+        if frame[column].dtype == dtype:
+            continue
+        if dtype != 'category':
+            frame[column] = pd.to_numeric(frame[column], errors='coerce')
+        frame[column] = frame[column].astype(dtype)
+    return frame
+
+
+def occurrence_frame(records_by_species: Dict[str, List[Dict[str, Any]]],
+                     extra_columns: Sequence[str] = ()) -> "pd.DataFrame":
+    """
+    Merges occurrence records of several species into one typed DataFrame.
+
+    Only the fields in OCCURRENCE_SCHEMA (and `extra_columns`, kept as GBIF
+    returned them) are taken from the records, with compact types: float32
+    coordinates, categorical names, codes and record types, and `eventDate`
+    as a UTC datetime. The harvested name goes into a `species` column
+    (GBIF's own `species` field is kept as `gbifSpecies`), and records GBIF
+    returned twice while paging are dropped.
+    """
+    if pd is None:
+        raise ImportError("pandas is required for occurrence_frame()")
+    fields = [('species' if column == 'gbifSpecies' else column) for column in OCCURRENCE_SCHEMA if column != 'species']
+    fields += [column for column in extra_columns if column not in fields]
+    frames = []
+    for species, records in records_by_species.items():
+        # Pick the fields out of the dicts directly; the other ~100 never become columns
+        frame = pd.DataFrame.from_records(records, columns=fields) if records else pd.DataFrame(columns=fields)
+        frame = frame.rename(columns={'species': 'gbifSpecies'})
+        frame.insert(0, 'species', species)
+        frames.append(frame)
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['species', *extra_columns])
+    frame = _apply_schema(frame)
+    if frame['key'].notna().any():
+        frame = frame.drop_duplicates(subset=['species', 'key'], ignore_index=True)
+    return frame
+
+
+def save_occurrences(occurrences: "pd.DataFrame", path: Union[str, Path] = OCCURRENCE_STORE) -> Path:
+    """
+    Writes an occurrence table to a Parquet dataset partitioned by species and year.
+
+    The layout is `<path>/species=<name>/year=<year>/part-0.parquet`. Every
+    species in `occurrences` replaces what the store held for it, so saving a
+    fresh harvest never duplicates records; other species are left alone.
+    Records without a year go to `year=__HIVE_DEFAULT_PARTITION__`.
+
+    Returns:
+        The dataset directory, for load_occurrences().
+    """
+    if pd is None or pa is None:
+        raise ImportError("pandas and pyarrow are required for save_occurrences()")
+    missing = [column for column in OCCURRENCE_PARTITIONS if column not in occurrences]
+    if missing:
+        raise ValueError(f"Occurrences need {', '.join(missing)} column(s) to be partitioned")
+    path = Path(path)
+    occurrences = _apply_schema(occurrences.copy(deep=False), fill_missing=False)
+
+    species = set(occurrences['species'].dropna().astype(str))
+    if path.is_dir():
+        for directory in path.glob('species=*'):
+            if unquote(directory.name.partition('=')[2]) in species:
+                shutil.rmtree(directory)
+
+    table = pa.Table.from_pandas(occurrences, preserve_index=False)
+    ds.write_dataset(
+        table, path, format='parquet',
+        partitioning=OCCURRENCE_PARTITIONS, partitioning_flavor='hive',
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    print(f"💾 Saved {len(occurrences):,} occurrences of {len(species)} species to {path}")
+    return path
+
+
+def load_occurrences(path: Union[str, Path] = OCCURRENCE_STORE, columns: Optional[Sequence[str]] = None,
+                     species: Optional[Sequence[str]] = None,
+                     years: Optional[Sequence[int]] = None) -> "pd.DataFrame":
+    """
+    Reads occurrences written by save_occurrences().
+
+    Only the requested columns are read from disk, and the `species` and
+    `years` filters skip other partitions' files without opening them, so
+    a few columns of one species load in a fraction of the full table's time.
+
+    Args:
+        path: The dataset directory.
+        columns: Columns to load (default: all).
+        species: Harvested names to load (default: all).
+        years: Years to load, e.g. range(2000, 2025) (default: all).
+
+    Returns:
+        DataFrame with the OCCURRENCE_SCHEMA types.
+    """
+    if pd is None or pa is None:
+        raise ImportError("pandas and pyarrow are required for load_occurrences()")
+    partitioning = ds.partitioning(pa.schema([('species', pa.string()), ('year', pa.int16())]), flavor='hive')
+    dataset = ds.dataset(Path(path), format='parquet', partitioning=partitioning)
+
+    expression = None
+    if species is not None:
+        expression = ds.field('species').isin(list(species))
+    if years is not None:
+        by_year = ds.field('year').isin([int(year) for year in years])
+        expression = by_year if expression is None else expression & by_year
+    table = dataset.to_table(columns=list(columns) if columns is not None else None, filter=expression)
+    occurrences = _apply_schema(table.to_pandas(), fill_missing=False)
+    if columns is None:
+        # Partition columns come last from the dataset; put them back in schema order
+        order = [column for column in OCCURRENCE_SCHEMA if column in occurrences]
+        occurrences = occurrences[order + [column for column in occurrences if column not in order]]
+    return occurrences
+
+
+async def _harvest_species(client: GbifClient, species: str, params: Dict[str, Any], cap: int,
+                           semaphore: asyncio.Semaphore, executor: ThreadPoolExecutor,
+                           progress: Optional[Callable[[str, int, int], None]]) -> List[Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    fetched = 0
+    total = None
+
+    async def page(offset, limit):
+        nonlocal fetched
+        async with semaphore:
+            data = await loop.run_in_executor(executor, lambda: client.occurrence_search(
+                **params, scientificName=species, offset=offset, limit=limit
+            ))
+        fetched += len(data.get('results', []))
+        if progress and total is not None:
+            progress(species, fetched, total)
+        return data
+
+    # The first page tells how many records there are; the rest are requested all at once
+    first = await page(0, min(GBIF_MAX_PAGE_SIZE, cap))
+    results = first.get('results', [])
+    total = min(first.get('count', len(results)), cap)
+    if progress:
+        progress(species, min(fetched, total), total)
+    if first.get('endOfRecords', True) or len(results) >= total:
+        return results[:total]
+
+    tasks = [
+        asyncio.create_task(page(offset, min(GBIF_MAX_PAGE_SIZE, total - offset)))
+        for offset in range(len(results), total, GBIF_MAX_PAGE_SIZE)
+    ]
+    try:
+        pages = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    for data in pages:
+        results.extend(data.get('results', []))
+    return results
+
+
+async def harvest_occurrences(species_list: Sequence[str], country: Optional[str] = 'FI',
+                              concurrency: int = HARVEST_CONCURRENCY,
+                              max_records_per_species: Optional[int] = None,
+                              client: Optional[GbifClient] = None,
+                              progress: Optional[Callable[[str, int, int], None]] = print_progress,
+                              **filters) -> Tuple["pd.DataFrame", Dict[str, Dict[str, Any]]]:
+    """
+    Fetches GBIF occurrences of many species concurrently.
+
+    Every page of every species is a separate request, and at most
+    `concurrency` of them are in flight at any time, so the whole harvest
+    takes about as long as the largest species rather than the sum of all.
+    One species failing does not stop the others. In a notebook, `await` this
+    directly; elsewhere use harvest_gbif_occurrences().
+
+    Args:
+        species_list: Scientific names to harvest.
+        country: ISO country code filter (None for worldwide).
+        concurrency: Requests in flight at once, across all species.
+        max_records_per_species: Stop each species after this many records
+            (default: all, up to the search API's 100,000).
+        client: The GbifClient to use (default: a new one sized for `concurrency`).
+        progress: Called as progress(species, fetched, total) after every page;
+            None to stay quiet.
+        **filters: Further occurrence search parameters, e.g. stateProvince="Uusimaa",
+            year="2000,2024", hasCoordinate=True or geometry="POLYGON((...))".
+
+    Returns:
+        (occurrences, report): one DataFrame typed by occurrence_frame(), and per
+        species {'records', 'seconds', 'error'} ('error' is None on success).
+
+    Source:
+        GBIF - Global Biodiversity Information Facility
+        https://api.gbif.org/v1/occurrence/search
+    """
+    cap = GBIF_MAX_OFFSET if max_records_per_species is None else min(max_records_per_species, GBIF_MAX_OFFSET)
+    params = {key: value for key, value in filters.items() if value is not None}
+    if country:
+        params['country'] = country
+    own_client = client is None
+    client = client or GbifClient(pool_size=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    # Blocking requests run here; asyncio's default pool can be smaller than `concurrency`
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    species_list = list(dict.fromkeys(species_list))  # once each, in order
+    started = time.perf_counter()
+
+    async def one(species):
+        species_started = time.perf_counter()
+        try:
+            records = await _harvest_species(client, species, params, cap, semaphore, executor, progress)
+            error = None
+            print(f"✓ {species}: {len(records):,} records ({time.perf_counter() - species_started:.1f}s)")
+        except requests.exceptions.RequestException as e:
+            records = []
+            error = f"{type(e).__name__}: {e}"
+            print(f"❌ {species}: {error}")
+        return records, {'records': len(records), 'seconds': time.perf_counter() - species_started, 'error': error}
+
+    try:
+        outcomes = await asyncio.gather(*(one(species) for species in species_list))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if own_client:
+            client.close()
+
+    records_by_species = {species: records for species, (records, _) in zip(species_list, outcomes)}
+    report = {species: summary for species, (_, summary) in zip(species_list, outcomes)}
+    failed = [species for species, summary in report.items() if summary['error']]
+    print(f"Harvested {sum(s['records'] for s in report.values()):,} records for "
+          f"{len(species_list) - len(failed)}/{len(species_list)} species in {time.perf_counter() - started:.1f}s"
+          + (f"; failed: {', '.join(failed)}" if failed else ""))
+    return occurrence_frame(records_by_species), report
+
+
+def harvest_gbif_occurrences(species_list: Sequence[str], country: Optional[str] = 'FI',
+                             **kwargs) -> Tuple["pd.DataFrame", Dict[str, Dict[str, Any]]]:
+    """
+    Blocking wrapper around harvest_occurrences(), taking the same arguments.
+
+    Works in scripts and inside Jupyter, where an event loop is already running.
+    """
+    coroutine = harvest_occurrences(species_list, country, **kwargs)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # A notebook's loop is busy running this cell; use a loop in another thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
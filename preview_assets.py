@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Content-addressed asset store for preview HTML.
+
+HTMLExporter inlines every image output as a base64 data URI and every
+template stylesheet as a <style> block, so each preview page carries several
+hundred KB that no browser can cache. externalize_assets() moves them into
+previews/assets/:
+
+- Images are downscaled to MAX_IMAGE_WIDTH and transcoded to WebP (needs
+  Pillow; without it the original bytes are stored unchanged) and replaced by
+  lazy-loaded <img> tags with explicit dimensions.
+- Large stylesheets become <link> tags; the template CSS is identical for every
+  notebook, so all pages share one cached file.
+
+Files are named after the hash of their source bytes and the transcoding
+settings, so identical content is stored once across all notebooks and is
+never transcoded twice.
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ASSETS_DIR = Path("previews") / "assets"
+MAX_IMAGE_WIDTH = 1160  # preview pages are 1200px wide with 20px padding
+WEBP_QUALITY = 80
+MIN_STYLE_BYTES = 2048  # smaller <style> blocks stay inline
+
+_DATA_IMG_RE = re.compile(
+    r'<img(?P<before>[^>]*?)\ssrc="data:image/(?P<fmt>png|jpeg|gif|webp);base64,(?P<data>[^"]+)"(?P<after>[^>]*)>'
+)
+_STYLE_RE = re.compile(r'<style(?P<attrs>[^>]*)>(?P<css>.*?)</style>', re.S)
+
+
+def _asset_name(data, suffix, settings=""):
+    digest = hashlib.sha256(data)
+    digest.update(settings.encode('utf-8'))
+    return f"{digest.hexdigest()[:20]}{suffix}"
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _transcode(data, max_width):
+    """Downscale and re-encode an image. Returns (bytes, suffix, width, height)."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.width > max_width:
+        height = round(image.height * max_width / image.width)
+        image = image.resize((max_width, height), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', quality=WEBP_QUALITY, method=6)
+    return buffer.getvalue(), '.webp', image.width, image.height
+
+
+class AssetStore:
+    """Writes deduplicated images and stylesheets to a shared directory."""
+
+    def __init__(self, assets_dir=ASSETS_DIR, max_width=MAX_IMAGE_WIDTH):
+        self.assets_dir = Path(assets_dir)
+        self.max_width = max_width
+        self.assets_dir.mkdir(parents=True, exist_ok=True)
+        # Source hash -> (filename, width, height); avoids re-decoding within a process
+        self._images = {}
+
+    def add_image(self, data, fmt):
+        """Store an image; returns (filename, width, height) with unknown sizes as None."""
+        source_key = hashlib.sha256(data).hexdigest()
+        if source_key in self._images:
+            return self._images[source_key]
+
+        if Image is None or fmt == 'gif':  # keep animations as they are
+            name, width, height = _asset_name(data, f".{fmt}"), None, None
+            if not (self.assets_dir / name).exists():
+                _write_atomic(self.assets_dir / name, data)
+        else:
+            settings = f"webp:{WEBP_QUALITY}:{self.max_width}"
+            stored = self._stored_image(_asset_name(data, "", settings), fmt)
+            if stored is not None:
+                name, width, height = stored
+            else:
+                try:
+                    encoded, suffix, width, height = _transcode(data, self.max_width)
+                except (OSError, ValueError):
+                    encoded, suffix, width, height = data, f".{fmt}", None, None
+                if len(encoded) >= len(data) and suffix != f".{fmt}":
+                    # Transcoding did not help; keep the original
+                    encoded, suffix, width, height = data, f".{fmt}", None, None
+                name = _asset_name(data, suffix, settings)
+                _write_atomic(self.assets_dir / name, encoded)
+
+        self._images[source_key] = (name, width, height)
+        return self._images[source_key]
+
+    def _stored_image(self, stem, fmt):
+        """(filename, width, height) of an earlier transcode of the same source, or None.
+
+        Only finished files are considered, never another worker's *.tmp file.
+        A file that can't be decoded is treated as missing and re-encoded.
+        """
+        for suffix in ('.webp', f".{fmt}"):
+            path = self.assets_dir / f"{stem}{suffix}"
+            if not path.exists():
+                continue
+            try:
+                with Image.open(path) as image:
+                    return path.name, image.width, image.height
+            except (OSError, ValueError):  # includes UnidentifiedImageError
+                continue
+        return None
+
+    def add_text(self, text, suffix):
+        """Store a text asset (e.g. CSS); returns its filename."""
+        data = text.encode('utf-8')
+        name = _asset_name(data, suffix)
+        if not (self.assets_dir / name).exists():
+            _write_atomic(self.assets_dir / name, data)
+        return name
+
+
+def externalize_assets(html, store, url_prefix="../assets/"):
+    """Move inline images and large stylesheets out of `html` into `store`.
+
+    `url_prefix` is the path from the page to the assets directory.
+    Returns the rewritten HTML.
+    """
+    def replace_image(match):
+        try:
+            data = base64.b64decode(match.group('data'), validate=False)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+        name, width, height = store.add_image(data, match.group('fmt'))
+        attrs = f"{match.group('before')}{match.group('after')}".rstrip(' /')
+        size = ''
+        if width and not re.search(r'\swidth=', attrs):
+            size = f' width="{width}" height="{height}"'
+        return f'<img{attrs} src="{url_prefix}{name}"{size} loading="lazy" decoding="async">'
+
+    def replace_style(match):
+        css = match.group('css')
+        if len(css) < MIN_STYLE_BYTES:
+            return match.group(0)
+        name = store.add_text(css, '.css')
+        return f'<link rel="stylesheet" href="{url_prefix}{name}">'
+
+    html = _DATA_IMG_RE.sub(replace_image, html)
+    return _STYLE_RE.sub(replace_style, html)
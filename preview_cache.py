@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Incremental build cache for notebook previews.
+
+Each preview generator records a content key for every notebook it builds in
+its own manifest, previews/manifest-<generator>.json. A notebook whose key is
+unchanged (and whose artifacts are still the files that build wrote) is
+skipped on the next run, so a no-op rebuild only has to hash the notebooks
+instead of executing or converting them. Both generators write the same HTML
+paths, so an artifact overwritten by the other generator counts as stale.
+"""
+
+import hashlib
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+
+PREVIEWS_DIR = Path("previews")
+
+# Bump to invalidate every cached preview (e.g. after changing the page layout)
+CACHE_VERSION = 1
+
+# Packages whose versions affect executed outputs or rendered HTML
+FINGERPRINT_PACKAGES = [
+    "nbconvert", "nbformat", "nbclient", "ipykernel",
+    "numpy", "pandas", "matplotlib", "seaborn", "plotly",
+]
+
+
+def _sha256(*parts):
+    """Hash a sequence of strings/bytes into a hex digest."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part)
+        digest.update(b'\0')  # separator so ("ab", "c") != ("a", "bc")
+    return digest.hexdigest()
+
+
+def env_fingerprint(kernel_name="python3"):
+    """Describe the interpreter and package versions the previews are built with."""
+    versions = []
+    for package in FINGERPRINT_PACKAGES:
+        try:
+            versions.append(f"{package}=={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}==missing")
+    return _sha256(kernel_name, sys.version, platform.machine(), *versions)
+
+
+def file_hash(path):
+    """Hash the raw bytes of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def notebook_source_hash(nb_path):
+    """Hash the cell sources of a notebook, ignoring outputs and metadata.
+
+    Code cells decide what gets executed; markdown and raw cells are rendered
+    into the preview, so both are part of the key. Notebooks that are not valid
+    JSON fall back to the raw file hash; unreadable files return None, which
+    disables caching for them.
+    """
+    try:
+        with open(nb_path, 'r', encoding='utf-8') as f:
+            nb = json.load(f)
+    except ValueError:
+        return file_hash(nb_path)
+    except OSError:
+        return None
+
+    parts = []
+    for cell in nb.get('cells', []):
+        source = cell.get('source', '')
+        if isinstance(source, list):
+            source = ''.join(source)
+        parts.append(f"{cell.get('cell_type', '')}:{source}")
+    return _sha256(*parts)
+
+
+def cache_key(content_hash, *settings):
+    """Combine a notebook content hash with generator settings into a cache key."""
+    if content_hash is None:
+        return None
+    return _sha256(str(CACHE_VERSION), content_hash, *(json.dumps(s, sort_keys=True) for s in settings))
+
+
+def manifest_path(generator):
+    """The build manifest of one generator, e.g. previews/manifest-generate_previews.json."""
+    return PREVIEWS_DIR / f"manifest-{generator}.json"
+
+
+def _stamp(path):
+    """Size and modification time of an artifact, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_manifest(path):
+    """Load the build manifest, returning an empty one if missing or corrupt."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': CACHE_VERSION, 'notebooks': {}}
+
+    if manifest.get('version') != CACHE_VERSION:
+        return {'version': CACHE_VERSION, 'notebooks': {}}
+    manifest.setdefault('notebooks', {})
+    return manifest
+
+
+def save_manifest(manifest, path):
+    """Atomically write the build manifest."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(manifest, name, key):
+    """Return True if `name` was built with `key` and its artifacts are unchanged since."""
+    if key is None:
+        return False
+    entry = manifest['notebooks'].get(name)
+    if not entry or entry.get('key') != key or entry.get('failed'):
+        return False
+    stamps = entry.get('stamps', {})
+    return all(
+        _stamp(artifact) is not None and _stamp(artifact) == stamps.get(artifact)
+        for artifact in entry.get('artifacts', [])
+    )
+
+
+def record_build(manifest, name, key, artifacts):
+    """Remember that `name` was built with `key`, producing `artifacts`."""
+    if key is None:
+        return
+    artifacts = [str(a) for a in artifacts]
+    manifest['notebooks'][name] = {
+        'key': key,
+        'artifacts': artifacts,
+        'stamps': {artifact: _stamp(artifact) for artifact in artifacts},
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def failed_previously(manifest, name, key):
+    """Return True if `name` already failed to build with this exact `key`."""
+    if key is None:
+        return False
+    entry = manifest['notebooks'].get(name)
+    return bool(entry and entry.get('key') == key and entry.get('failed'))
+
+
+def record_failure(manifest, name, key):
+    """Remember that `name` failed with `key` so unchanged broken notebooks are not retried."""
+    if key is None:
+        return
+    manifest['notebooks'][name] = {
+        'key': key,
+        'artifacts': [],
+        'failed': True,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+    }
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Single-pass, multi-format export of executed notebooks.
+
+An ExportPipeline is created once per process and holds one exporter instance
+per output format, so templates are loaded a single time no matter how many
+notebooks are rendered. Each notebook is rendered to every requested format
+from the same in-memory notebook node: no re-reading, no re-execution.
+Image outputs are extracted once and the resulting files are shared by the
+formats that reference external images (Markdown); HTML and slides embed them.
+Notebooks whose outputs were moved to the output store (notebook_outputs.py)
+are rehydrated on a copy before rendering.
+
+Supported formats: html, markdown, slides (reveal.js) and pdf (needs LaTeX).
+
+Usage:
+    pipeline = ExportPipeline(['html', 'markdown', 'slides'])
+    rendered = pipeline.export(executed_nb, stem='regional_foo')
+    pipeline.write(rendered, {'html': Path('previews/html/regional_foo.html'), ...})
+"""
+
+import copy
+from pathlib import Path
+
+from nbconvert import HTMLExporter, MarkdownExporter, PDFExporter, SlidesExporter
+from nbconvert.preprocessors import ExtractOutputPreprocessor
+from traitlets.config import Config
+from traitlets.config.loader import PyFileConfigLoader
+
+from notebook_outputs import has_output_refs, rehydrate
+
+FORMATS = {
+    'html': HTMLExporter,
+    'markdown': MarkdownExporter,
+    'slides': SlidesExporter,
+    'pdf': PDFExporter,
+}
+
+# File suffix written for each format
+SUFFIXES = {
+    'html': '.html',
+    'markdown': '.md',
+    'slides': '.slides.html',
+    'pdf': '.pdf',
+}
+
+# Shared nbconvert settings used by the notebooks' own export buttons
+DEFAULT_CONFIG_FILE = Path("notebooks") / "nbconvert_config.py"
+
+
+def load_config(config_file=None):
+    """Load an nbconvert config file (like notebooks/nbconvert_config.py) if given."""
+    if config_file is None or not Path(config_file).exists():
+        return Config()
+    config_file = Path(config_file)
+    return PyFileConfigLoader(config_file.name, path=str(config_file.parent)).load_config()
+
+
+class ExportPipeline:
+    """Render an executed notebook node to several formats with reused exporters."""
+
+    def __init__(self, formats=('html', 'markdown'), template='classic',
+                 exclude_input=None, config_file=None, config=None):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown export format(s): {', '.join(sorted(unknown))}")
+
+        file_config = load_config(config_file)
+        if config is not None:
+            file_config.merge(config)  # explicit settings win over the config file
+        config = file_config
+        if exclude_input is not None:
+            config.TemplateExporter.exclude_input = exclude_input
+            for exporter_class in FORMATS.values():
+                config[exporter_class.__name__].exclude_input = exclude_input
+        # Images are extracted once by the pipeline, not by each exporter
+        markdown_config = copy.deepcopy(config)
+        markdown_config.ExtractOutputPreprocessor.enabled = False
+
+        self.formats = list(formats)
+        self.exporters = {}
+        for fmt in self.formats:
+            exporter_config = markdown_config if fmt == 'markdown' else config
+            exporter = FORMATS[fmt](config=exporter_config)
+            if fmt == 'html':
+                exporter.template_name = template
+            self.exporters[fmt] = exporter
+        self._extractor = ExtractOutputPreprocessor()
+
+    def export(self, notebook, stem='notebook', resources=None):
+        """Render `notebook` to every format.
+
+        Returns a dict mapping format -> (body, resources). Formats that fail
+        (e.g. PDF without LaTeX) map to (None, {'error': message}).
+        """
+        if has_output_refs(notebook):
+            notebook = rehydrate(copy.deepcopy(notebook))
+        base_resources = {'metadata': {'name': stem}, 'unique_key': stem}
+        base_resources.update(resources or {})
+
+        # Extract images once; the extracted copy is shared by file-based formats
+        extracted_nb = None
+        extracted_resources = None
+        if 'markdown' in self.exporters:
+            extracted_resources = copy.deepcopy(base_resources)
+            extracted_resources['output_files_dir'] = f"{stem}_files"
+            extracted_resources['outputs'] = {}
+            extracted_nb, extracted_resources = self._extractor.preprocess(
+                copy.deepcopy(notebook), extracted_resources
+            )
+
+        rendered = {}
+        for fmt, exporter in self.exporters.items():
+            try:
+                if fmt == 'markdown':
+                    body, fmt_resources = exporter.from_notebook_node(
+                        extracted_nb, copy.deepcopy(extracted_resources)
+                    )
+                    fmt_resources['outputs'] = extracted_resources['outputs']
+                else:
+                    body, fmt_resources = exporter.from_notebook_node(
+                        notebook, copy.deepcopy(base_resources)
+                    )
+                rendered[fmt] = (body, fmt_resources)
+            except Exception as e:
+                rendered[fmt] = (None, {'error': str(e)})
+        return rendered
+
+    @staticmethod
+    def write(rendered, paths):
+        """Write rendered bodies (and extracted images) to `paths` (format -> Path).
+
+        Returns the list of formats that were written.
+        """
+        written = []
+        for fmt, path in paths.items():
+            body, resources = rendered.get(fmt, (None, {}))
+            if body is None:
+                continue
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(body, bytes):
+                path.write_bytes(body)
+            else:
+                path.write_text(body, encoding='utf-8')
+            if fmt == 'markdown':
+                # Images referenced as <stem>_files/... next to the .md file
+                for filename, data in resources.get('outputs', {}).items():
+                    output_path = path.parent / filename
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+                    output_path.write_bytes(data)
+            written.append(fmt)
+        return written
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+Searchable, paginated preview gallery shared by both preview generators.
+
+Instead of one HTML card per notebook, the gallery index.html embeds a compact
+JSON manifest (title, category, link, tags per preview) and renders cards in
+the browser a page at a time as the user scrolls. Search runs entirely on the
+client against a prebuilt inverted index over titles, markdown headings and
+tags, sharded by category (previews/gallery/index-<category>.json); shards are
+only downloaded when the user first searches.
+
+Entries are extracted from the notebooks themselves and cached in
+previews/gallery/entries.json by file hash, so a build only parses notebooks
+that changed and never reads the rendered previews back. Shard files are only
+rewritten when their content changes.
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+from pathlib import Path
+
+from preview_cache import file_hash
+
+GALLERY_DIR = Path("previews") / "gallery"
+ENTRIES_PATH = GALLERY_DIR / "entries.json"
+PAGE_SIZE = 48  # cards rendered per scroll step
+
+# Relevance of a term by where it was found
+FIELD_WEIGHTS = {'title': 3, 'tag': 2, 'heading': 1}
+
+CATEGORY_ICONS = {
+    'templates': '📐',
+    'examples': '📋',
+    'agrology': '🌾',
+    'greenhouse': '🏗️',
+    'regional': '🗺️',
+    'education': '🎓',
+}
+
+_TOKEN_RE = re.compile(r'\w{2,}', re.UNICODE)
+_HEADING_RE = re.compile(r'^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$', re.M)
+# Fallback for notebooks that are not valid JSON: headings inside source strings
+_RAW_HEADING_RE = re.compile(r'"\s*(#{1,6})\s+((?:[^"\\]|\\.)+?)(?:\\n)?"')
+
+
+def tokenize(text):
+    """Lower-cased word tokens used for both indexing and querying."""
+    return [token.lower() for token in _TOKEN_RE.findall(text) if not token.isdigit()]
+
+
+def _display_name(stem):
+    return stem.replace('_', ' ').replace('-', ' ').title()
+
+
+def _clean_heading(text):
+    text = re.sub(r'<[^>]+>|[*_`]|\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    return text.strip()
+
+
+def extract_entry(nb_path, notebooks_dir=Path("notebooks")):
+    """Title, headings and tags of a notebook, read from its source."""
+    relative = nb_path.relative_to(notebooks_dir)
+    category = relative.parts[0] if len(relative.parts) > 1 else 'root'
+    headings = []
+    tags = set()
+    try:
+        with open(nb_path, 'r', encoding='utf-8') as f:
+            notebook = json.load(f)
+        metadata = notebook.get('metadata', {})
+        for key in ('tags', 'keywords'):
+            value = metadata.get(key, [])
+            tags.update([value] if isinstance(value, str) else value)
+        for cell in notebook.get('cells', []):
+            tags.update(cell.get('metadata', {}).get('tags', []))
+            if cell.get('cell_type') == 'markdown':
+                source = cell.get('source', '')
+                source = ''.join(source) if isinstance(source, list) else source
+                headings.extend(
+                    (len(level), _clean_heading(text)) for level, text in _HEADING_RE.findall(source)
+                )
+    except (OSError, ValueError):
+        try:
+            raw = nb_path.read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            raw = ''
+        headings.extend((len(level), _clean_heading(text)) for level, text in _RAW_HEADING_RE.findall(raw))
+
+    headings = [(level, text) for level, text in headings if text]
+    top = [text for level, text in headings if level == 1]
+    return {
+        'title': top[0] if top else _display_name(nb_path.stem),
+        'name': _display_name(nb_path.stem),
+        'category': category,
+        'headings': [text for _, text in headings][:50],
+        'tags': sorted(str(tag) for tag in tags if tag),
+    }
+
+
+def load_entries(path=ENTRIES_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_if_changed(path, text):
+    """Write `text` to `path` unless it already has exactly that content."""
+    path = Path(path)
+    try:
+        if path.read_text(encoding='utf-8') == text:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+    return True
+
+
+def update_entries(previews, notebooks_dir=Path("notebooks"), path=ENTRIES_PATH):
+    """Return gallery entries for `previews` (a list of (nb_path, url[, thumbnail])).
+
+    Only notebooks whose file hash changed since the last build are parsed.
+    """
+    cached = load_entries(path)
+    entries = {}
+    for nb_path, url, *thumbnail in previews:
+        key = str(nb_path.relative_to(notebooks_dir))
+        digest = file_hash(nb_path)
+        if key in cached and cached[key]['hash'] == digest:
+            entry = cached[key]['entry']
+        else:
+            entry = extract_entry(nb_path, notebooks_dir)
+        entry = dict(entry, url=url, thumbnail=thumbnail[0] if thumbnail else None)
+        entries[key] = {'hash': digest, 'entry': entry}
+    _write_if_changed(path, json.dumps(entries, indent=1, sort_keys=True, ensure_ascii=False))
+    return [entries[key]['entry'] for key in sorted(entries)]
+
+
+def build_index(entries):
+    """Split entries into the embedded manifest and per-category inverted indexes.
+
+    Returns (manifest, shards): manifest is a list of compact card records and
+    shards maps category -> {term: [doc, weight, doc, weight, ...]} where doc
+    is the position in the manifest.
+    """
+    entries = sorted(entries, key=lambda e: (e['category'], e['name'].lower()))
+    manifest = []
+    shards = {}
+    for doc, entry in enumerate(entries):
+        record = {
+            't': entry['title'],
+            'c': entry['category'],
+            'u': entry['url'],
+            'g': entry['tags'],
+        }
+        if entry.get('thumbnail'):
+            record['i'] = [entry['thumbnail']['src'], entry['thumbnail']['srcset']]
+        manifest.append(record)
+        scores = {}
+        for field, texts in (('title', [entry['title'], entry['name']]),
+                             ('tag', entry['tags'] + [entry['category']]),
+                             ('heading', entry['headings'])):
+            for text in texts:
+                for term in tokenize(text):
+                    scores[term] = max(scores.get(term, 0), FIELD_WEIGHTS[field])
+        shard = shards.setdefault(entry['category'], {})
+        for term, weight in scores.items():
+            shard.setdefault(term, []).extend([doc, weight])
+    return manifest, shards
+
+
+def write_shards(shards, gallery_dir=GALLERY_DIR):
+    """Write one index file per category; returns category -> relative URL with version."""
+    urls = {}
+    gallery_dir = Path(gallery_dir)
+    for category, terms in sorted(shards.items()):
+        text = json.dumps(terms, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+        filename = f"index-{category}.json"
+        _write_if_changed(gallery_dir / filename, text)
+        version = hashlib.sha256(text.encode('utf-8')).hexdigest()[:10]
+        urls[category] = f"{gallery_dir.name}/{filename}?v={version}"
+    for stale in gallery_dir.glob("index-*.json"):
+        if stale.stem[len("index-"):] not in shards:
+            stale.unlink()
+    return urls
+
+
+GALLERY_STYLE = """
+        * { box-sizing: border-box; }
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            max-width: 1400px;
+            margin: 0 auto;
+            padding: 40px 20px;
+            background: #f6f8fa;
+            color: #24292f;
+        }
+        h1 {
+            color: #24292f;
+            border-bottom: 3px solid #0969da;
+            padding-bottom: 15px;
+            margin-bottom: 10px;
+        }
+        .subtitle {
+            color: #57606a;
+            margin-bottom: 30px;
+        }
+        .notice {
+            background: #fff8c5;
+            border: 2px solid #fbbf24;
+            border-radius: 8px;
+            padding: 16px 20px;
+            margin-bottom: 30px;
+        }
+        .notice strong {
+            color: #92400e;
+        }
+        .toolbar {
+            display: flex;
+            flex-wrap: wrap;
+            gap: 10px;
+            margin-bottom: 20px;
+        }
+        .toolbar input {
+            flex: 1 1 280px;
+            padding: 10px 14px;
+            font-size: 16px;
+            border: 1px solid #d0d7de;
+            border-radius: 8px;
+        }
+        .toolbar button {
+            border: 1px solid #d0d7de;
+            background: white;
+            border-radius: 16px;
+            padding: 6px 14px;
+            cursor: pointer;
+            text-transform: capitalize;
+        }
+        .toolbar button.active {
+            background: #0969da;
+            border-color: #0969da;
+            color: white;
+        }
+        .status {
+            color: #57606a;
+            font-size: 14px;
+            margin-bottom: 10px;
+        }
+        .preview-grid {
+            display: grid;
+            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
+            gap: 20px;
+        }
+        .preview-card {
+            background: white;
+            border: 1px solid #d0d7de;
+            border-radius: 8px;
+            padding: 20px;
+            transition: all 0.2s ease;
+            text-decoration: none;
+            display: block;
+        }
+        .preview-card:hover {
+            border-color: #0969da;
+            box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+            transform: translateY(-2px);
+        }
+        .preview-title {
+            color: #24292f;
+            font-weight: 600;
+            font-size: 16px;
+            margin-bottom: 8px;
+        }
+        .preview-card img {
+            display: block;
+            width: 100%;
+            height: auto;
+            aspect-ratio: 2 / 1;
+            border-radius: 4px;
+            margin-bottom: 12px;
+            background: #f6f8fa;
+        }
+        .preview-card:hover .preview-title {
+            color: #0969da;
+        }
+        .badge {
+            display: inline-block;
+            background: #ddf4ff;
+            color: #0969da;
+            padding: 4px 10px;
+            border-radius: 12px;
+            font-size: 12px;
+            margin: 4px 4px 0 0;
+        }
+        .icon {
+            font-size: 28px;
+            margin-bottom: 10px;
+        }
+        .category {
+            margin: 40px 0;
+        }
+        .category h2 {
+            color: #0969da;
+        }
+        .profile-table {
+            width: 100%;
+            border-collapse: collapse;
+            background: white;
+            font-size: 14px;
+        }
+        .profile-table th, .profile-table td {
+            border: 1px solid #d0d7de;
+            padding: 6px 10px;
+            text-align: left;
+        }
+        .profile-table th {
+            background: #f6f8fa;
+        }
+"""
+
+# Renders cards page by page and searches the sharded index; no dependencies
+GALLERY_SCRIPT = """
+(function () {
+    const PAGE_SIZE = %(page_size)d;
+    const ICONS = %(icons)s;
+    const docs = JSON.parse(document.getElementById('gallery-manifest').textContent);
+    const shardUrls = JSON.parse(document.getElementById('gallery-shards').textContent);
+    const grid = document.getElementById('grid');
+    const status = document.getElementById('status');
+    const search = document.getElementById('search');
+    const sentinel = document.getElementById('sentinel');
+    const shards = {};
+    let category = null;
+    let results = [];
+    let shown = 0;
+
+    function tokenize(text) {
+        return (text.toLowerCase().match(/[\\p{L}\\p{N}_]{2,}/gu) || []).filter(t => !/^\\d+$/.test(t));
+    }
+
+    function card(doc) {
+        const a = document.createElement('a');
+        a.className = 'preview-card';
+        a.href = doc.u;
+        if (doc.i) {
+            const img = document.createElement('img');
+            img.src = doc.i[0];
+            img.srcset = doc.i[1];
+            img.sizes = '(max-width: 700px) 100vw, 320px';
+            img.width = 320;
+            img.height = 160;
+            img.loading = 'lazy';
+            img.decoding = 'async';
+            img.alt = '';
+            a.append(img);
+        } else {
+            const icon = document.createElement('div');
+            icon.className = 'icon';
+            icon.textContent = ICONS[doc.c] || '📓';
+            a.append(icon);
+        }
+        const title = document.createElement('div');
+        title.className = 'preview-title';
+        title.textContent = doc.t;
+        a.append(title);
+        for (const label of [doc.c].concat(doc.g.slice(0, 3))) {
+            const badge = document.createElement('span');
+            badge.className = 'badge';
+            badge.textContent = label;
+            a.append(badge);
+        }
+        return a;
+    }
+
+    function showMore() {
+        const page = results.slice(shown, shown + PAGE_SIZE);
+        const fragment = document.createDocumentFragment();
+        page.forEach(i => fragment.append(card(docs[i])));
+        grid.append(fragment);
+        shown += page.length;
+        status.textContent = `Showing ${shown} of ${results.length} notebook(s)`;
+    }
+
+    function render(ids) {
+        results = ids;
+        shown = 0;
+        grid.textContent = '';
+        showMore();
+    }
+
+    function loadShard(name) {
+        if (!shards[name]) {
+            shards[name] = fetch(shardUrls[name]).then(r => r.json()).catch(() => null);
+        }
+        return shards[name];
+    }
+
+    function fallbackMatch(terms, ids) {
+        // Shards can't be fetched from file:// pages; match titles and tags instead
+        return ids.filter(i => {
+            const text = tokenize([docs[i].t, docs[i].c].concat(docs[i].g).join(' '));
+            return terms.every(term => text.some(t => t.startsWith(term)));
+        });
+    }
+
+    async function update() {
+        const inCategory = docs.map((_, i) => i).filter(i => !category || docs[i].c === category);
+        const terms = tokenize(search.value);
+        if (!terms.length) {
+            render(inCategory);
+            return;
+        }
+        const names = category ? [category] : Object.keys(shardUrls);
+        const loaded = await Promise.all(names.map(loadShard));
+        if (loaded.includes(null)) {
+            render(fallbackMatch(terms, inCategory));
+            return;
+        }
+        let scores = null;
+        for (const term of terms) {
+            const termScores = new Map();
+            for (const shard of loaded) {
+                for (const key in shard) {
+                    if (!key.startsWith(term)) continue;
+                    const postings = shard[key];
+                    for (let p = 0; p < postings.length; p += 2) {
+                        const boost = key === term ? 1 : 0.5;
+                        termScores.set(postings[p], Math.max(termScores.get(postings[p]) || 0, postings[p + 1] * boost));
+                    }
+                }
+            }
+            if (scores === null) {
+                scores = termScores;
+            } else {
+                for (const [doc, score] of scores) {
+                    if (termScores.has(doc)) scores.set(doc, score + termScores.get(doc));
+                    else scores.delete(doc);
+                }
+            }
+        }
+        render([...scores.entries()].sort((a, b) => b[1] - a[1] || a[0] - b[0]).map(e => e[0]));
+    }
+
+    document.querySelectorAll('.toolbar button').forEach(button => {
+        button.addEventListener('click', () => {
+            document.querySelectorAll('.toolbar button').forEach(b => b.classList.remove('active'));
+            button.classList.add('active');
+            category = button.dataset.category || null;
+            update();
+        });
+    });
+    let timer = null;
+    search.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(update, 150);
+    });
+    new IntersectionObserver(entries => {
+        if (entries[0].isIntersecting && shown < results.length) showMore();
+    }, {rootMargin: '600px'}).observe(sentinel);
+    document.getElementById('noscript-list').remove();
+    update();
+})();
+"""
+
+
+def _json_for_script(value):
+    # Keep "</script>" and friends from ending the embedding <script> element
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).replace('<', '\\u003c')
+
+
+def render_gallery(manifest, shard_urls, title, subtitle, notice="", footer="", extra_html=""):
+    """The gallery index.html: static shell, embedded manifest and client-side script."""
+    categories = sorted({doc['c'] for doc in manifest})
+    buttons = ['            <button class="active" data-category="">All</button>']
+    buttons.extend(
+        f'            <button data-category="{html.escape(c)}">'
+        f'{CATEGORY_ICONS.get(c, "📓")} {html.escape(c.replace("_", " "))}</button>'
+        for c in categories
+    )
+    # Plain links for browsers without JavaScript; removed by the script
+    links = [
+        f'            <li><a href="{html.escape(doc["u"])}">{html.escape(doc["t"])}</a></li>'
+        for doc in manifest
+    ]
+    script = GALLERY_SCRIPT % {
+        'page_size': PAGE_SIZE,
+        'icons': _json_for_script(CATEGORY_ICONS),
+    }
+    parts = [
+        '<!DOCTYPE html>',
+        '<html lang="en">',
+        '<head>',
+        '    <meta charset="UTF-8">',
+        '    <meta name="viewport" content="width=device-width, initial-scale=1.0">',
+        f'    <title>{html.escape(title)} - Botanical Colabs</title>',
+        f'    <style>{GALLERY_STYLE}    </style>',
+        '</head>',
+        '<body>',
+        f'    <h1>📓 {html.escape(title)}</h1>',
+        f'    <p class="subtitle">{subtitle}</p>',
+        notice,
+        '    <div class="toolbar">',
+        '        <input id="search" type="search" placeholder="Search titles, headings and tags…" autocomplete="off">',
+        '    </div>',
+        '    <div class="toolbar">',
+        *buttons,
+        '    </div>',
+        '    <div id="status" class="status"></div>',
+        '    <div id="grid" class="preview-grid"></div>',
+        '    <div id="sentinel"></div>',
+        '    <ul id="noscript-list">',
+        *links,
+        '    </ul>',
+        extra_html,
+        footer,
+        f'    <script type="application/json" id="gallery-manifest">{_json_for_script(manifest)}</script>',
+        f'    <script type="application/json" id="gallery-shards">{_json_for_script(shard_urls)}</script>',
+        f'    <script>{script}</script>',
+        '</body>',
+        '</html>',
+        '',
+    ]
+    return '\n'.join(parts)
+
+
+def write_gallery(previews, index_path, title, subtitle, notice="", footer="", extra_html="",
+                  notebooks_dir=Path("notebooks")):
+    """Build the gallery for `previews`.
+
+    Each item is (nb_path, url) or (nb_path, url, thumbnail), with URLs
+    relative to the index and thumbnail a dict with 'src' and 'srcset' (or None).
+
+    Writes index.html, gallery/manifest.json, the category index shards and
+    the entry cache.
+    Returns the number of notebooks in the gallery.
+    """
+    index_path = Path(index_path)
+    gallery_dir = index_path.parent / GALLERY_DIR.name
+    entries = update_entries(previews, notebooks_dir, gallery_dir / ENTRIES_PATH.name)
+    manifest, shards = build_index(entries)
+    _write_if_changed(gallery_dir / "manifest.json", json.dumps(manifest, separators=(',', ':'), ensure_ascii=False))
+    shard_urls = write_shards(shards, gallery_dir)
+    _write_if_changed(
+        index_path,
+        render_gallery(manifest, shard_urls, title, subtitle, notice, footer, extra_html),
+    )
+    return len(manifest)
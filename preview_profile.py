@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Per-cell execution profiling for preview generation.
+
+A CellProfiler hooks into ExecutePreprocessor and records, for every executed
+code cell, its wall time, the peak resident memory of the kernel while it ran
+(sampled in a background thread; needs psutil) and the size of its outputs.
+Profiles are written to previews/profile/<notebook>.json, and the preview
+index summarises the slowest cells and heaviest outputs across all notebooks.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from kernel_pool import kernel_memory_mb
+
+PROFILE_DIR = Path("previews") / "profile"
+SAMPLE_INTERVAL = 0.05  # seconds between kernel memory samples
+
+
+class CellProfiler:
+    """Collects timing, memory and output-size figures for executed cells."""
+
+    def __init__(self, name):
+        self.name = name
+        self.cells = []
+        self._ep = None
+        self._start = None
+        self._peak_mb = None
+        self._sampling = threading.Event()
+        self._sampler = None
+        self._current = None
+
+    def attach(self, ep):
+        """Register the profiler's hooks on an ExecutePreprocessor."""
+        self._ep = ep
+        ep.on_cell_execute = self._cell_started
+        ep.on_cell_executed = self._cell_finished
+
+    def _sample_memory(self):
+        while self._sampling.is_set():
+            rss_mb = kernel_memory_mb(self._ep.km) if self._ep.km is not None else None
+            if rss_mb is not None:
+                self._peak_mb = max(self._peak_mb or 0.0, rss_mb)
+            time.sleep(SAMPLE_INTERVAL)
+
+    def _cell_started(self, cell, cell_index):
+        self._peak_mb = None
+        self._current = (cell, cell_index)
+        self._sampling.set()
+        self._sampler = threading.Thread(target=self._sample_memory, daemon=True)
+        self._sampler.start()
+        self._start = time.perf_counter()
+
+    def _cell_finished(self, cell, cell_index, execute_reply):
+        status = (execute_reply or {}).get('content', {}).get('status', 'unknown')
+        self._record(cell, cell_index, status)
+
+    def _record(self, cell, cell_index, status):
+        wall = time.perf_counter() - self._start
+        self._current = None
+        self._sampling.clear()
+        self._sampler.join()
+
+        first_line = next((line for line in cell.source.splitlines() if line.strip()), '')
+        self.cells.append({
+            'index': cell_index,
+            'wall_seconds': round(wall, 3),
+            'peak_rss_mb': round(self._peak_mb, 1) if self._peak_mb is not None else None,
+            'output_bytes': len(json.dumps(cell.get('outputs', []))),
+            'status': status,
+            'source': first_line[:80],
+        })
+
+    def stop(self):
+        """Stop sampling and record a cell that never finished (timeout, dead kernel)."""
+        if self._current is not None:
+            self._record(*self._current, 'timeout')
+
+    def write(self, profile_dir=PROFILE_DIR):
+        """Write the notebook's profile to <profile_dir>/<name>.json."""
+        profile_dir = Path(profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        profile = {
+            'notebook': self.name,
+            'total_seconds': round(sum(c['wall_seconds'] for c in self.cells), 3),
+            'cells': self.cells,
+        }
+        path = profile_dir / f"{self.name}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=2)
+        return path
+
+
+def load_profiles(profile_dir=PROFILE_DIR):
+    """Load every notebook profile written so far."""
+    profiles = []
+    for path in sorted(Path(profile_dir).glob("*.json")):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def top_cells(profiles, field, limit=10):
+    """The `limit` cells with the largest `field` across all profiles."""
+    rows = [
+        dict(cell, notebook=profile['notebook'])
+        for profile in profiles
+        for cell in profile.get('cells', [])
+        if cell.get(field) is not None
+    ]
+    return sorted(rows, key=lambda row: row[field], reverse=True)[:limit]
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def render_profile_tables(profiles, limit=10):
+    """HTML tables of the slowest cells and heaviest outputs, or '' without profiles."""
+    if not profiles:
+        return ""
+
+    def table(title, rows):
+        html = f"""
+        <h3>{title}</h3>
+        <table class="profile-table">
+            <tr><th>Notebook</th><th>Cell</th><th>Time</th><th>Peak RSS</th><th>Output</th><th>First line</th></tr>
+"""
+        for row in rows:
+            rss = f"{row['peak_rss_mb']:.0f} MB" if row.get('peak_rss_mb') is not None else "–"
+            source = row['source'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            html += f"""            <tr><td><a href="html/{row['notebook']}.html">{row['notebook']}</a></td><td>{row['index']}</td><td>{row['wall_seconds']:.2f} s</td><td>{rss}</td><td>{_format_bytes(row['output_bytes'])}</td><td><code>{source}</code></td></tr>
+"""
+        html += "        </table>\n"
+        return html
+
+    return f"""
+    <div class="category">
+        <h2>⏱️ Execution Profile</h2>
+{table("Slowest cells", top_cells(profiles, 'wall_seconds', limit))}
+{table("Heaviest outputs", top_cells(profiles, 'output_bytes', limit))}
+    </div>
+"""
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Runtime history and scheduling for preview generation.
+
+Each successful notebook run appends its wall time to
+previews/runtime_history.json (the last HISTORY_SIZE runs per notebook).
+The history is used to:
+
+- order work longest-first, so parallel workers finish together instead of
+  one slow notebook starting last; notebooks without history go first,
+- give each notebook its own time budget, p95 of its history x TIMEOUT_MARGIN
+  (at least MIN_TIMEOUT), instead of one fixed timeout for everything,
+- report notebooks whose runtime regressed against their median.
+"""
+
+import json
+import math
+import os
+import statistics
+from pathlib import Path
+
+HISTORY_PATH = Path("previews") / "runtime_history.json"
+HISTORY_SIZE = 20  # runs kept per notebook
+MIN_SAMPLES = 3  # runs needed before the history sets a timeout
+TIMEOUT_MARGIN = 3.0
+MIN_TIMEOUT = 60  # seconds; covers kernel start-up jitter on short notebooks
+REGRESSION_FACTOR = 1.5
+REGRESSION_MIN_SECONDS = 5.0  # ignore slowdowns smaller than this
+
+
+def load_history(path=HISTORY_PATH):
+    """Load runtimes per notebook, or an empty history."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_history(history, path=HISTORY_PATH):
+    """Write the history atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def record_runtime(history, name, seconds):
+    """Append a successful run, keeping the most recent HISTORY_SIZE."""
+    runs = history.setdefault(name, [])
+    runs.append(round(seconds, 2))
+    del runs[:-HISTORY_SIZE]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def estimate(history, name):
+    """Expected runtime of a notebook (median of its history), or None if unknown."""
+    runs = history.get(name)
+    return statistics.median(runs) if runs else None
+
+
+def longest_first(items, history, name_of):
+    """Sort `items` by expected runtime, unknown runtimes first."""
+    def sort_key(item):
+        expected = estimate(history, name_of(item))
+        return -math.inf if expected is None else -expected
+    return sorted(items, key=sort_key)
+
+
+def timeout_for(history, name, default):
+    """Time budget for one notebook run, from its history or `default`."""
+    runs = history.get(name, [])
+    if len(runs) < MIN_SAMPLES:
+        return default
+    return max(MIN_TIMEOUT, math.ceil(percentile(runs, 0.95) * TIMEOUT_MARGIN))
+
+
+def find_regressions(history, runtimes):
+    """Notebooks that ran much slower than their baseline.
+
+    `runtimes` maps name -> seconds of this build and must not yet be
+    recorded in `history`. Returns (name, seconds, baseline) tuples, worst first.
+    """
+    regressions = []
+    for name, seconds in runtimes.items():
+        baseline = estimate(history, name)
+        if baseline is None or len(history[name]) < MIN_SAMPLES:
+            continue
+        if seconds > baseline * REGRESSION_FACTOR and seconds - baseline > REGRESSION_MIN_SECONDS:
+            regressions.append((name, seconds, baseline))
+    return sorted(regressions, key=lambda r: r[1] / r[2], reverse=True)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Notebook thumbnails for wiki pages and preview galleries.
+
+A thumbnail shows the notebook's first figure (the first PNG/JPEG output of a
+code cell) letterboxed onto a card; notebooks without figures get a title
+card instead. Every thumbnail is written as <stem>.png at THUMBNAIL_SIZE plus
+one WebP per width in SRCSET_WIDTHS (<stem>-<width>.webp), so gallery pages
+can let the browser pick a small image through srcset.
+
+Fonts are loaded once per process, the background gradient is built as a
+single array operation, and render_thumbnails() spreads a batch over worker
+processes. Needs Pillow; numpy is used for the gradient when available.
+"""
+
+import base64
+import copy
+import functools
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from notebook_outputs import has_output_refs, rehydrate
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = ImageDraw = ImageFont = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+THUMBNAIL_SIZE = (800, 400)
+SRCSET_WIDTHS = (320, 640)
+WEBP_QUALITY = 80
+
+BACKGROUND_TOP = (13, 17, 23)
+BACKGROUND_BOTTOM = (23, 27, 33)
+TITLE_COLOR = (88, 166, 255)
+SUBTITLE_COLOR = (139, 148, 158)
+SHADOW_COLOR = (0, 0, 0)
+FIGURE_PADDING = 24
+
+# Tried in order; the first font Pillow can open is used
+FONT_CANDIDATES = ("DejaVuSans.ttf", "arial.ttf", "Arial.ttf", "LiberationSans-Regular.ttf")
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size):
+    """A TrueType font at `size`, loaded once per process (Pillow's default as fallback)."""
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+def gradient(size, top=BACKGROUND_TOP, bottom=BACKGROUND_BOTTOM):
+    """A vertical gradient image from `top` to `bottom` colour."""
+    width, height = size
+    if np is None:
+        # Pillow's 256-step ramp, stretched and tinted in C
+        ramp = Image.linear_gradient('L').resize((width, height))
+        return Image.merge('RGB', [
+            ramp.point(lambda v, a=a, b=b: round(a + (b - a) * v / 255))
+            for a, b in zip(top, bottom)
+        ])
+    t = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    rows = np.asarray(top, np.float32) + t * (np.asarray(bottom, np.float32) - np.asarray(top, np.float32))
+    pixels = np.broadcast_to(rows, (height, width, 3)).round().astype(np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+
+def title_card(title, subtitle="Jupyter Notebook Preview", size=THUMBNAIL_SIZE):
+    """The generic card: notebook title and subtitle on the gradient background."""
+    image = gradient(size)
+    draw = ImageDraw.Draw(image)
+    title_font = load_font(48)
+    text_font = load_font(24)
+
+    # Add emoji/icon
+    draw.text((52, 52), "📓", font=title_font)
+
+    # Draw text with shadow
+    draw.text((52, 152), title, fill=SHADOW_COLOR, font=title_font)
+    draw.text((50, 150), title, fill=TITLE_COLOR, font=title_font)
+    draw.text((52, 252), subtitle, fill=SHADOW_COLOR, font=text_font)
+    draw.text((50, 250), subtitle, fill=SUBTITLE_COLOR, font=text_font)
+    return image
+
+
+def first_figure(notebook):
+    """The first PNG or JPEG output of the notebook's code cells, or None."""
+    for cell in notebook.get('cells', []):
+        if cell.get('cell_type') != 'code':
+            continue
+        for output in cell.get('outputs', []):
+            data = output.get('data', {})
+            for mime in ('image/png', 'image/jpeg'):
+                if mime not in data:
+                    continue
+                encoded = data[mime]
+                encoded = ''.join(encoded) if isinstance(encoded, list) else encoded
+                try:
+                    image = Image.open(io.BytesIO(base64.b64decode(encoded)))
+                    image.load()
+                    return image
+                except (OSError, ValueError):
+                    continue
+    return None
+
+
+def figure_card(figure, size=THUMBNAIL_SIZE):
+    """The figure scaled to fit on a white card of `size`."""
+    card = Image.new('RGB', size, (255, 255, 255))
+    figure = figure.convert('RGBA')
+    figure.thumbnail((size[0] - 2 * FIGURE_PADDING, size[1] - 2 * FIGURE_PADDING), Image.LANCZOS)
+    offset = ((size[0] - figure.width) // 2, (size[1] - figure.height) // 2)
+    card.paste(figure, offset, figure)
+    return card
+
+
+def render_thumbnail(notebook, title, out_dir, stem, widths=SRCSET_WIDTHS):
+    """Write the thumbnail set for one notebook.
+
+    `notebook` is a notebook node/dict (or a path to read it from). Returns the
+    written paths: <stem>.png first, then one WebP per width.
+    """
+    if Image is None:
+        return []
+    if isinstance(notebook, (str, os.PathLike)):
+        import nbformat
+        with open(notebook, 'r', encoding='utf-8') as f:
+            notebook = nbformat.read(f, as_version=4)
+    if has_output_refs(notebook):
+        notebook = rehydrate(copy.deepcopy(notebook))
+
+    figure = first_figure(notebook)
+    card = figure_card(figure) if figure is not None else title_card(title)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = [out_dir / f"{stem}.png"]
+    card.save(paths[0], 'PNG', optimize=True)
+    for width in widths:
+        height = round(card.height * width / card.width)
+        path = out_dir / f"{stem}-{width}.webp"
+        card.resize((width, height), Image.LANCZOS).save(path, 'WEBP', quality=WEBP_QUALITY)
+        paths.append(path)
+    return paths
+
+
+def _render_job(job):
+    notebook, title, out_dir, stem = job
+    try:
+        return render_thumbnail(notebook, title, out_dir, stem), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+def render_thumbnails(jobs, workers=None):
+    """Render many thumbnails in parallel.
+
+    `jobs` is a list of (notebook or path, title, out_dir, stem). Returns a
+    list of (paths, error) in the same order; error is None on success.
+    """
+    jobs = list(jobs)
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1 or len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_job, jobs))
+
+
+def srcset(stem, url_prefix, widths=SRCSET_WIDTHS):
+    """The srcset attribute value for a thumbnail set written by render_thumbnail()."""
+    return ', '.join(f"{url_prefix}{stem}-{width}.webp {width}w" for width in widths)
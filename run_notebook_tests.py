@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Sharded notebook test runner.
+
+Executes notebooks end to end (like `jupyter nbconvert --execute`), split into
+shards that take about equally long: notebooks are sorted by their recorded
+runtime and each one goes to the shard with the least work so far (longest
+processing time first). Notebooks without history count as the median of the
+known ones.
+
+Each shard writes test-results/junit-shard-<i>.xml and its measured runtimes
+to test-results/timings-shard-<i>.json. Merging those into
+test-results/timings.json gives the next run its partition.
+
+Usage:
+    python run_notebook_tests.py --shards 4        # all shards locally, in parallel
+    python run_notebook_tests.py --shard 2/4       # one shard (e.g. a CI matrix job)
+    python run_notebook_tests.py --merge           # fold shard timings into timings.json
+    python run_notebook_tests.py --shards 4 --list # show the partition only
+"""
+
+import argparse
+import fnmatch
+import heapq
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from preview_schedule import estimate, load_history, record_runtime, save_history
+from validate_notebooks import validate_notebooks
+
+NOTEBOOKS_DIR = Path("notebooks")
+RESULTS_DIR = Path("test-results")
+TIMINGS_PATH = RESULTS_DIR / "timings.json"
+DEFAULT_EXCLUDE = ["notebooks/templates/*"]  # templates need user input to run
+DEFAULT_ESTIMATE = 60.0  # seconds, when no notebook has history yet
+CELL_TIMEOUT = 600
+KERNEL_NAME = "python3"
+
+# Kernel tracebacks are colored; XML 1.0 has no escape characters
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+_XML_INVALID_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _clean(text):
+    return _XML_INVALID_RE.sub('', _ANSI_RE.sub('', text))
+
+
+def find_notebooks(exclude=DEFAULT_EXCLUDE):
+    """Notebooks to test, as POSIX path strings, minus `exclude` globs."""
+    notebooks = []
+    for path in sorted(NOTEBOOKS_DIR.rglob("*.ipynb")):
+        name = path.as_posix()
+        if '.ipynb_checkpoints' in path.parts:
+            continue
+        if any(fnmatch.fnmatch(name, pattern) for pattern in exclude):
+            continue
+        notebooks.append(name)
+    return notebooks
+
+
+def partition(notebooks, shards, timings):
+    """Split notebooks into `shards` lists with balanced expected runtime.
+
+    Returns (shard lists, expected seconds per shard). Deterministic for the
+    same input, so every CI matrix job computes the same partition.
+    """
+    known = [estimate(timings, name) for name in notebooks if timings.get(name)]
+    default = statistics.median(known) if known else DEFAULT_ESTIMATE
+    expected = {name: estimate(timings, name) or default for name in notebooks}
+
+    # Longest first, each onto the currently lightest shard
+    heap = [(0.0, index) for index in range(shards)]
+    buckets = [[] for _ in range(shards)]
+    totals = [0.0] * shards
+    for name in sorted(notebooks, key=lambda name: (-expected[name], name)):
+        total, index = heapq.heappop(heap)
+        buckets[index].append(name)
+        totals[index] = total + expected[name]
+        heapq.heappush(heap, (totals[index], index))
+    return buckets, totals
+
+
+def run_notebook(name, timeout=CELL_TIMEOUT):
+    """Execute one notebook; returns a result dict for the JUnit report."""
+    import nbformat
+    from nbconvert.preprocessors import CellExecutionError, ExecutePreprocessor
+
+    start = time.perf_counter()
+    result = {'name': name, 'status': 'passed', 'message': '', 'details': ''}
+    try:
+        with open(name, 'r', encoding='utf-8') as f:
+            notebook = nbformat.read(f, as_version=4)
+        ep = ExecutePreprocessor(timeout=timeout, kernel_name=KERNEL_NAME)
+        ep.preprocess(notebook, {'metadata': {'path': str(Path(name).parent)}})
+    except CellExecutionError as e:
+        details = _clean(str(e)).strip()
+        result.update(status='failed', message=details.splitlines()[-1][:200], details=details)
+    except TimeoutError as e:
+        result.update(status='failed', message=f"Timed out: {e}"[:200], details=traceback.format_exc())
+    except Exception as e:
+        result.update(status='error', message=f"{type(e).__name__}: {e}"[:200], details=traceback.format_exc())
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def write_junit(results, path, suite_name):
+    """Write results as a JUnit XML test suite."""
+    suite = ET.Element('testsuite', {
+        'name': suite_name,
+        'tests': str(len(results)),
+        'failures': str(sum(r['status'] == 'failed' for r in results)),
+        'errors': str(sum(r['status'] in ('error', 'invalid') for r in results)),
+        'time': f"{sum(r['seconds'] for r in results):.3f}",
+    })
+    for r in results:
+        path_obj = Path(r['name'])
+        case = ET.SubElement(suite, 'testcase', {
+            'classname': '.'.join(path_obj.parent.parts),
+            'name': path_obj.stem,
+            'file': r['name'],
+            'time': f"{r['seconds']:.3f}",
+        })
+        if r['status'] != 'passed':
+            tag = 'failure' if r['status'] == 'failed' else 'error'
+            element = ET.SubElement(case, tag, {'message': _clean(r['message']), 'type': r['status']})
+            element.text = _clean(r['details'])
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(suite).write(path, encoding='utf-8', xml_declaration=True)
+
+
+def run_shard(index, shards, names, timeout=CELL_TIMEOUT):
+    """Run one shard's notebooks one after another; writes its JUnit and timing files."""
+    label = f"{index}/{shards}"
+    results = []
+
+    # Broken files fail in milliseconds instead of after a kernel start
+    invalid = validate_notebooks(names, checks=('json', 'syntax'), workers=1)
+    for name in names:
+        if name in invalid:
+            results.append({'name': name, 'status': 'invalid', 'seconds': 0.0,
+                            'message': invalid[name][0][:200], 'details': '\n'.join(invalid[name])})
+            print(f"  [{label}] 🚫 {name}: {invalid[name][0]}", flush=True)
+            continue
+        result = run_notebook(name, timeout)
+        results.append(result)
+        icon = '✓' if result['status'] == 'passed' else '❌'
+        print(f"  [{label}] {icon} {name} ({result['seconds']:.1f}s)", flush=True)
+
+    write_junit(results, RESULTS_DIR / f"junit-shard-{index}.xml", f"notebooks-shard-{index}")
+    # Only real runs say anything about how long a notebook takes
+    timings = {r['name']: round(r['seconds'], 2) for r in results if r['status'] != 'invalid'}
+    with open(RESULTS_DIR / f"timings-shard-{index}.json", 'w', encoding='utf-8') as f:
+        json.dump(timings, f, indent=2, sort_keys=True)
+    return results
+
+
+def merge_timings():
+    """Fold every timings-shard-*.json into timings.json and remove them."""
+    history = load_history(TIMINGS_PATH)
+    shard_files = sorted(RESULTS_DIR.glob("timings-shard-*.json"))
+    for shard_file in shard_files:
+        with open(shard_file, 'r', encoding='utf-8') as f:
+            for name, seconds in json.load(f).items():
+                record_runtime(history, name, seconds)
+        shard_file.unlink()
+    save_history(history, TIMINGS_PATH)
+    print(f"⏱️  Merged {len(shard_files)} shard timing file(s) into {TIMINGS_PATH}")
+
+
+def parse_shard(value):
+    index, _, count = value.partition('/')
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard must be i/N with 1 <= i <= N, got {value}")
+    return index, count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run notebook tests in runtime-balanced shards.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--shards', type=int, metavar='N',
+                       help="split into N shards and run them all in parallel (default: CPU cores)")
+    group.add_argument('--shard', type=parse_shard, metavar='I/N',
+                       help="run only shard I of N (1-based)")
+    group.add_argument('--merge', action='store_true',
+                       help="merge shard timing files into the timing history and exit")
+    parser.add_argument('--list', action='store_true', help="print the partition and exit")
+    parser.add_argument('--exclude', action='append', default=None, metavar='GLOB',
+                        help="skip notebooks matching GLOB (default: notebooks/templates/*)")
+    parser.add_argument('--timeout', type=int, default=CELL_TIMEOUT,
+                        help=f"per-cell timeout in seconds (default: {CELL_TIMEOUT})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.merge:
+        merge_timings()
+        return 0
+
+    notebooks = find_notebooks(args.exclude if args.exclude is not None else DEFAULT_EXCLUDE)
+    timings = load_history(TIMINGS_PATH)
+    if args.shard:
+        index, shards = args.shard
+    else:
+        shards = max(1, min(args.shards or os.cpu_count() or 1, len(notebooks)))
+    buckets, totals = partition(notebooks, shards, timings)
+
+    print(f"🧪 {len(notebooks)} notebook(s) in {shards} shard(s)")
+    for i, (bucket, total) in enumerate(zip(buckets, totals), start=1):
+        print(f"  Shard {i}: {len(bucket)} notebook(s), ~{total:.0f}s expected")
+    if args.list:
+        for i, bucket in enumerate(buckets, start=1):
+            print(f"\nShard {i}:")
+            for name in bucket:
+                print(f"  {name}")
+        return 0
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    if args.shard:
+        results = run_shard(index, shards, buckets[index - 1], args.timeout)
+    else:
+        # One process per shard, each running its notebooks (and kernels) one at a time
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            futures = [
+                pool.submit(run_shard, i, shards, bucket, args.timeout)
+                for i, bucket in enumerate(buckets, start=1)
+            ]
+            results = [result for future in futures for result in future.result()]
+        merge_timings()
+
+    failed = [r for r in results if r['status'] != 'passed']
+    print(f"\n{'❌' if failed else '✅'} {len(results) - len(failed)}/{len(results)} notebook(s) passed "
+          f"in {time.perf_counter() - start:.1f}s")
+    for r in failed:
+        print(f"  {r['status'].upper()}: {r['name']}: {r['message']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
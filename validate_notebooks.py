@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Fail-fast notebook validator.
+
+Checks every notebook before any kernel is started, so a broken file is
+rejected in milliseconds instead of after a kernel start-up and a timeout:
+
+- json:   the file is well-formed JSON (errors carry the exact line and column)
+- schema: the notebook matches the nbformat schema (needs nbformat)
+- syntax: every code cell compiles; IPython magics and shell escapes
+          (%, %%, !) are blanked out first, keeping line numbers
+
+Notebooks are checked in parallel worker processes. The preview generators
+and the documentation script call validate_notebooks() on their inputs and
+drop the notebooks it rejects; run this file directly to check the whole
+tree (exit status 1 if anything is broken):
+
+    python validate_notebooks.py
+    python validate_notebooks.py notebooks/greenhouse --checks json,schema
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import nbformat
+    from nbformat.validator import ValidationError
+except ImportError:
+    nbformat = None
+
+NOTEBOOKS_DIR = Path("notebooks")
+ALL_CHECKS = ('json', 'schema', 'syntax')
+PARALLEL_MIN_NOTEBOOKS = 8  # below this, worker start-up costs more than it saves
+MAX_MESSAGE_LENGTH = 200  # schema messages can quote whole cells
+
+# Line magics, shell escapes and `x = !cmd` / `x = %magic` assignments
+_MAGIC_RE = re.compile(r'^(\s*)(?:[%!]|[\w.]+\s*=\s*[%!]).*$', re.M)
+
+
+def _python_source(source):
+    """Cell source with IPython-only lines replaced by `pass` (same line numbers)."""
+    if source.lstrip().startswith('%%'):
+        return None  # cell magics (%%bash, %%html, ...) are not Python
+    return _MAGIC_RE.sub(r'\1pass', source)
+
+
+def validate_notebook(path, checks=ALL_CHECKS):
+    """Problems found in one notebook, as a list of 'path:line:col: kind: message' strings."""
+    path = str(path)
+    try:
+        with open(path, 'rb') as f:
+            text = f.read().decode('utf-8')
+    except (OSError, UnicodeDecodeError) as e:
+        return [f"{path}: read: {e}"]
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        # Reported even without the json check: nothing else can run on it
+        return [f"{path}:{e.lineno}:{e.colno}: json: {e.msg}"]
+    if not isinstance(data, dict):
+        return [f"{path}:1:1: json: top level is not an object"]
+
+    problems = []
+    if 'schema' in checks and nbformat is not None:
+        try:
+            with warnings.catch_warnings():
+                # Missing/duplicate cell ids are repaired on read, not worth a rejection
+                warnings.simplefilter('ignore')
+                nbformat.validate(data)
+        except ValidationError as e:
+            where = '/'.join(str(part) for part in e.absolute_path) or 'notebook'
+            problems.append(f"{path}: schema: {where}: {e.message[:MAX_MESSAGE_LENGTH]}")
+        except Exception as e:  # unknown nbformat version and similar
+            problems.append(f"{path}: schema: {e}")
+
+    if 'syntax' in checks:
+        for index, cell in enumerate(data.get('cells', [])):
+            if not isinstance(cell, dict) or cell.get('cell_type') != 'code':
+                continue
+            source = cell.get('source', '')
+            source = _python_source(''.join(source) if isinstance(source, list) else source)
+            if not source:
+                continue
+            try:
+                compile(source, f"{path} cell {index}", 'exec', dont_inherit=True)
+            except SyntaxError as e:
+                problems.append(f"{path}: syntax: cell {index}, line {e.lineno}: {e.msg}")
+            except ValueError as e:  # null bytes
+                problems.append(f"{path}: syntax: cell {index}: {e}")
+    return problems
+
+
+def _validate_job(job):
+    path, checks = job
+    return validate_notebook(path, checks)
+
+
+def validate_notebooks(paths, checks=ALL_CHECKS, workers=None):
+    """Validate notebooks in parallel; returns {path: problems} for the broken ones."""
+    paths = list(paths)
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    jobs = [(path, tuple(checks)) for path in paths]
+    if workers <= 1 or len(paths) < PARALLEL_MIN_NOTEBOOKS:
+        results = map(_validate_job, jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_validate_job, jobs, chunksize=4))
+    return {path: problems for path, problems in zip(paths, results) if problems}
+
+
+def reject_invalid(paths, checks=ALL_CHECKS):
+    """Validate `paths`, print what is broken and return only the valid ones."""
+    paths = list(paths)
+    start = time.perf_counter()
+    invalid = validate_notebooks(paths, checks)
+    elapsed = time.perf_counter() - start
+    if invalid:
+        print(f"🚫 Rejected {len(invalid)} of {len(paths)} notebook(s) in {elapsed * 1000:.0f} ms:")
+        for problems in invalid.values():
+            for problem in problems:
+                print(f"   {problem}")
+    return [path for path in paths if path not in invalid]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check notebooks before executing or converting them.")
+    parser.add_argument('paths', nargs='*', default=[str(NOTEBOOKS_DIR)],
+                        help="notebooks or directories to check (default: notebooks/)")
+    parser.add_argument('--checks', default=','.join(ALL_CHECKS),
+                        help=f"comma-separated checks to run (default: {','.join(ALL_CHECKS)})")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: number of CPU cores)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    checks = [check.strip() for check in args.checks.split(',') if check.strip()]
+    unknown = [check for check in checks if check not in ALL_CHECKS]
+    if unknown:
+        print(f"❌ Unknown check(s): {', '.join(unknown)}")
+        return 2
+    if 'schema' in checks and nbformat is None:
+        print("⚠️  nbformat is not installed; skipping the schema check")
+
+    notebooks = []
+    for arg in args.paths:
+        path = Path(arg)
+        if path.is_dir():
+            notebooks.extend(
+                nb for nb in sorted(path.rglob("*.ipynb")) if '.ipynb_checkpoints' not in nb.parts
+            )
+        else:
+            notebooks.append(path)
+
+    start = time.perf_counter()
+    invalid = validate_notebooks(notebooks, checks, args.jobs)
+    elapsed = time.perf_counter() - start
+    for problems in invalid.values():
+        for problem in problems:
+            print(problem)
+    if invalid:
+        print(f"\n❌ {len(invalid)} of {len(notebooks)} notebook(s) failed validation ({elapsed * 1000:.0f} ms)")
+        return 1
+    print(f"✅ {len(notebooks)} notebook(s) valid ({elapsed * 1000:.0f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
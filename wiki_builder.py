@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Batch wiki page builder shared by generate_wiki_pages.py and the
+documentation workflow (.github/scripts/generate_documentation.py).
+
+Page templates use str.format syntax with plain field names. A WikiTemplate
+checks its fields once when it is created, and rendering a page is then a
+single format_map() call. WikiBuilder renders a whole batch of pages and
+compares each one with the file on disk, writing only pages whose bytes
+changed, so regenerating unchanged pages leaves the working tree (and the
+auto-documentation commit) clean.
+"""
+
+import os
+import string
+from pathlib import Path
+
+
+class WikiTemplate:
+    """A page template in str.format syntax, parsed once."""
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = set()
+        for _, field, _, _ in string.Formatter().parse(text):
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise ValueError(f"Template fields must be plain names, got {{{field}}}")
+            self.fields.add(field)
+
+    def render(self, values):
+        """Render the page; `values` must provide every field."""
+        missing = self.fields.difference(values)
+        if missing:
+            raise KeyError(f"Missing template values: {', '.join(sorted(missing))}")
+        return self.text.format_map(values)
+
+
+def bullets(items, line="- {}\n", empty=""):
+    """Render `items` as a markdown list, one `line` per item (`empty` if there are none)."""
+    return ''.join(line.format(item) for item in items) or empty
+
+
+def write_if_changed(path, data):
+    """Write bytes to `path` unless the file already holds exactly them; True if written."""
+    path = Path(path)
+    try:
+        # Different size means different content; only same-size files are read
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+class WikiBuilder:
+    """Renders batches of pages into one output directory."""
+
+    def __init__(self, out_dir):
+        self.out_dir = Path(out_dir)
+
+    def build(self, pages):
+        """Render and write `pages`, an iterable of (file name, WikiTemplate, values).
+
+        Returns (written, unchanged): the paths that were (re)written and the
+        paths whose content was already up to date.
+        """
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        unchanged = []
+        for name, template, values in pages:
+            path = self.out_dir / name
+            data = template.render(values).encode('utf-8')
+            (written if write_if_changed(path, data) else unchanged).append(path)
+        return written, unchanged